@@ -1,8 +1,10 @@
 from flask import Flask
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
+from sqlalchemy.engine import make_url
 import os
 import secrets
+import threading
 
 def create_app():
     app = Flask(__name__)
@@ -14,9 +16,18 @@ def create_app():
     app.config['JWT_TOKEN_LOCATION'] = ['headers']
     app.config['JWT_HEADER_NAME'] = 'Authorization'
     app.config['JWT_HEADER_TYPE'] = 'Bearer'
-    app.config['JSONIFY_PRETTYPRINT_REGULAR'] = True
-    app.config['JSON_SORT_KEYS'] = False
-    
+
+    # ✅ JSON rápido (orjson se disponível) e compacto em produção
+    from app.json_provider import FastJSONProvider
+    app.json = FastJSONProvider(app)
+    app.json.compact = os.environ.get('FLASK_ENV') != 'development'
+
+    # ✅ Compressão gzip/brotli das respostas (registrada primeiro para rodar por último)
+    app.config['COMPRESS_ENABLED'] = os.environ.get('COMPRESS_ENABLED', '1').lower() in ('1', 'true', 'yes')
+    app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+    app.config['COMPRESS_LEVEL'] = int(os.environ.get('COMPRESS_LEVEL', 6))
+    from app.compression import init_compression
+    init_compression(app)
     
     # ✅ CONFIGURAÇÃO CRÍTICA: Permitir integer como subject
     app.config['JWT_IDENTITY_CLAIM'] = 'sub'  # Garantir que usa 'sub' claim
@@ -49,7 +60,11 @@ def create_app():
         app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
             'connect_args': {
                 'sslmode': 'require'
-            }
+            },
+            # Com gevent há muito mais requisições simultâneas que threads: dimensione o pool
+            'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+            'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30))
     }
     
     # Habilitar CORS para frontend
@@ -64,28 +79,115 @@ def create_app():
     # ✅ Inicializar Banco de Dados
     from app.models import db
     db.init_app(app)
+
+    # ✅ Rate limiting por token bucket (primeiro hook: rejeição sem acesso ao banco)
+    app.config['RATE_LIMIT_ENABLED'] = os.environ.get('RATE_LIMIT_ENABLED', '1').lower() in ('1', 'true', 'yes')
+    app.config['RATE_LIMIT_STORAGE'] = os.environ.get('RATE_LIMIT_STORAGE', 'memory')
+    app.config['RATE_LIMIT_RULES'] = os.environ.get('RATE_LIMIT_RULES')  # JSON: {"main.login": ["ip:10/minute"]}
+    app.config['RATE_LIMIT_TRUST_PROXY'] = os.environ.get('RATE_LIMIT_TRUST_PROXY', '').lower() in ('1', 'true', 'yes')
+    from app.rate_limiter import init_rate_limiter
+    init_rate_limiter(app)
+
+    # ✅ Profiler de queries SQL (opt-in: SQL_PROFILER=1)
+    app.config['SQL_PROFILER_ENABLED'] = os.environ.get('SQL_PROFILER', '').lower() in ('1', 'true', 'yes')
+    app.config['SQL_PROFILER_WARN_QUERIES'] = int(os.environ.get('SQL_PROFILER_WARN_QUERIES', 10))
+    from app.query_profiler import init_query_profiler
+    init_query_profiler(app)
+
+    # ✅ Profiler por amostragem (header de admin ou % do tráfego)
+    app.config['PROFILER_SAMPLE_RATE'] = float(os.environ.get('PROFILER_SAMPLE_RATE', 0))
+    app.config['PROFILER_INTERVAL_MS'] = float(os.environ.get('PROFILER_INTERVAL_MS', 5))
+    app.config['PROFILER_MAX_STACKS'] = int(os.environ.get('PROFILER_MAX_STACKS', 5000))
+    app.config['PROFILER_HEADER'] = 'X-Profile'
+    from app.sampling_profiler import init_sampling_profiler
+    init_sampling_profiler(app)
     
-    # ✅ Importar Migrate
-    try:
-        from flask_migrate import Migrate
-        migrate = Migrate(app, db)
-        print("✅ Flask-Migrate configurado")
-    except ImportError:
-        print("⚠️  Flask-Migrate não instalado (modo sem migrações)")
-        migrate = None
+    app.config['FAST_STARTUP'] = os.environ.get('FAST_STARTUP', '').lower() in ('1', 'true', 'yes')
+    # Definida pelo CLI do Flask (`flask ...` e `python -m flask ...`) antes de carregar o app
+    running_cli = os.environ.get('FLASK_RUN_FROM_CLI') == 'true'
+
+    # ✅ Threads de background e create_all: em comandos do CLI (init-db, db upgrade...) elas
+    # disputariam o banco com a migração. No CLI só sobem na primeira requisição (`flask run`)
+    deferred_startup = []
+    def on_startup(start):
+        if running_cli:
+            deferred_startup.append(start)
+        else:
+            start()
+
+    deferred_lock = threading.Lock()
+
+    @app.before_request
+    def run_deferred_startup():
+        if deferred_startup:
+            with deferred_lock:
+                while deferred_startup:
+                    deferred_startup.pop(0)()
+
+    # ✅ Importar Migrate (alembic só é carregado fora do FAST_STARTUP ou no CLI `flask db`)
+    migrate = None
+    if not app.config['FAST_STARTUP'] or running_cli:
+        try:
+            from flask_migrate import Migrate
+            migrate = Migrate(app, db)
+            print("✅ Flask-Migrate configurado")
+        except ImportError:
+            print("⚠️  Flask-Migrate não instalado (modo sem migrações)")
     
     # ✅ Inicializar Bcrypt
     from app.models import bcrypt
     bcrypt.init_app(app)
     
     # ✅ Criar tabelas se não existirem
-    with app.app_context():
-        db.create_all()
-        from app.models import AppStatistics
-        if not AppStatistics.query.first():
-            stats = AppStatistics()
-            db.session.add(stats)
-            db.session.commit()
+    # FAST_STARTUP=1 pula esta etapa no boot: rode `flask --app run init-db` no deploy
+    from app.models import init_database, upgrade_database
+    if not app.config['FAST_STARTUP']:
+        def create_tables():
+            with app.app_context():
+                init_database()
+        on_startup(create_tables)
+
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Aplica as migrações pendentes, cria as tabelas e o registro inicial de estatísticas"""
+        import click
+        if migrate is None:
+            print("⚠️  Flask-Migrate não instalado: colunas novas em tabelas existentes não serão criadas")
+        else:
+            try:
+                result = upgrade_database()
+                if result == 'created':
+                    print("✅ Schema criado")
+                else:
+                    if result.startswith('stamped:'):
+                        print(f"✅ Banco sem alembic_version marcado na revisão {result.split(':', 1)[1]}")
+                    print("✅ Migrações aplicadas")
+            except RuntimeError as e:
+                raise click.ClickException(str(e))
+        init_database()
+        print("✅ Banco de dados inicializado")
+
+    # ✅ Busca textual no histórico (índice mantido a cada inserção)
+    from app.models import GenerationHistory
+    from app.services.history_search import install_index_listener, reindex_all
+    install_index_listener(GenerationHistory)
+
+    @app.cli.command('reindex-history')
+    def reindex_history_command():
+        """Reconstrói o índice de busca a partir de todo o histórico"""
+        count = reindex_all(db.session, GenerationHistory)
+        print(f"✅ {count} registros indexados para busca")
+
+    # ✅ Contadores de gerações por usuário (listagem administrativa sem N+1)
+    from app.services.user_stats import install_stats_listener, rebuild_user_stats
+    install_stats_listener(GenerationHistory)
+
+    @app.cli.command('rebuild-user-stats')
+    def rebuild_user_stats_command():
+        """Recalcula os contadores de gerações por usuário"""
+        with db.engine.begin() as connection:
+            count = rebuild_user_stats(connection)
+        print(f"✅ Contadores recalculados para {count} usuários")
 
     # Registrar blueprints (rotas)
     from app.routes import main_bp
@@ -93,11 +195,74 @@ def create_app():
     
     # ✅ Inicializar limpeza de cache
     from app.routes import init_cache_cleaner
-    init_cache_cleaner(app)
+    on_startup(lambda: init_cache_cleaner(app))
+
+    # ✅ Aquecimento do cache (snapshot em arquivo ou histórico recente)
+    app.config['CACHE_WARMUP_ENABLED'] = os.environ.get('CACHE_WARMUP_ENABLED', '1').lower() in ('1', 'true', 'yes')
+    app.config['CACHE_WARMUP_BUDGET_SECONDS'] = float(os.environ.get('CACHE_WARMUP_BUDGET_SECONDS', 10))
+    app.config['CACHE_WARMUP_LOOKBACK_DAYS'] = int(os.environ.get('CACHE_WARMUP_LOOKBACK_DAYS', 7))
+    app.config['CACHE_WARMUP_MAX_ROWS'] = int(os.environ.get('CACHE_WARMUP_MAX_ROWS', 5000))
+    app.config['CACHE_SNAPSHOT_PATH'] = os.environ.get('CACHE_SNAPSHOT_PATH')
+    app.config['CACHE_SNAPSHOT_MAX_AGE'] = int(os.environ.get('CACHE_SNAPSHOT_MAX_AGE', 86400))
+    from app.routes import init_cache_warmup
+    on_startup(lambda: init_cache_warmup(app))
+
+    # ✅ Retenção do histórico por plano (dias; 0 = manter para sempre) e arquivamento
+    app.config['HISTORY_RETENTION_DAYS_ANONYMOUS'] = int(os.environ.get('HISTORY_RETENTION_DAYS_ANONYMOUS', 30))
+    app.config['HISTORY_RETENTION_DAYS_FREE'] = int(os.environ.get('HISTORY_RETENTION_DAYS_FREE', 180))
+    app.config['HISTORY_RETENTION_DAYS_PREMIUM'] = int(os.environ.get('HISTORY_RETENTION_DAYS_PREMIUM', 0))
+    app.config['HISTORY_ARCHIVE_ENABLED'] = os.environ.get('HISTORY_ARCHIVE_ENABLED', '').lower() in ('1', 'true', 'yes')
+    app.config['HISTORY_ARCHIVE_INTERVAL'] = int(os.environ.get('HISTORY_ARCHIVE_INTERVAL', 3600))
+    app.config['HISTORY_ARCHIVE_BATCH_SIZE'] = int(os.environ.get('HISTORY_ARCHIVE_BATCH_SIZE', 1000))
+    app.config['HISTORY_ARCHIVE_DIR'] = os.environ.get('HISTORY_ARCHIVE_DIR')
+    from app.services.retention import init_history_archiver
+    archiver = init_history_archiver(app, start=False)
+    on_startup(lambda: init_history_archiver(app))
+
+    @app.cli.command('archive-history')
+    def archive_history_command():
+        """Move para o arquivo o histórico além da retenção de cada plano"""
+        moved = archiver.run_once(db.session)
+        print(f"✅ Histórico arquivado: {moved}")
+
+
+    # ✅ Medição de tokens (agregados gravados em lote) e orçamento diário por usuário
+    app.config['TOKEN_USAGE_FLUSH_INTERVAL'] = float(os.environ.get('TOKEN_USAGE_FLUSH_INTERVAL', 30))
+    app.config['USAGE_LIMIT_MODE'] = os.environ.get('USAGE_LIMIT_MODE', 'generations')  # generations | tokens
+    app.config['TOKEN_BUDGET_DAILY_FREE'] = int(os.environ.get('TOKEN_BUDGET_DAILY_FREE', 20000))
+    app.config['TOKEN_BUDGET_DAILY_PREMIUM'] = int(os.environ.get('TOKEN_BUDGET_DAILY_PREMIUM', 0))
+    from app.services.token_usage import init_token_meter
+    on_startup(lambda: init_token_meter(app))
+
+    # ✅ Idempotency-Key nos POST de geração (repetições após timeout não geram de novo)
+    app.config['IDEMPOTENCY_TTL_SECONDS'] = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', 86400))
+    app.config['IDEMPOTENCY_WAIT_SECONDS'] = float(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', 30))
+    app.config['IDEMPOTENCY_POLL_SECONDS'] = float(os.environ.get('IDEMPOTENCY_POLL_SECONDS', 0.1))
+    # Acima do timeout do gunicorn: in_progress mais velho que isso é de um worker que caiu
+    app.config['IDEMPOTENCY_LOCK_SECONDS'] = int(os.environ.get('IDEMPOTENCY_LOCK_SECONDS', 150))
+
+    @app.cli.command('purge-idempotency-keys')
+    def purge_idempotency_keys_command():
+        """Remove as Idempotency-Keys vencidas"""
+        from app.idempotency import purge_expired
+        with db.engine.begin() as connection:
+            removed = purge_expired(connection)
+        print(f"✅ {removed} chaves de idempotência removidas")
+
+    # ✅ Probes de saúde (/livez, /readyz) com verificações em background
+    app.config['HEALTH_CHECK_INTERVAL'] = float(os.environ.get('HEALTH_CHECK_INTERVAL', 5))
+    app.config['HEALTH_STATS_INTERVAL'] = float(os.environ.get('HEALTH_STATS_INTERVAL', 60))
+    app.config['HEALTH_CHECK_AI'] = os.environ.get('HEALTH_CHECK_AI', '').lower() in ('1', 'true', 'yes')
+    # Sob o preload do gunicorn o master não atende requisições: a thread só sobe nos workers (post_fork)
+    app.config['HEALTH_MONITOR_DEFERRED'] = os.environ.get('HEALTH_MONITOR_DEFERRED', '').lower() in ('1', 'true', 'yes')
+    from app.health import init_health_monitor
+    init_health_monitor(app, start=False)
+    if not app.config['HEALTH_MONITOR_DEFERRED']:
+        on_startup(lambda: init_health_monitor(app))
     
     print("✅ Aplicação Flask configurada com sucesso!")
     print("🔧 Modo:", "Desenvolvimento" if os.environ.get('FLASK_ENV') == 'development' else "Produção")
-    print("🗄️  Banco de dados:", app.config['SQLALCHEMY_DATABASE_URI'])
+    print("🗄️  Banco de dados:", make_url(app.config['SQLALCHEMY_DATABASE_URI']).render_as_string(hide_password=True))
     print("🔐 JWT Configurado:", app.config['JWT_SECRET_KEY'] is not None)
     
     return app
\ No newline at end of file
@@ -0,0 +1,55 @@
+"""Compressão negociada (gzip/brotli) das respostas dinâmicas"""
+import gzip
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/x-ndjson',
+    'text/plain',
+    'text/csv',
+    'text/html'
+}
+
+
+def _compress(data, encoding, level):
+    if encoding == 'br':
+        # Qualidade baixa: respostas dinâmicas precisam de compressão rápida
+        return brotli.compress(data, quality=4)
+    return gzip.compress(data, compresslevel=level)
+
+
+def init_compression(app):
+    """Comprime respostas acima de COMPRESS_MIN_SIZE conforme o Accept-Encoding"""
+    if not app.config.get('COMPRESS_ENABLED'):
+        return
+
+    min_size = app.config['COMPRESS_MIN_SIZE']
+    level = app.config['COMPRESS_LEVEL']
+    encodings = ['br', 'gzip'] if brotli is not None else ['gzip']
+
+    @app.after_request
+    def _compress_response(response):
+        if (response.status_code < 200 or response.status_code in (204, 304)
+                or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(encodings)
+        if encoding is None:
+            return response
+
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+
+        response.set_data(_compress(data, encoding, level))
+        response.headers['Content-Encoding'] = encoding
+        return response
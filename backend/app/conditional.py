@@ -0,0 +1,82 @@
+"""GET condicional (ETag / Last-Modified) para endpoints de leitura
+
+Cada endpoint informa um validador barato (ex.: o registro mais recente do
+histórico do usuário, o updated_at do usuário) em vez do corpo inteiro. Se o
+cliente já tem a versão atual (If-None-Match ou If-Modified-Since), a resposta
+é 304 sem executar a consulta completa nem a serialização.
+
+ETags são fracas: o corpo pode sair comprimido ou não (compression.py), mas o
+conteúdo é o mesmo.
+"""
+import hashlib
+from datetime import timezone
+from functools import wraps
+
+from flask import Response, jsonify, make_response, request
+from werkzeug.http import http_date, parse_date
+
+
+def make_etag(*parts):
+    """ETag fraca a partir das partes do validador e da query string"""
+    raw = '|'.join(str(part) for part in parts) + '|' + request.query_string.decode('latin-1')
+    return f'W/"{hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]}"'
+
+
+def _etag_matches(if_none_match, etag):
+    if if_none_match.strip() == '*':
+        return True
+    # Comparação fraca: W/"x" e "x" são equivalentes
+    candidates = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+    return etag.removeprefix('W/') in candidates
+
+
+def _not_modified(etag, last_modified):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        # Com If-None-Match, If-Modified-Since é ignorado (RFC 9110)
+        return _etag_matches(if_none_match, etag)
+    since = parse_date(request.headers.get('If-Modified-Since'))
+    if since is None or last_modified is None:
+        return False
+    return last_modified.replace(microsecond=0) <= since
+
+
+def conditional(validator, private=True):
+    """Decorator: validator(*args, **kwargs) -> (etag, last_modified em UTC ou None)
+
+    Use abaixo do @jwt_required() para que o validador já tenha a identidade.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                etag, last_modified = validator(*args, **kwargs)
+            except Exception as e:
+                return jsonify({"error": f"Erro interno: {str(e)}"}), 500
+            if last_modified is not None and last_modified.tzinfo is None:
+                last_modified = last_modified.replace(tzinfo=timezone.utc)
+
+            # Sempre revalida; respostas por usuário não ficam em caches compartilhados
+            headers = {'ETag': etag, 'Cache-Control': 'private, no-cache' if private else 'no-cache'}
+            if last_modified is not None:
+                headers['Last-Modified'] = http_date(last_modified)
+
+            if _not_modified(etag, last_modified):
+                response = Response(status=304, headers=headers)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                response.headers.update(headers)
+            if private:
+                response.vary.add('Authorization')
+            return response
+        return wrapper
+    return decorator
+
+
+def latest(*values):
+    """Maior data entre as informadas (ignora None)"""
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
@@ -0,0 +1,147 @@
+"""Probes de saúde baratos (/livez, /readyz) e snapshot das estatísticas
+
+Monitores e health checks da plataforma batem nesses endpoints o tempo todo.
+Nenhuma requisição toca o banco: uma thread por worker roda as verificações
+(SELECT 1 e estado do provedor de IA) a cada HEALTH_CHECK_INTERVAL e, com
+menos frequência, recalcula as estatísticas de /api/health. As rotas só leem
+o último resultado. Se a própria verificação travar (banco pendurado), o
+resultado envelhece e o /readyz passa a responder 503 em vez de dar timeout.
+Até a thread produzir o primeiro snapshot, as estatísticas saem como None.
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+
+
+class HealthMonitor:
+    def __init__(self, interval=5, stats_interval=60, check_ai=False):
+        self.interval = interval
+        self.stats_interval = stats_interval
+        self.check_ai = check_ai
+        # Resultado mais velho que isso indica verificação travada
+        self.stale_after = interval * 3
+        self._lock = threading.Lock()
+        self._checks = None
+        self._checked_at = None
+        self._statistics = None
+        self._statistics_at = None
+
+    # ---------- verificações ----------
+
+    def _check_database(self, db):
+        start = time.perf_counter()
+        try:
+            db.session.execute(text('SELECT 1'))
+            return {'ok': True, 'latency_ms': round((time.perf_counter() - start) * 1000, 1)}
+        except Exception as e:
+            return {'ok': False, 'error': str(e)[:200]}
+        finally:
+            db.session.remove()
+
+    def _check_ai(self, ai_service):
+        # Sem IA o app continua servindo pelo gerador local: não afeta a prontidão
+        result = {
+            'ok': True,
+            'critical': False,
+            'provider': ai_service.provider,
+            'fallback_mode': ai_service.fallback_mode
+        }
+        if self.check_ai and not ai_service.fallback_mode and hasattr(ai_service.model, 'count_tokens'):
+            start = time.perf_counter()
+            try:
+                ai_service.model.count_tokens('ping')
+                result['latency_ms'] = round((time.perf_counter() - start) * 1000, 1)
+            except Exception as e:
+                result.update(ok=False, error=str(e)[:200])
+        return result
+
+    def _compute_statistics(self, db):
+        from app.models import AppStatistics, User
+        try:
+            stats = AppStatistics.query.first()
+            return {
+                'total_users': User.query.count(),
+                'total_ideas': stats.total_ideas_generated if stats else 0,
+                'total_scripts': stats.total_scripts_generated if stats else 0,
+                'total_feedbacks': stats.total_feedbacks if stats else 0
+            }
+        finally:
+            db.session.remove()
+
+    def run_checks(self, app):
+        """Executa as verificações e guarda o resultado (chamado pela thread)"""
+        from app.models import db
+        from app.services.ai_service import ai_service
+        with app.app_context():
+            checks = {'database': self._check_database(db), 'ai': self._check_ai(ai_service)}
+            with self._lock:
+                self._checks = checks
+                self._checked_at = time.time()
+            if self._statistics_at is None or time.time() - self._statistics_at >= self.stats_interval:
+                self.refresh_statistics(app)
+
+    def refresh_statistics(self, app):
+        from app.models import db
+        with app.app_context():
+            statistics = self._compute_statistics(db)
+        with self._lock:
+            self._statistics = statistics
+            self._statistics_at = time.time()
+        return statistics
+
+    # ---------- leitura pelas rotas ----------
+
+    def readiness(self):
+        """(pronto?, payload) a partir do último resultado, sem I/O"""
+        with self._lock:
+            checks, checked_at = self._checks, self._checked_at
+        if checks is None:
+            return False, {'status': 'starting', 'checks': {}}
+        age = time.time() - checked_at
+        stale = age > self.stale_after
+        ready = not stale and all(check['ok'] for check in checks.values() if check.get('critical', True))
+        return ready, {
+            'status': 'ready' if ready else ('stale' if stale else 'unavailable'),
+            'checks': checks,
+            'checked_at': datetime.utcfromtimestamp(checked_at).isoformat(),
+            'age_seconds': round(age, 1)
+        }
+
+    def statistics(self):
+        """Último snapshot, ou (None, None) enquanto a thread não produziu nenhum"""
+        with self._lock:
+            statistics, statistics_at = self._statistics, self._statistics_at
+        if statistics is None:
+            return None, None
+        return statistics, datetime.utcfromtimestamp(statistics_at).isoformat()
+
+
+def init_health_monitor(app, start=True):
+    """Cria o monitor e inicia a thread de verificações (start=False só cria)"""
+    monitor = app.extensions.get('health_monitor')
+    if monitor is None:
+        monitor = HealthMonitor(
+            interval=app.config['HEALTH_CHECK_INTERVAL'],
+            stats_interval=app.config['HEALTH_STATS_INTERVAL'],
+            check_ai=app.config['HEALTH_CHECK_AI']
+        )
+        app.extensions['health_monitor'] = monitor
+
+    # Após o fork do gunicorn (preload) o post_fork zera a flag: threads não sobrevivem ao fork
+    if start and not getattr(app, 'health_monitor_started', False):
+        threading.Thread(target=_monitor_loop, args=(app, monitor), daemon=True).start()
+        app.health_monitor_started = True
+        print(f"✅ Verificações de saúde em background (a cada {monitor.interval}s)")
+    return monitor
+
+
+def _monitor_loop(app, monitor):
+    while True:
+        try:
+            monitor.run_checks(app)
+        except Exception as e:
+            logging.warning(f"Falha nas verificações de saúde: {e}")
+        time.sleep(monitor.interval)
@@ -0,0 +1,170 @@
+"""Idempotency-Key para os POST de geração
+
+Clientes que repetem a requisição após um timeout mandam o mesmo header
+Idempotency-Key. Por (usuário ou IP, chave) o primeiro pedido grava uma
+linha "in_progress" em idempotency_keys (INSERT em transação própria: a
+chave primária resolve a corrida entre duplicatas) e executa a view. Ao
+terminar com 2xx, guarda status e corpo da resposta:
+
+- duplicata concorrente: espera a primeira terminar (até
+  IDEMPOTENCY_WAIT_SECONDS) e devolve a mesma resposta, ou 409
+- duplicata posterior: resposta gravada reenviada sem efeito colateral
+  (sem limite de uso, IA, histórico ou estatísticas)
+- mesma chave com outro endpoint ou outro corpo: 422
+
+Respostas de erro não ficam gravadas (a linha é removida e o cliente pode
+repetir com a mesma chave). Linhas "in_progress" mais velhas que
+IDEMPOTENCY_LOCK_SECONDS são de um processo que caiu e podem ser assumidas;
+o created_at de quem assumiu identifica o dono, então a requisição antiga,
+se ainda terminar, não grava nem apaga a linha do novo dono.
+As chaves expiram após IDEMPOTENCY_TTL_SECONDS; as vencidas são removidas
+aos poucos nas inserções e por `flask purge-idempotency-keys`.
+"""
+import hashlib
+import random
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import Response, current_app, jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+# Fração das inserções que também removem chaves vencidas
+PURGE_PROBABILITY = 0.01
+
+
+def _table():
+    from app.models import IdempotencyKey
+    return IdempotencyKey.__table__
+
+
+def _scope():
+    identity = get_jwt_identity()
+    return f"user:{identity}" if identity else f"ip:{request.remote_addr}"
+
+
+def _fingerprint():
+    return hashlib.sha256(request.get_data()).hexdigest()
+
+
+def purge_expired(connection, now=None):
+    """Remove as chaves vencidas; retorna quantas"""
+    table = _table()
+    return connection.execute(delete(table).where(table.c.expires_at < (now or datetime.utcnow()))).rowcount
+
+
+def _try_claim(engine, scope, key, fingerprint, now):
+    """INSERT da linha in_progress; retorna o created_at gravado ou None se a chave já existe"""
+    table = _table()
+    ttl = timedelta(seconds=current_app.config['IDEMPOTENCY_TTL_SECONDS'])
+    try:
+        with engine.begin() as connection:
+            connection.execute(insert(table).values(
+                scope=scope, key=key, endpoint=request.endpoint, request_hash=fingerprint,
+                status='in_progress', created_at=now, expires_at=now + ttl
+            ))
+            if random.random() < PURGE_PROBABILITY:
+                purge_expired(connection, now)
+        return now
+    except IntegrityError:
+        return None
+
+
+def _take_over(engine, scope, key, fingerprint, row, now):
+    """Assume uma chave vencida ou abandonada (UPDATE condicional: só um processo vence)
+
+    Retorna o novo created_at ou None se outro processo assumiu antes.
+    """
+    table = _table()
+    ttl = timedelta(seconds=current_app.config['IDEMPOTENCY_TTL_SECONDS'])
+    with engine.begin() as connection:
+        result = connection.execute(update(table).where(
+            table.c.scope == scope, table.c.key == key, table.c.created_at == row.created_at
+        ).values(
+            endpoint=request.endpoint, request_hash=fingerprint, status='in_progress',
+            response_status=None, response_body=None, created_at=now, expires_at=now + ttl
+        ))
+    return now if result.rowcount == 1 else None
+
+
+def _load(engine, scope, key):
+    table = _table()
+    with engine.connect() as connection:
+        return connection.execute(select(table).where(table.c.scope == scope, table.c.key == key)).first()
+
+
+def _replay(row):
+    response = Response(row.response_body, status=row.response_status, mimetype='application/json')
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _finish(engine, scope, key, claimed_at, response):
+    table = _table()
+    # Só a linha que esta requisição gravou/assumiu (pode ter sido assumida por outra depois do lock)
+    where = (table.c.scope == scope, table.c.key == key, table.c.created_at == claimed_at)
+    with engine.begin() as connection:
+        if response is not None and 200 <= response.status_code < 300:
+            connection.execute(update(table).where(*where).values(
+                status='completed', response_status=response.status_code,
+                response_body=response.get_data(as_text=True)
+            ))
+        else:
+            connection.execute(delete(table).where(*where))
+
+
+def idempotent(view):
+    """Decorator para POST com Idempotency-Key opcional (use abaixo do @jwt_required)"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({"error": f"{HEADER} deve ter no máximo {MAX_KEY_LENGTH} caracteres"}), 400
+
+        from app.models import db
+        engine = db.engine
+        scope = _scope()
+        fingerprint = _fingerprint()
+        config = current_app.config
+        deadline = time.monotonic() + config['IDEMPOTENCY_WAIT_SECONDS']
+
+        while True:
+            claimed_at = _try_claim(engine, scope, key, fingerprint, datetime.utcnow())
+            if claimed_at is not None:
+                break
+            row = _load(engine, scope, key)
+            now = datetime.utcnow()
+            # row None: removida entre o INSERT e a leitura; tenta de novo após o intervalo
+            if row is not None:
+                if row.expires_at < now:
+                    claimed_at = _take_over(engine, scope, key, fingerprint, row, now)
+                else:
+                    if row.endpoint != request.endpoint or row.request_hash != fingerprint:
+                        return jsonify({"error": f"{HEADER} já usada com outra requisição"}), 422
+                    if row.status == 'completed':
+                        return _replay(row)
+                    if row.created_at < now - timedelta(seconds=config['IDEMPOTENCY_LOCK_SECONDS']):
+                        # A primeira requisição não terminou nem liberou a chave (processo caiu)
+                        claimed_at = _take_over(engine, scope, key, fingerprint, row, now)
+                if claimed_at is not None:
+                    break
+            if time.monotonic() >= deadline:
+                response = jsonify({"error": "Requisição original ainda em processamento. Tente novamente."})
+                response.status_code = 409
+                response.headers['Retry-After'] = '1'
+                return response
+            time.sleep(config['IDEMPOTENCY_POLL_SECONDS'])
+
+        response = None
+        try:
+            response = make_response(view(*args, **kwargs))
+            return response
+        finally:
+            _finish(engine, scope, key, claimed_at, response)
+    return wrapper
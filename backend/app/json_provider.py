@@ -0,0 +1,58 @@
+"""Provider JSON do Flask com encoder rápido (orjson) quando disponível"""
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional: cai no json da stdlib
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Serializa respostas sem ordenar chaves, compacto em produção.
+
+    Com orjson instalado a resposta é gerada direto em bytes; datas continuam
+    passando pelo ``default`` do Flask, então o formato é o mesmo da stdlib.
+    Objetos que o orjson não suporta (ex.: inteiros > 64 bits) caem na stdlib.
+    """
+
+    sort_keys = False
+    ensure_ascii = False
+
+    def _is_compact(self):
+        return self.compact is True or (self.compact is None and not self._app.debug)
+
+    def _orjson_bytes(self, obj, indent=False):
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            try:
+                return self._orjson_bytes(obj)[:-1].decode('utf-8')
+            except TypeError:
+                pass
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        compact = self._is_compact()
+
+        if orjson is not None:
+            try:
+                body = self._orjson_bytes(obj, indent=not compact)
+                return self._app.response_class(body, mimetype=self.mimetype)
+            except TypeError:
+                pass
+
+        dump_args = {'separators': (',', ':')} if compact else {'indent': 2}
+        return self._app.response_class(
+            f"{super().dumps(obj, **dump_args)}\n", mimetype=self.mimetype
+        )
+
@@ -2,6 +2,7 @@ from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from flask_bcrypt import Bcrypt
 import json
+import zlib
 
 db = SQLAlchemy()
 bcrypt = Bcrypt()
@@ -13,10 +14,14 @@ class User(db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(128), nullable=False)
     name = db.Column(db.String(100))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     is_premium = db.Column(db.Boolean, default=False)
     is_admin = db.Column(db.Boolean, default=False)
-    last_login = db.Column(db.DateTime)
+    last_login = db.Column(db.DateTime, index=True)
+    # Validador do GET condicional de /api/auth/me e /api/statistics (muda a cada UPDATE via ORM)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    # Orçamento diário de tokens próprio (NULL = o do plano; só vale com USAGE_LIMIT_MODE=tokens)
+    token_budget_daily = db.Column(db.Integer)
     
     # Relação com histórico
     generations = db.relationship('GenerationHistory', backref='user', lazy=True)
@@ -48,6 +53,13 @@ class GenerationHistory(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))  # ✅ Nova relação
     user_session = db.Column(db.String(100))
     
+    # ✅ Índices para as consultas por intervalo de data (limites de uso, estatísticas, retenção)
+    __table_args__ = (
+        db.Index('ix_generation_history_user_created', 'user_id', 'created_at'),
+        db.Index('ix_generation_history_session_created', 'user_session', 'created_at'),
+        db.Index('ix_generation_history_created_at', 'created_at'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -57,6 +69,31 @@ class GenerationHistory(db.Model):
             'user_id': self.user_id
         }
 
+class GenerationHistoryArchive(db.Model):
+    """Histórico antigo movido pelo arquivador (data comprimido com zlib)"""
+    __tablename__ = 'generation_history_archive'
+    
+    # created_at faz parte da chave: no Postgres a tabela é particionada por mês
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    created_at = db.Column(db.DateTime, primary_key=True)
+    type = db.Column(db.String(20), nullable=False)
+    data = db.Column(db.LargeBinary, nullable=False)
+    user_id = db.Column(db.Integer, index=True)
+    user_session = db.Column(db.String(100))
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = {'postgresql_partition_by': 'RANGE (created_at)'}
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'type': self.type,
+            'data': json.loads(zlib.decompress(self.data)),
+            'created_at': self.created_at.isoformat(),
+            'user_id': self.user_id,
+            'archived': True
+        }
+
 class UserFeedback(db.Model):
     __tablename__ = 'user_feedback'
     
@@ -74,6 +111,49 @@ class UserFeedback(db.Model):
             'created_at': self.created_at.isoformat()
         }
 
+class UserGenerationStats(db.Model):
+    """Contadores de gerações por usuário, mantidos a cada inserção no histórico"""
+    __tablename__ = 'user_generation_stats'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    ideas_count = db.Column(db.Integer, nullable=False, default=0)
+    scripts_count = db.Column(db.Integer, nullable=False, default=0)
+    last_generation_at = db.Column(db.DateTime)
+
+class TokenUsage(db.Model):
+    """Tokens agregados por dia, usuário (0 = anônimo), plano, endpoint, template e modelo"""
+    __tablename__ = 'token_usage'
+    
+    day = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    tier = db.Column(db.String(20), primary_key=True)
+    endpoint = db.Column(db.String(64), primary_key=True)
+    template = db.Column(db.String(32), primary_key=True)
+    model = db.Column(db.String(100), primary_key=True)
+    calls = db.Column(db.Integer, nullable=False, default=0)
+    input_tokens = db.Column(db.BigInteger, nullable=False, default=0)
+    output_tokens = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Orçamento por usuário: soma do dia pelo índice (user_id, day)
+    __table_args__ = (
+        db.Index('ix_token_usage_user_day', 'user_id', 'day'),
+    )
+
+class IdempotencyKey(db.Model):
+    """Estado e resposta dos POST com Idempotency-Key, por usuário (ou IP) e chave"""
+    __tablename__ = 'idempotency_keys'
+    
+    scope = db.Column(db.String(64), primary_key=True)  # "user:<id>" ou "ip:<endereço>"
+    key = db.Column(db.String(255), primary_key=True)
+    endpoint = db.Column(db.String(64), nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(20), nullable=False)  # in_progress | completed
+    response_status = db.Column(db.Integer)
+    response_body = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
 class AppStatistics(db.Model):
     __tablename__ = 'app_statistics'
     
@@ -89,4 +169,80 @@ class AppStatistics(db.Model):
             'total_scripts_generated': self.total_scripts_generated,
             'total_feedbacks': self.total_feedbacks,
             'last_updated': self.last_updated.isoformat()
-        }
\ No newline at end of file
+        }
+
+# Marcas que cada migração deixa no schema ("tabela" ou "tabela.coluna"), na ordem da cadeia
+SCHEMA_MARKERS = [
+    ('6249e8d7aa53', ['users.is_admin', 'generation_history.user_id']),
+    ('b3f1c2d4e5a6', ['generation_history_search|generation_history_fts']),
+    ('c4a2d3e5f6b7', ['generation_history_archive']),
+    ('d5b3e4f6a7c8', ['user_generation_stats']),
+    ('e6c4f5a7b8d9', ['token_usage', 'users.token_budget_daily']),
+    ('f7d6e5a8b9c0', ['users.updated_at']),
+    ('a8e7f6b9c0d1', ['idempotency_keys']),
+]
+
+def _has_marker(inspector, marker):
+    for option in marker.split('|'):
+        table, _, column = option.partition('.')
+        if inspector.has_table(table) and (
+            not column or column in {c['name'] for c in inspector.get_columns(table)}
+        ):
+            return True
+    return False
+
+def detect_revision(inspector):
+    """Revisão em que está um banco sem alembic_version (criado pelo create_all)
+
+    É a última revisão cujas marcas, e as de todas as anteriores, existem. Se
+    alguma revisão posterior já deixou marcas (schema misto) não há como
+    saber o que falta: levanta RuntimeError.
+    """
+    present = [all(_has_marker(inspector, m) for m in markers) for _, markers in SCHEMA_MARKERS]
+    prefix = present.index(False) if False in present else len(present)
+    partial = [
+        revision for revision, markers in SCHEMA_MARKERS[prefix:]
+        if any(_has_marker(inspector, m) for m in markers)
+    ]
+    if prefix == 0 or partial:
+        raise RuntimeError(
+            "Banco sem alembic_version e com schema inesperado"
+            + (f" (marcas parciais de {', '.join(partial)})" if partial else "")
+            + ": marque a revisão em que ele está com `flask db stamp <revisão>`"
+        )
+    return SCHEMA_MARKERS[prefix - 1][0]
+
+def upgrade_database():
+    """Aplica as migrações pendentes (chamar antes do init_database)
+
+    create_all() só cria as tabelas que faltam: colunas novas em tabelas que já
+    existem (ex.: users.token_budget_daily) só chegam pelas migrações. Um banco
+    vazio é criado pelo create_all já no schema atual e apenas marcado com a
+    última revisão. Um banco criado antes das migrações (sem alembic_version)
+    é marcado com a revisão detectada pelo schema e então atualizado. Retorna
+    'created', 'stamped:<revisão>' ou 'upgraded'.
+    """
+    from flask_migrate import stamp, upgrade
+    from sqlalchemy import inspect
+    inspector = inspect(db.engine)
+    if not inspector.has_table('users'):
+        db.create_all()
+        stamp()
+        return 'created'
+    result = 'upgraded'
+    if not inspector.has_table('alembic_version'):
+        revision = detect_revision(inspector)
+        stamp(revision=revision)
+        result = f'stamped:{revision}'
+    upgrade()
+    return result
+
+def init_database():
+    """Cria as tabelas e o registro inicial de estatísticas (idempotente)"""
+    from app.services.history_search import ensure_search_index
+    db.create_all()
+    with db.engine.begin() as connection:
+        ensure_search_index(connection)
+    if not AppStatistics.query.first():
+        db.session.add(AppStatistics())
+        db.session.commit()
@@ -0,0 +1,211 @@
+"""Profiler de queries SQL por requisição e detector de N+1 (opt-in)"""
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+_THIS_FILE = os.path.abspath(__file__)
+
+_local = threading.local()
+_listeners_lock = threading.Lock()
+_listeners_installed = False
+
+
+class QueryProfile:
+    """Coleta as queries executadas em um escopo (requisição ou bloco de teste)"""
+
+    def __init__(self):
+        self.queries = []
+
+    def add(self, statement, parameters, duration, call_site):
+        self.queries.append({
+            'statement': statement,
+            'parameters': repr(parameters),
+            'duration_ms': round(duration * 1000, 3),
+            'call_site': call_site
+        })
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def total_time_ms(self):
+        return round(sum(q['duration_ms'] for q in self.queries), 3)
+
+    def repeated_statements(self):
+        """Statements executados mais de uma vez (candidatos a N+1)"""
+        counts = Counter(q['statement'] for q in self.queries)
+        return {statement: n for statement, n in counts.items() if n > 1}
+
+    def duplicate_queries(self):
+        """Queries idênticas (mesmo SQL e mesmos parâmetros) repetidas"""
+        counts = Counter((q['statement'], q['parameters']) for q in self.queries)
+        return {key: n for key, n in counts.items() if n > 1}
+
+    def summary(self):
+        repeated = self.repeated_statements()
+        return {
+            'count': self.count,
+            'total_time_ms': self.total_time_ms,
+            'repeated': [
+                {
+                    'statement': statement,
+                    'times': n,
+                    'call_sites': sorted({q['call_site'] for q in self.queries if q['statement'] == statement})
+                }
+                for statement, n in repeated.items()
+            ],
+            'duplicates': sum(n - 1 for n in self.duplicate_queries().values())
+        }
+
+    def header_value(self):
+        return "count={};time_ms={};repeated={};duplicates={}".format(
+            self.count,
+            self.total_time_ms,
+            len(self.repeated_statements()),
+            sum(n - 1 for n in self.duplicate_queries().values())
+        )
+
+    def format_report(self):
+        lines = [f"{self.count} queries em {self.total_time_ms}ms"]
+        for i, q in enumerate(self.queries, 1):
+            statement = ' '.join(q['statement'].split())
+            lines.append(f"  {i}. [{q['duration_ms']}ms] {q['call_site']}: {statement}")
+        return '\n'.join(lines)
+
+
+def _active_profiles():
+    if not hasattr(_local, 'profiles'):
+        _local.profiles = []
+    return _local.profiles
+
+
+def _call_site():
+    """Primeiro frame dentro de app/ fora deste módulo"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(APP_DIR) and filename != _THIS_FILE:
+            return f"{os.path.relpath(filename, APP_DIR)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return 'desconhecido'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not _active_profiles():
+        return
+    conn.info.setdefault('query_profiler_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profiles = _active_profiles()
+    starts = conn.info.get('query_profiler_start')
+    if not profiles or not starts:
+        return
+    duration = time.perf_counter() - starts.pop()
+    call_site = _call_site()
+    for profile in profiles:
+        profile.add(statement, parameters, duration, call_site)
+
+
+def install_listeners():
+    """Registra os eventos do SQLAlchemy uma única vez por processo"""
+    global _listeners_installed
+    with _listeners_lock:
+        if _listeners_installed:
+            return
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _listeners_installed = True
+
+
+@contextmanager
+def profile_queries():
+    """Coleta as queries executadas pela thread atual dentro do bloco"""
+    install_listeners()
+    profile = QueryProfile()
+    profiles = _active_profiles()
+    profiles.append(profile)
+    try:
+        yield profile
+    finally:
+        profiles.remove(profile)
+
+
+# ======================
+# HELPERS DE TESTE
+# ======================
+
+@contextmanager
+def query_budget(max_queries, max_duplicates=0):
+    """Falha se o bloco executar mais queries que o orçamento permitido"""
+    with profile_queries() as profile:
+        yield profile
+    duplicates = sum(n - 1 for n in profile.duplicate_queries().values())
+    if profile.count > max_queries or duplicates > max_duplicates:
+        raise AssertionError(
+            f"Orçamento de queries excedido: {profile.count} queries (máx. {max_queries}), "
+            f"{duplicates} duplicadas (máx. {max_duplicates})\n{profile.format_report()}"
+        )
+
+
+def assert_query_budget(client, method, url, max_queries, max_duplicates=0, **kwargs):
+    """Executa uma requisição no test client e valida o orçamento de queries do endpoint"""
+    with query_budget(max_queries, max_duplicates):
+        response = client.open(url, method=method, **kwargs)
+    return response
+
+
+# ======================
+# INTEGRAÇÃO COM FLASK
+# ======================
+
+def init_query_profiler(app):
+    """Ativa o profiler por requisição quando SQL_PROFILER_ENABLED estiver ligado"""
+    if not app.config.get('SQL_PROFILER_ENABLED'):
+        return
+
+    install_listeners()
+
+    @app.before_request
+    def _start_query_profile():
+        profile = QueryProfile()
+        _active_profiles().append(profile)
+        request.environ['contentai.query_profile'] = profile
+
+    @app.after_request
+    def _report_query_profile(response):
+        profile = request.environ.get('contentai.query_profile')
+        if profile is None:
+            return response
+
+        response.headers['X-SQL-Profile'] = profile.header_value()
+        repeated = profile.repeated_statements()
+        if repeated or profile.count > app.config['SQL_PROFILER_WARN_QUERIES']:
+            logger.warning(
+                "⚠️  %s %s -> %s\n%s",
+                request.method, request.path, profile.header_value(), profile.format_report()
+            )
+        else:
+            logger.debug("%s %s -> %s", request.method, request.path, profile.header_value())
+        return response
+
+    @app.teardown_request
+    def _stop_query_profile(exc):
+        profile = request.environ.pop('contentai.query_profile', None)
+        profiles = _active_profiles()
+        if profile in profiles:
+            profiles.remove(profile)
+
+    print("✅ Profiler de queries SQL ativado")
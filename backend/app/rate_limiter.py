@@ -0,0 +1,386 @@
+"""Rate limiting por token bucket (por IP e por usuário), configurado por rota
+
+Os buckets ficam em um "store" plugável:
+- MemoryStore: processo único (padrão)
+- SQLiteStore: compartilhado entre workers da mesma máquina
+- RedisStore: compartilhado entre máquinas (qualquer cliente compatível com redis-py;
+  FakeRedis serve para testes e desenvolvimento local)
+
+A verificação roda antes de qualquer outro hook e não toca no banco de dados:
+o usuário é identificado decodificando o JWT, sem buscar o registro.
+"""
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from flask import request, jsonify
+
+try:
+    from redis.exceptions import WatchError
+except ImportError:  # redis é opcional
+    class WatchError(Exception):
+        pass
+
+
+PERIODS = {
+    'second': 1,
+    'minute': 60,
+    'hour': 3600,
+    'day': 86400
+}
+
+# Regras padrão por endpoint: "<escopo>:<limite>/<período>"
+DEFAULT_RATE_LIMITS = {
+    'main.login': ['ip:10/minute', 'ip:50/hour'],
+    'main.register': ['ip:5/minute'],
+    'main.generate_ideas': ['ip:20/minute', 'user:10/minute'],
+    'main.generate_script': ['ip:20/minute', 'user:10/minute'],
+    'main.api_feedback': ['ip:10/minute'],
+    'main.export_user_history': ['user:5/minute'],
+    'main.emergency_make_admin': ['ip:3/minute']
+}
+
+
+class RateLimitRule:
+    def __init__(self, scope, limit, period):
+        if scope not in ('ip', 'user'):
+            raise ValueError(f"Escopo de rate limit inválido: {scope}")
+        self.scope = scope
+        self.limit = limit
+        self.period = period
+        self.rate = limit / period
+
+    @classmethod
+    def parse(cls, spec):
+        """Converte 'ip:10/minute' (ou 'user:5/30') em uma regra"""
+        scope, _, amount = spec.partition(':')
+        limit, _, period = amount.partition('/')
+        seconds = PERIODS.get(period.strip()) or float(period)
+        return cls(scope.strip(), int(limit), seconds)
+
+    def __repr__(self):
+        return f"RateLimitRule({self.scope}:{self.limit}/{self.period}s)"
+
+
+def _refill(tokens, updated, capacity, rate, now):
+    return min(capacity, tokens + max(0.0, now - updated) * rate)
+
+
+def _take(tokens, capacity, rate, cost):
+    """Retorna (permitido, tokens restantes, segundos até poder tentar de novo)
+
+    Custo negativo devolve tokens (estorno), sem passar da capacidade.
+    """
+    if tokens >= cost:
+        return True, min(capacity, tokens - cost), 0.0
+    return False, tokens, (cost - tokens) / rate
+
+
+# ======================
+# STORES
+# ======================
+
+class MemoryStore:
+    """Buckets em memória (um processo)"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, rate, cost=1, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = _refill(tokens, updated, capacity, rate, now)
+            allowed, tokens, retry_after = _take(tokens, capacity, rate, cost)
+            if len(self._buckets) >= self.max_keys and key not in self._buckets:
+                self._evict_full(now)
+            self._buckets[key] = (tokens, now)
+        return allowed, tokens, retry_after
+
+    def _evict_full(self, now):
+        # Buckets parados há mais de 1h já estão cheios e podem ser recriados
+        stale = [k for k, (_, updated) in self._buckets.items() if now - updated > 3600]
+        for k in stale or list(self._buckets)[:len(self._buckets) // 10 or 1]:
+            del self._buckets[k]
+
+
+class SQLiteStore:
+    """Buckets em um arquivo SQLite compartilhado entre os workers da máquina"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS rate_limit_buckets '
+            '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)'
+        )
+
+    def _connection(self):
+        # Conexões não são compartilhadas entre processos (fork do gunicorn)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def consume(self, key, capacity, rate, cost=1, now=None):
+        now = time.time() if now is None else now
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?', (key,)
+            ).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens = _refill(tokens, updated, capacity, rate, now)
+            allowed, tokens, retry_after = _take(tokens, capacity, rate, cost)
+            conn.execute(
+                'INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated) VALUES (?, ?, ?)',
+                (key, tokens, now)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return allowed, tokens, retry_after
+
+
+class RedisStore:
+    """Buckets em Redis com transação otimista (WATCH/MULTI)"""
+
+    def __init__(self, client, prefix='ratelimit:'):
+        self.client = client
+        self.prefix = prefix
+
+    def consume(self, key, capacity, rate, cost=1, now=None):
+        now = time.time() if now is None else now
+        key = self.prefix + key
+        ttl = int(math.ceil(capacity / rate)) + 1
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    tokens, updated = pipe.hmget(key, 'tokens', 'updated')
+                    if tokens is None:
+                        tokens, updated = capacity, now
+                    tokens = _refill(float(tokens), float(updated), capacity, rate, now)
+                    allowed, tokens, retry_after = _take(tokens, capacity, rate, cost)
+                    pipe.multi()
+                    pipe.hset(key, mapping={'tokens': tokens, 'updated': now})
+                    pipe.expire(key, ttl)
+                    pipe.execute()
+                    return allowed, tokens, retry_after
+                except WatchError:
+                    continue
+
+
+class FakeRedis:
+    """Subconjunto local da API do redis-py usado pelo RedisStore"""
+
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+        self._versions = {}
+        self._lock = threading.RLock()
+
+    def _expire_if_needed(self, key):
+        deadline = self._expires.get(key)
+        if deadline is not None and deadline <= time.time():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+            self._versions[key] = self._versions.get(key, 0) + 1
+
+    def hmget(self, key, *fields):
+        with self._lock:
+            self._expire_if_needed(key)
+            value = self._data.get(key, {})
+            return [value.get(field) for field in fields]
+
+    def hset(self, key, mapping):
+        with self._lock:
+            self._data.setdefault(key, {}).update({k: str(v) for k, v in mapping.items()})
+            self._versions[key] = self._versions.get(key, 0) + 1
+
+    def expire(self, key, seconds):
+        with self._lock:
+            self._expires[key] = time.time() + seconds
+
+    def pipeline(self):
+        return _FakePipeline(self)
+
+
+class _FakePipeline:
+    def __init__(self, redis):
+        self._redis = redis
+        self._watched = {}
+        self._commands = []
+        self._buffering = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.reset()
+
+    def reset(self):
+        self._watched = {}
+        self._commands = []
+        self._buffering = False
+
+    def watch(self, key):
+        self._watched[key] = self._redis._versions.get(key, 0)
+
+    def multi(self):
+        self._buffering = True
+
+    def hmget(self, key, *fields):
+        return self._redis.hmget(key, *fields)
+
+    def hset(self, key, mapping):
+        self._commands.append(('hset', key, mapping))
+
+    def expire(self, key, seconds):
+        self._commands.append(('expire', key, seconds))
+
+    def execute(self):
+        with self._redis._lock:
+            for key, version in self._watched.items():
+                if self._redis._versions.get(key, 0) != version:
+                    self.reset()
+                    raise WatchError(key)
+            for name, *args in self._commands:
+                getattr(self._redis, name)(*args)
+        self.reset()
+
+
+def create_store(url):
+    """memory | sqlite:///caminho.db | redis://host:porta/db | fakeredis://"""
+    if not url or url == 'memory':
+        return MemoryStore()
+    if url.startswith('sqlite:///'):
+        return SQLiteStore(url[len('sqlite:///'):])
+    if url.startswith('fakeredis://'):
+        return RedisStore(FakeRedis())
+    if url.startswith(('redis://', 'rediss://')):
+        import redis
+        return RedisStore(redis.Redis.from_url(url))
+    raise ValueError(f"Storage de rate limit desconhecido: {url}")
+
+
+# ======================
+# MIDDLEWARE
+# ======================
+
+class RateLimiter:
+    def __init__(self, store, rules):
+        self.store = store
+        self.rules = {
+            endpoint: [RateLimitRule.parse(spec) if isinstance(spec, str) else spec for spec in specs]
+            for endpoint, specs in rules.items()
+        }
+
+    def check(self, endpoint, client_ip, user_id):
+        """Consome um token de cada regra da rota; retorna o resultado mais restritivo
+
+        Se alguma regra negar, os tokens das que permitiram são estornados: uma
+        requisição recusada (ex.: pelo limite por minuto) não gasta a cota das outras.
+        """
+        worst = None
+        charged = []
+        denied = False
+        for rule in self.rules.get(endpoint, []):
+            if rule.scope == 'user':
+                if user_id is None:
+                    continue
+                subject = f"user:{user_id}"
+            else:
+                subject = f"ip:{client_ip}"
+            key = f"{endpoint}:{subject}:{rule.limit}/{rule.period}"
+            allowed, remaining, retry_after = self.store.consume(key, rule.limit, rule.rate)
+            if allowed:
+                charged.append((key, rule))
+            else:
+                denied = True
+            result = {
+                'allowed': allowed,
+                'limit': rule.limit,
+                'remaining': int(remaining),
+                'reset': int(math.ceil((rule.limit - remaining) / rule.rate)),
+                'retry_after': int(math.ceil(retry_after))
+            }
+            if worst is None or (not allowed and worst['allowed']) or \
+                    (allowed == worst['allowed'] and result['remaining'] < worst['remaining']):
+                worst = result
+        if denied:
+            for key, rule in charged:
+                self.store.consume(key, rule.limit, rule.rate, cost=-1)
+        return worst
+
+
+def _jwt_subject():
+    """Identidade do JWT sem consultar o banco (token inválido = anônimo)"""
+    from flask_jwt_extended import decode_token
+
+    auth = request.headers.get('Authorization', '')
+    if not auth.startswith('Bearer '):
+        return None
+    try:
+        return decode_token(auth[len('Bearer '):]).get('sub')
+    except Exception:
+        return None
+
+
+def _client_ip(trust_proxy):
+    if trust_proxy and request.access_route:
+        return request.access_route[0]
+    return request.remote_addr
+
+
+def init_rate_limiter(app):
+    """Registra o rate limiting como primeiro hook da aplicação"""
+    if not app.config.get('RATE_LIMIT_ENABLED'):
+        return
+
+    rules = dict(DEFAULT_RATE_LIMITS)
+    if app.config.get('RATE_LIMIT_RULES'):
+        rules.update(json.loads(app.config['RATE_LIMIT_RULES']))
+    limiter = RateLimiter(create_store(app.config['RATE_LIMIT_STORAGE']), rules)
+    app.extensions['rate_limiter'] = limiter
+    trust_proxy = app.config.get('RATE_LIMIT_TRUST_PROXY', False)
+
+    @app.before_request
+    def _enforce_rate_limit():
+        if request.endpoint not in limiter.rules:
+            return None
+        result = limiter.check(request.endpoint, _client_ip(trust_proxy), _jwt_subject())
+        if result is None:
+            return None
+        request.environ['contentai.rate_limit'] = result
+        if not result['allowed']:
+            response = jsonify({
+                "error": f"Muitas requisições. Tente novamente em {result['retry_after']} segundos.",
+                "retry_after": result['retry_after']
+            })
+            response.status_code = 429
+            response.headers['Retry-After'] = str(result['retry_after'])
+            return response
+        return None
+
+    @app.after_request
+    def _rate_limit_headers(response):
+        result = request.environ.get('contentai.rate_limit')
+        if result:
+            response.headers['X-RateLimit-Limit'] = str(result['limit'])
+            response.headers['X-RateLimit-Remaining'] = str(result['remaining'])
+            response.headers['X-RateLimit-Reset'] = str(result['reset'])
+        return response
+
+    print(f"✅ Rate limiting ativo ({type(limiter.store).__name__})")
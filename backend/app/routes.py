@@ -1,10 +1,20 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify, Response, stream_with_context
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from app.services.ai_service import ai_service
-from app.models import db, GenerationHistory, UserFeedback, AppStatistics, User, bcrypt
-from datetime import datetime, date
+from app.services.ai_parsing import GenerationResult
+from app.services.prompts import prompt_registry
+from app.models import db, GenerationHistory, GenerationHistoryArchive, UserFeedback, AppStatistics, User, UserGenerationStats, TokenUsage, bcrypt
+from app.sampling_profiler import sampling_profiler
+from app.conditional import conditional, latest, make_etag
+from app.idempotency import idempotent
+from app.services.cache import TTLCache
+from app.services.cache_warmup import CacheTarget, start_cache_warmup
+from app.services.history_search import search_history
+from app.services.history_export import EXPORT_FORMATS, export_query, iter_export, gzip_stream
+from app.services.token_usage import token_meter, tokens_used_today, daily_token_budget, flush_token_usage
+from datetime import datetime, date, timedelta
 import json
-from functools import lru_cache
+import os
 import threading
 import time
 from email_validator import validate_email, EmailNotValidError
@@ -16,47 +26,202 @@ main_bp = Blueprint('main', __name__)
 # SISTEMA DE CACHE
 # ======================
 
-# ✅ Cache em memória
-@lru_cache(maxsize=100)
+# ✅ Cache em memória com TTL por entrada, stale-while-revalidate e jitter
+CACHE_MAXSIZE = int(os.environ.get('CACHE_MAXSIZE', 100))
+CACHE_TTL_SECONDS = int(os.environ.get('CACHE_TTL_SECONDS', 3600))
+CACHE_STALE_SECONDS = int(os.environ.get('CACHE_STALE_SECONDS', 600))
+CACHE_JITTER = float(os.environ.get('CACHE_JITTER', 0.1))
+CACHE_PURGE_INTERVAL = int(os.environ.get('CACHE_PURGE_INTERVAL', 60))
+CACHE_REFRESH_WORKERS = int(os.environ.get('CACHE_REFRESH_WORKERS', 2))
+CACHE_WAIT_TIMEOUT = float(os.environ.get('CACHE_WAIT_TIMEOUT', 30))
+# Quantidade de ideias vem do cliente: limitada (chave de cache, tamanho do prompt e da resposta)
+IDEAS_MAX_COUNT = int(os.environ.get('IDEAS_MAX_COUNT', 10))
+
+ideas_cache = TTLCache('ideas', CACHE_MAXSIZE, CACHE_TTL_SECONDS, CACHE_STALE_SECONDS, CACHE_JITTER,
+                       CACHE_REFRESH_WORKERS, CACHE_WAIT_TIMEOUT)
+script_cache = TTLCache('script', CACHE_MAXSIZE, CACHE_TTL_SECONDS, CACHE_STALE_SECONDS, CACHE_JITTER,
+                        CACHE_REFRESH_WORKERS, CACHE_WAIT_TIMEOUT)
+
+# ✅ Cache semântico opcional (prompts quase iguais reaproveitam a geração)
+SEMANTIC_CACHE_ENABLED = os.environ.get('SEMANTIC_CACHE_ENABLED', '').lower() in ('1', 'true', 'yes')
+semantic_cache = None
+if SEMANTIC_CACHE_ENABLED:
+    from app.services.semantic_cache import SemanticCache, np
+    if np is None:
+        print("⚠️  numpy não instalado (cache semântico desativado)")
+    else:
+        semantic_cache = SemanticCache(
+            threshold=float(os.environ.get('SEMANTIC_CACHE_THRESHOLD', 0.9)),
+            capacity=int(os.environ.get('SEMANTIC_CACHE_CAPACITY', 2000)),
+            ttl=CACHE_TTL_SECONDS
+        )
+
+# A versão do template faz parte das chaves: mudar o prompt invalida o que foi gerado com o anterior
+def cache_key_part(value):
+    """Escapa o separador: ("a:b", "c") e ("a", "b:c") não podem gerar a mesma chave"""
+    return str(value).replace('\\', '\\\\').replace(':', '\\:')
+
+def cache_key(tag, *parts):
+    return ':'.join([tag, *(cache_key_part(part) for part in parts)])
+
+def ideas_cache_key(niche, audience, count):
+    return cache_key(prompt_registry.get('ideas').tag, niche, audience, count)
+
+def script_cache_key(idea):
+    return cache_key(prompt_registry.get('script').tag, idea)
+
+def _generate_cached(cache, key, namespace, texts, generate, qualifier=None):
+    """Cache exato e semântico em volta de generate() -> GenerationResult.
+
+    Só resultados completos da IA são gravados (nunca fallback); o que vem do
+    cache é devolvido como GenerationResult com outcome 'cache'/'semantic'.
+    """
+    def compute():
+        if semantic_cache is not None:
+            similar = semantic_cache.lookup(namespace, texts, qualifier)
+            if similar is not None:
+                return GenerationResult(similar, outcome='semantic')
+        result = generate()
+        if semantic_cache is not None and result.cacheable:
+            semantic_cache.add(namespace, texts, result.value, qualifier)
+        return result
+
+    result = cache.get_or_compute(
+        key, compute, cacheable=lambda result: result.cacheable, unwrap=lambda result: result.value
+    )
+    return result if isinstance(result, GenerationResult) else GenerationResult(result, outcome='cache')
+
 def generate_ideas_cached(niche, audience, count):
     """Versão em cache da geração de ideias"""
-    return ai_service.generate_ideas(niche, audience, count)
+    return _generate_cached(
+        ideas_cache, ideas_cache_key(niche, audience, count),
+        prompt_registry.get('ideas').tag, (niche, audience),
+        lambda: ai_service.generate_ideas_result(niche, audience, count),
+        qualifier=count
+    )
 
-@lru_cache(maxsize=100)
 def generate_script_cached(idea):
     """Versão em cache da geração de roteiros"""
-    return ai_service.generate_script(idea)
+    return _generate_cached(
+        script_cache, script_cache_key(idea), prompt_registry.get('script').tag, (idea,),
+        lambda: ai_service.generate_script_result(idea)
+    )
+
+# ✅ Pré-geração especulativa de roteiros (opt-in): as primeiras ideias retornadas
+# têm o roteiro gerado em background, então o clique seguinte já encontra o cache
+SPECULATIVE_ENABLED = os.environ.get('SPECULATIVE_ENABLED', '').lower() in ('1', 'true', 'yes')
+speculative = None
+if SPECULATIVE_ENABLED:
+    from app.rate_limiter import create_store
+    from app.services.speculative import SpeculativePregenerator
+    speculative = SpeculativePregenerator(
+        generate=lambda idea, tier: speculative_script(idea, tier),
+        is_cached=lambda idea: script_cache.get(script_cache_key(idea)) is not None,
+        store=create_store(os.environ.get('RATE_LIMIT_STORAGE', 'memory')),
+        top_n=json.loads(os.environ.get('SPECULATIVE_TOP_N', '{"anonymous": 0, "free": 1, "premium": 3}')),
+        qps=float(os.environ.get('SPECULATIVE_QPS', 1.0)),
+        burst=int(os.environ.get('SPECULATIVE_BURST', 5)),
+        workers=int(os.environ.get('SPECULATIVE_WORKERS', 1)),
+        queue_size=int(os.environ.get('SPECULATIVE_QUEUE_SIZE', 100)),
+        # Tokens por dia (por worker) gastos em especulação, por plano de quem disparou
+        token_budget=json.loads(os.environ.get('SPECULATIVE_TOKEN_BUDGET', '{"free": 20000, "premium": 100000}')),
+        tokens_used=lambda tier: token_meter.tokens_today(tier, 'speculative')
+    )
+
+def speculative_script(idea, tier):
+    # Separado em token_usage (endpoint='speculative') e fora do orçamento do usuário (user_id 0)
+    with token_meter.attribute(tier=tier, endpoint='speculative'):
+        return generate_script_cached(idea)
+
+def user_tier(user):
+    if user is None:
+        return 'anonymous'
+    return 'premium' if user.is_premium else 'free'
 
 # ✅ Funções de limpeza de cache
+def clear_semantic_cache(cache):
+    """Remove do cache semântico o namespace do cache exato (senão a próxima geração o regrava)"""
+    if semantic_cache is None:
+        return 0
+    return semantic_cache.invalidate_namespace(prompt_registry.get(cache.name).tag)
+
 def clear_ideas_cache():
-    generate_ideas_cached.cache_clear()
+    ideas_cache.clear()
+    clear_semantic_cache(ideas_cache)
     print("🧹 Cache de ideias limpo")
 
 def clear_script_cache():
-    generate_script_cached.cache_clear()
+    script_cache.clear()
+    clear_semantic_cache(script_cache)
     print("🧹 Cache de roteiros limpo")
 
 def clear_all_cache():
     clear_ideas_cache()
     clear_script_cache()
+    if semantic_cache is not None:
+        semantic_cache.clear()
     print("🧹 Todo o cache limpo")
 
-# ✅ Limpeza automática periódica
-def clear_cache_periodically():
-    """Limpa o cache a cada hora automaticamente"""
+def cache_stats_payload():
+    """Estatísticas dos caches no formato da API"""
+    ideas = ideas_cache.info()
+    script = script_cache.info()
+    return {
+        "ideas_cache_size": ideas['size'],
+        "ideas_cache_hits": ideas['hits'],
+        "ideas_cache_stale_hits": ideas['stale_hits'],
+        "ideas_cache_misses": ideas['misses'],
+        "script_cache_size": script['size'],
+        "script_cache_hits": script['hits'],
+        "script_cache_stale_hits": script['stale_hits'],
+        "script_cache_misses": script['misses'],
+        "ttl_seconds": CACHE_TTL_SECONDS,
+        "speculative": speculative.stats() if speculative is not None else None
+    }
+
+# ✅ Limpeza periódica apenas das entradas vencidas (sem apagar o cache inteiro)
+def purge_cache_periodically():
+    """Remove entradas expiradas (além da janela de stale) a cada CACHE_PURGE_INTERVAL"""
     while True:
-        time.sleep(3600)  # 1 hora
-        clear_all_cache()
+        time.sleep(CACHE_PURGE_INTERVAL)
+        removed = ideas_cache.purge_expired() + script_cache.purge_expired()
+        if removed:
+            print(f"🧹 {removed} entradas expiradas removidas do cache")
 
 # ✅ Inicialização segura do cache cleaner
 def init_cache_cleaner(app):
     """Inicializa o limpeza de cache de forma segura"""
     with app.app_context():
-        if not hasattr(app, 'cache_cleaner_started'):
-            cache_cleaner = threading.Thread(target=clear_cache_periodically, daemon=True)
+        # Após o fork do gunicorn (preload) o post_fork zera a flag: threads não sobrevivem ao fork
+        if not getattr(app, 'cache_cleaner_started', False):
+            cache_cleaner = threading.Thread(target=purge_cache_periodically, daemon=True)
             cache_cleaner.start()
             app.cache_cleaner_started = True
-            print("✅ Limpeza automática de cache iniciada (a cada 1 hora)")
+            print(f"✅ Limpeza de entradas expiradas do cache iniciada (a cada {CACHE_PURGE_INTERVAL}s)")
+
+# ✅ Aquecimento do cache a partir do snapshot ou do histórico recente
+def _ideas_from_history(data):
+    # Só aquece com conteúdo da IA gerado pela versão atual do template
+    if data.get('fallback') or data.get('prompt') != prompt_registry.get('ideas').tag:
+        return None
+    count = data.get('count', len(data['ideas']))
+    return ideas_cache_key(data['niche'], data['audience'], count), data['ideas']
+
+def _script_from_history(data):
+    if data.get('fallback') or data.get('prompt') != prompt_registry.get('script').tag:
+        return None
+    return script_cache_key(data['idea']), data['script']
+
+CACHE_WARMUP_TARGETS = [
+    CacheTarget('ideas', ideas_cache, 'ideas', _ideas_from_history),
+    CacheTarget('script', script_cache, 'script', _script_from_history)
+]
+
+def init_cache_warmup(app):
+    """Aquece os caches em background (não atrasa o boot)"""
+    if not app.config.get('CACHE_WARMUP_ENABLED') or getattr(app, 'cache_warmup_done', False):
+        return
+    start_cache_warmup(app, CACHE_WARMUP_TARGETS)
 
 # ======================
 # FUNÇÕES DE AUTENTICAÇÃO
@@ -64,25 +229,34 @@ def init_cache_cleaner(app):
 
 def check_usage_limits(user_id):
     """Verifica limites de uso baseado no plano"""
+    # Intervalo [hoje, amanhã) em vez de date(created_at): usa os índices (usuário/sessão, created_at)
+    today_start = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    today_end = today_start + timedelta(days=1)
+    
     if user_id is None:  # Usuário anônimo - limite reduzido
-        today = datetime.utcnow().date()
         anonymous_generations = GenerationHistory.query.filter(
             GenerationHistory.user_id.is_(None),
-            GenerationHistory.user_session.like(f"%{request.remote_addr}%"),
-            db.func.date(GenerationHistory.created_at) == today
+            GenerationHistory.user_session == request.remote_addr,
+            GenerationHistory.created_at >= today_start,
+            GenerationHistory.created_at < today_end
         ).count()
         return anonymous_generations < 3  # 3 gerações/dia para anônimos
     
     user = User.query.get(int(user_id)) if user_id else None
     
+    # ✅ Orçamento diário de tokens no lugar do limite de gerações (USAGE_LIMIT_MODE=tokens)
+    if user and current_app.config['USAGE_LIMIT_MODE'] == 'tokens':
+        budget = daily_token_budget(current_app.config, user)
+        return not budget or tokens_used_today(db.session, user.id) < budget
+    
     if user and user.is_premium:
         return True  # Sem limites para premium
     
     # Verificar uso diário para free users
-    today = datetime.utcnow().date()
     today_generations = GenerationHistory.query.filter(
         GenerationHistory.user_id == int(user_id),
-        db.func.date(GenerationHistory.created_at) == today
+        GenerationHistory.created_at >= today_start,
+        GenerationHistory.created_at < today_end
     ).count()
     
     return today_generations < 10  # Limite de 10 gerações/dia para free
@@ -142,7 +316,6 @@ def get_real_time_stats():
             return jsonify({"error": "Acesso não autorizado"}), 403
 
         # Usuários online (login nas últimas 30 min)
-        from datetime import timedelta
         recent_time = datetime.utcnow() - timedelta(minutes=30)
         online_users = User.query.filter(User.last_login > recent_time).count()
 
@@ -192,8 +365,15 @@ def login():
     except Exception as e:
         return jsonify({"error": f"Erro interno: {str(e)}"}), 500
 
+def user_validator():
+    """updated_at do usuário (consulta pela chave primária, sem carregar o registro)"""
+    user_id = int(get_jwt_identity())
+    updated_at = db.session.query(User.updated_at).filter(User.id == user_id).scalar()
+    return make_etag('user', user_id, updated_at), updated_at
+
 @main_bp.route('/api/auth/me', methods=['GET'])
 @jwt_required()
+@conditional(user_validator)
 def get_current_user():
     try:
         user_id = int(get_jwt_identity())
@@ -236,24 +416,34 @@ def upgrade_to_premium():
 # ROTAS DA API PRINCIPAIS
 # ======================
 
+@main_bp.route('/livez')
+def liveness_probe():
+    """Processo vivo: sem banco nem rede"""
+    return jsonify({"status": "alive"})
+
+@main_bp.route('/readyz')
+def readiness_probe():
+    """Último resultado das verificações em background (banco e IA)"""
+    ready, payload = current_app.extensions['health_monitor'].readiness()
+    return jsonify(payload), 200 if ready else 503
+
 @main_bp.route('/api/health')
 def health_check():
-    stats = AppStatistics.query.first()
-    total_users = User.query.count()
+    # Estatísticas do snapshot do monitor: nenhum COUNT por requisição
+    monitor = current_app.extensions['health_monitor']
+    statistics, statistics_at = monitor.statistics()
+    ready, readiness = monitor.readiness()
+    database = readiness['checks'].get('database')
     
     return jsonify({
-        "status": "healthy", 
+        "status": "healthy" if ready else readiness['status'], 
         "message": "✅ HelpubliAI está funcionando perfeitamente!",
         "service": "helpubli-ai",
         "ai_provider": "google-gemini",
         "ai_configured": not ai_service.fallback_mode,
-        "database": "connected",
-        "statistics": {
-            "total_users": total_users,
-            "total_ideas": stats.total_ideas_generated if stats else 0,
-            "total_scripts": stats.total_scripts_generated if stats else 0,
-            "total_feedbacks": stats.total_feedbacks if stats else 0
-        }
+        "database": "connected" if database is None or database['ok'] else "unavailable",
+        "statistics": statistics,
+        "statistics_updated_at": statistics_at
     })
 
 def update_statistics(generation_type):
@@ -275,6 +465,7 @@ def update_statistics(generation_type):
 
 @main_bp.route('/api/generate-ideas', methods=['POST'])
 @jwt_required(optional=True)
+@idempotent
 def generate_ideas():
     try:
         user_id = get_jwt_identity()  # Pode ser None se não autenticado
@@ -293,10 +484,23 @@ def generate_ideas():
         
         niche = data['niche']
         audience = data['audience']
-        count = data.get('count', 5)
+        try:
+            count = int(data.get('count', 5))
+        except (TypeError, ValueError):
+            count = 0
+        if not 1 <= count <= IDEAS_MAX_COUNT:
+            return jsonify({"error": f"count deve ser um inteiro entre 1 e {IDEAS_MAX_COUNT}"}), 400
         
-        # ✅ USANDO CACHE
-        ideas = generate_ideas_cached(niche, audience, count)
+        user = User.query.get(int(user_id)) if user_id else None
+        
+        # ✅ USANDO CACHE (tokens atribuídos ao usuário/plano/endpoint)
+        with token_meter.attribute(user_id, user_tier(user), request.endpoint):
+            result = generate_ideas_cached(niche, audience, count)
+        ideas = result.value
+        
+        # ✅ Roteiros das primeiras ideias gerados em background (nunca sobre fallback)
+        if speculative is not None and not result.fallback:
+            speculative.submit(user_tier(user), [idea['title'] for idea in ideas])
         
         # ✅ Salvar no banco de dados
         history_entry = GenerationHistory(
@@ -304,7 +508,10 @@ def generate_ideas():
             data=json.dumps({
                 'niche': niche,
                 'audience': audience,
-                'ideas': ideas
+                'count': count,
+                'ideas': ideas,
+                'fallback': result.fallback,
+                'prompt': prompt_registry.get('ideas').tag
             }),
             user_id=user_id,
             user_session=request.remote_addr
@@ -319,10 +526,10 @@ def generate_ideas():
             "count": len(ideas),
             "ideas": ideas,
             "status": "success",
-            "ai_generated": not ai_service.fallback_mode,
+            "ai_generated": not result.fallback,
             "history_id": history_entry.id,
             "user_id": user_id,
-            "is_premium": False if not user_id else User.query.get(user_id).is_premium
+            "is_premium": False if not user else user.is_premium
         })
         
     except Exception as e:
@@ -330,6 +537,7 @@ def generate_ideas():
 
 @main_bp.route('/api/generate-script', methods=['POST'])
 @jwt_required(optional=True)
+@idempotent
 def generate_script():
     try:
         user_id = get_jwt_identity()
@@ -348,15 +556,24 @@ def generate_script():
         
         idea = data['idea']
         
-        # ✅ USANDO CACHE
-        script = generate_script_cached(idea)
+        if speculative is not None:
+            speculative.record_request(idea)
+        
+        user = User.query.get(int(user_id)) if user_id else None
+        
+        # ✅ USANDO CACHE (tokens atribuídos ao usuário/plano/endpoint)
+        with token_meter.attribute(user_id, user_tier(user), request.endpoint):
+            result = generate_script_cached(idea)
+        script = result.value
         
         # ✅ Salvar no banco de dados
         history_entry = GenerationHistory(
             type='script',
             data=json.dumps({
                 'idea': idea,
-                'script': script
+                'script': script,
+                'fallback': result.fallback,
+                'prompt': prompt_registry.get('script').tag
             }),
             user_id=user_id,
             user_session=request.remote_addr
@@ -369,17 +586,28 @@ def generate_script():
             "idea": idea,
             "script": script,
             "status": "success",
-            "ai_generated": not ai_service.fallback_mode,
+            "ai_generated": not result.fallback,
             "history_id": history_entry.id,
             "user_id": user_id,
-            "is_premium": False if not user_id else User.query.get(user_id).is_premium
+            "is_premium": False if not user else user.is_premium
         })
         
     except Exception as e:
         return jsonify({"error": f"Erro interno: {str(e)}"}), 500
 
+def history_validator():
+    """Registro mais novo e mais antigo do usuário: inserções e arquivamento mudam a ETag"""
+    user_id = int(get_jwt_identity())
+    entries = db.session.query(GenerationHistory.created_at, GenerationHistory.id).filter(
+        GenerationHistory.user_id == user_id
+    )
+    newest = entries.order_by(GenerationHistory.created_at.desc(), GenerationHistory.id.desc()).first()
+    oldest = entries.order_by(GenerationHistory.created_at.asc(), GenerationHistory.id.asc()).first()
+    return make_etag('history', user_id, newest, oldest), newest.created_at if newest else None
+
 @main_bp.route('/api/user/history', methods=['GET'])
 @jwt_required()
+@conditional(history_validator)
 def get_user_history():
     """Retorna histórico do usuário logado"""
     try:
@@ -403,6 +631,91 @@ def get_user_history():
     except Exception as e:
         return jsonify({"error": f"Erro interno: {str(e)}"}), 500
 
+@main_bp.route('/api/user/history/search', methods=['GET'])
+@jwt_required()
+def search_user_history():
+    """Busca textual (títulos, descrições, hashtags, roteiros) no histórico do usuário"""
+    try:
+        user_id = int(get_jwt_identity())
+        query = request.args.get('q', '').strip()
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', 10, type=int), 1), 50)
+        
+        if not query:
+            return jsonify({"error": "Parâmetro q é obrigatório"}), 400
+        
+        ranked, total = search_history(db.session, user_id, query, page, per_page)
+        items = {
+            item.id: item for item in
+            GenerationHistory.query.filter(GenerationHistory.id.in_([history_id for history_id, _ in ranked]))
+        }
+        
+        results = []
+        for history_id, rank in ranked:
+            if history_id in items:
+                result = items[history_id].to_dict()
+                result['rank'] = round(rank, 6)
+                results.append(result)
+        
+        return jsonify({
+            'query': query,
+            'results': results,
+            'total': total,
+            'pages': (total + per_page - 1) // per_page,
+            'current_page': page
+        })
+        
+    except Exception as e:
+        return jsonify({"error": f"Erro interno: {str(e)}"}), 500
+
+# ======================
+# EXPORTAÇÃO DO HISTÓRICO
+# ======================
+
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+
+def _parse_export_date(name):
+    value = request.args.get(name)
+    return datetime.fromisoformat(value) if value else None
+
+def stream_history_export(user_id=None, filename='historico'):
+    """Resposta em streaming (NDJSON/CSV, gzip opcional) com os filtros da query string"""
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"Formato inválido. Use: {', '.join(EXPORT_FORMATS)}"}), 400
+    try:
+        since = _parse_export_date('since')
+        until = _parse_export_date('until')
+    except ValueError:
+        return jsonify({"error": "Datas devem estar no formato ISO (AAAA-MM-DD)"}), 400
+    
+    query = export_query(GenerationHistory, user_id=user_id, history_type=request.args.get('type'),
+                         since=since, until=until)
+    chunks = iter_export(db.session, query, fmt, EXPORT_BATCH_SIZE)
+    filename = f"{filename}.{fmt}"
+    mimetype = EXPORT_FORMATS[fmt]
+    if request.args.get('gzip', '').lower() in ('1', 'true', 'yes'):
+        chunks = gzip_stream(chunks)
+        filename += '.gz'
+        mimetype = 'application/gzip'
+    
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Cache-Control'] = 'no-store'
+    # Desliga o buffering de proxies (nginx) para o download começar imediatamente
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@main_bp.route('/api/user/history/export', methods=['GET'])
+@jwt_required()
+def export_user_history():
+    """Exporta todo o histórico do usuário logado (?format=ndjson|csv&gzip=1&type=&since=&until=)"""
+    try:
+        user_id = int(get_jwt_identity())
+        return stream_history_export(user_id=user_id, filename=f"historico_{date.today().isoformat()}")
+    except Exception as e:
+        return jsonify({"error": f"Erro interno: {str(e)}"}), 500
+
 @main_bp.route('/api/feedback', methods=['POST'])
 @jwt_required(optional=True)
 def api_feedback():
@@ -437,7 +750,14 @@ def api_feedback():
     except Exception as e:
         return jsonify({"error": f"Erro interno: {str(e)}"}), 500
 
+def statistics_validator():
+    """Última atualização dos contadores e dos usuários (cadastro, upgrade)"""
+    stats_updated = db.session.query(AppStatistics.last_updated).limit(1).scalar()
+    users_updated = db.session.query(db.func.max(User.updated_at)).scalar()
+    return make_etag('statistics', stats_updated, users_updated), latest(stats_updated, users_updated)
+
 @main_bp.route('/api/statistics')
+@conditional(statistics_validator, private=False)
 def api_statistics():
     """Endpoint para estatísticas detalhadas"""
     stats = AppStatistics.query.first()
@@ -457,7 +777,15 @@ def api_statistics():
 @main_bp.route('/admin/clear-cache', methods=['POST'])
 @jwt_required()
 def admin_clear_cache():
-    """Rota administrativa para limpar cache manualmente"""
+    """Rota administrativa para limpar cache manualmente
+
+    Corpo opcional: {"cache": "ideas" | "script" | "all", "key": ..., "prefix": ...}.
+    Sem key/prefix o cache escolhido é limpo por inteiro.
+    key/prefix podem ser a lista de campos (ideias [nicho, público, quantidade],
+    roteiros [ideia]) ou a string já gravada "<nicho>:<público>:<quantidade>",
+    com ':' e '\\' dos campos escapados por '\\'. A versão do template é
+    acrescentada automaticamente.
+    """
     try:
         user_id = int(get_jwt_identity())
         user = User.query.get(user_id)
@@ -466,33 +794,262 @@ def admin_clear_cache():
         if not user or not user.is_admin:
             return jsonify({"error": "Acesso não autorizado"}), 403
         
-        clear_all_cache()
+        data = request.get_json(silent=True) or {}
+        target = data.get('cache', 'all')
+        caches = {'ideas': [ideas_cache], 'script': [script_cache], 'all': [ideas_cache, script_cache]}
+        if target not in caches:
+            return jsonify({"error": "Cache inválido (use ideas, script ou all)"}), 400
+        
+        def versioned(cache, key):
+            tag = prompt_registry.get(cache.name).tag
+            return cache_key(tag, *key) if isinstance(key, list) else f"{tag}:{key}"
+        
+        if 'key' in data:
+            removed = sum(int(cache.invalidate(versioned(cache, data['key']))) for cache in caches[target])
+        elif 'prefix' in data:
+            removed = sum(cache.invalidate_prefix(versioned(cache, data['prefix'])) for cache in caches[target])
+        else:
+            removed = sum(cache.clear() for cache in caches[target])
+        # O índice semântico devolveria o valor invalidado (similaridade 1.0) e o regravaria no cache exato
+        for cache in caches[target]:
+            clear_semantic_cache(cache)
+        print(f"🧹 Cache ({target}) invalidado: {removed} entradas")
+        
         return jsonify({
             "status": "success",
             "message": "Cache limpo com sucesso",
-            "cache_info": {
-                "ideas_cache_size": generate_ideas_cached.cache_info().currsize,
-                "ideas_cache_hits": generate_ideas_cached.cache_info().hits,
-                "ideas_cache_misses": generate_ideas_cached.cache_info().misses,
-                "script_cache_size": generate_script_cached.cache_info().currsize,
-                "script_cache_hits": generate_script_cached.cache_info().hits,
-                "script_cache_misses": generate_script_cached.cache_info().misses
-            }
+            "removed": removed,
+            "cache_info": cache_stats_payload()
         })
     except Exception as e:
         return jsonify({"error": f"Erro ao limpar cache: {str(e)}"}), 500
 
+@main_bp.route('/admin/semantic-cache', methods=['GET', 'POST'])
+@jwt_required()
+def admin_semantic_cache():
+    """Métricas do cache semântico e auditoria de falsos positivos
+
+    POST {"audit_id": 12, "false_hit": true} registra a revisão de um hit.
+    """
+    try:
+        user_id = int(get_jwt_identity())
+        user = User.query.get(user_id)
+        
+        if not user or not user.is_admin:
+            return jsonify({"error": "Acesso não autorizado"}), 403
+        
+        if semantic_cache is None:
+            return jsonify({"status": "disabled", "message": "Cache semântico desativado"})
+        
+        if request.method == 'POST':
+            data = request.get_json(silent=True) or {}
+            if 'audit_id' not in data:
+                return jsonify({"error": "audit_id é obrigatório"}), 400
+            audit = semantic_cache.review(int(data['audit_id']), bool(data.get('false_hit')))
+            if audit is None:
+                return jsonify({"error": "Auditoria não encontrada"}), 404
+            return jsonify({"status": "success", "audit": audit, "stats": semantic_cache.stats()})
+        
+        return jsonify({
+            "status": "success",
+            "stats": semantic_cache.stats(),
+            "audits": semantic_cache.audits(request.args.get('limit', 50, type=int))
+        })
+        
+    except Exception as e:
+        return jsonify({"error": f"Erro interno: {str(e)}"}), 500
+
+def cache_stats_validator():
+    # Contadores em memória: a ETag é o próprio payload, sem serializar JSON
+    return make_etag('cache-stats', sorted(cache_stats_payload().items())), None
+
 @main_bp.route('/api/cache-stats')
+@conditional(cache_stats_validator, private=False)
 def cache_stats():
     """Estatísticas do cache"""
-    return jsonify({
-        "ideas_cache_size": generate_ideas_cached.cache_info().currsize,
-        "ideas_cache_hits": generate_ideas_cached.cache_info().hits,
-        "ideas_cache_misses": generate_ideas_cached.cache_info().misses,
-        "script_cache_size": generate_script_cached.cache_info().currsize,
-        "script_cache_hits": generate_script_cached.cache_info().hits,
-        "script_cache_misses": generate_script_cached.cache_info().misses
-    })
+    return jsonify(cache_stats_payload())
+
+@main_bp.route('/admin/ai-metrics', methods=['GET', 'DELETE'])
+@jwt_required()
+def admin_ai_metrics():
+    """Parsing das respostas e tokens/latência por template (DELETE zera os contadores de parsing)"""
+    try:
+        user = User.query.get(int(get_jwt_identity()))
+        
+        if not user or not user.is_admin:
+            return jsonify({"error": "Acesso não autorizado"}), 403
+        
+        if request.method == 'DELETE':
+            ai_service.metrics.reset()
+        
+        return jsonify({
+            "status": "success",
+            "provider": ai_service.provider,
+            "fallback_mode": ai_service.fallback_mode,
+            "metrics": ai_service.metrics.snapshot(),
+            "hedging": ai_service.hedging.stats(),
+            "routing": ai_service.router.stats(),
+            "prompts": prompt_registry.stats()
+        })
+        
+    except Exception as e:
+        return jsonify({"error": f"Erro interno: {str(e)}"}), 500
+
+@main_bp.route('/admin/retention', methods=['GET', 'POST'])
+@jwt_required()
+def admin_retention():
+    """Política de retenção e estado do arquivador (POST executa um ciclo agora)"""
+    try:
+        user = User.query.get(int(get_jwt_identity()))
+        
+        if not user or not user.is_admin:
+            return jsonify({"error": "Acesso não autorizado"}), 403
+        
+        archiver = current_app.extensions['history_archiver']
+        moved = None
+        if request.method == 'POST':
+            moved = archiver.run_once(db.session, deadline=time.monotonic() + 20)
+        
+        return jsonify({
+            "status": "success",
+            "moved": moved,
+            "archiver": archiver.stats(),
+            "rows": {
+                "active": GenerationHistory.query.count(),
+                "archived": GenerationHistoryArchive.query.count()
+            }
+        })
+        
+    except Exception as e:
+        return jsonify({"error": f"Erro interno: {str(e)}"}), 500
+
+TOKEN_USAGE_GROUPS = {
+    'day': TokenUsage.day,
+    'user': TokenUsage.user_id,
+    'tier': TokenUsage.tier,
+    'endpoint': TokenUsage.endpoint,
+    'template': TokenUsage.template,
+    'model': TokenUsage.model
+}
+
+@main_bp.route('/admin/token-usage', methods=['GET', 'POST'])
+@jwt_required()
+def admin_token_usage():
+    """Tokens agregados por dia/usuário/plano/endpoint/template/modelo (POST grava os pendentes deste worker)"""
+    try:
+        user = User.query.get(int(get_jwt_identity()))
+        
+        if not user or not user.is_admin:
+            return jsonify({"error": "Acesso não autorizado"}), 403
+        
+        if request.method == 'POST':
+            flush_token_usage(current_app._get_current_object())
+        
+        group_by = request.args.get('group_by', 'tier')
+        if group_by not in TOKEN_USAGE_GROUPS:
+            return jsonify({"error": f"group_by inválido (use: {', '.join(TOKEN_USAGE_GROUPS)})"}), 400
+        days = min(max(request.args.get('days', 7, type=int), 1), 90)
+        since = datetime.utcnow().date() - timedelta(days=days - 1)
+        
+        column = TOKEN_USAGE_GROUPS[group_by]
+        total = db.func.sum(TokenUsage.input_tokens + TokenUsage.output_tokens)
+        query = db.session.query(
+            column,
+            db.func.sum(TokenUsage.calls),
+            db.func.sum(TokenUsage.input_tokens),
+            db.func.sum(TokenUsage.output_tokens),
+            total
+        ).filter(TokenUsage.day >= since)
+        if request.args.get('user_id', type=int) is not None:
+            query = query.filter(TokenUsage.user_id == request.args.get('user_id', type=int))
+        rows = query.group_by(column).order_by(total.desc()).limit(200).all()
+        
+        usage = [{
+            group_by: key.isoformat() if isinstance(key, date) else key,
+            "calls": int(calls),
+            "input_tokens": int(input_tokens),
+            "output_tokens": int(output_tokens),
+            "total_tokens": int(total_tokens)
+        } for key, calls, input_tokens, output_tokens, total_tokens in rows]
+        
+        return jsonify({
+            "status": "success",
+            "since": since.isoformat(),
+            "group_by": group_by,
+            "usage": usage,
+            "totals": {
+                "calls": sum(row["calls"] for row in usage),
+                "input_tokens": sum(row["input_tokens"] for row in usage),
+                "output_tokens": sum(row["output_tokens"] for row in usage)
+            },
+            "pending_aggregates": token_meter.pending_count(),
+            "last_flush": token_meter.flushed_at.isoformat() if token_meter.flushed_at else None,
+            "last_error": token_meter.last_error
+        })
+        
+    except Exception as e:
+        return jsonify({"error": f"Erro interno: {str(e)}"}), 500
+
+@main_bp.route('/admin/users/<int:user_id>/token-budget', methods=['GET', 'PUT'])
+@jwt_required()
+def admin_user_token_budget(user_id):
+    """Consumo de hoje e orçamento diário de tokens do usuário (PUT {"daily_budget": n ou null})"""
+    try:
+        admin = User.query.get(int(get_jwt_identity()))
+        
+        if not admin or not admin.is_admin:
+            return jsonify({"error": "Acesso não autorizado"}), 403
+        
+        user = User.query.get(user_id)
+        if not user:
+            return jsonify({"error": "Usuário não encontrado"}), 404
+        
+        if request.method == 'PUT':
+            data = request.get_json() or {}
+            budget = data.get('daily_budget')
+            if budget is not None and (not isinstance(budget, int) or budget < 0):
+                return jsonify({"error": "daily_budget deve ser um inteiro >= 0 ou null"}), 400
+            user.token_budget_daily = budget
+            db.session.commit()
+        
+        return jsonify({
+            "status": "success",
+            "user_id": user.id,
+            "mode": current_app.config['USAGE_LIMIT_MODE'],
+            "daily_budget": daily_token_budget(current_app.config, user),
+            "budget_override": user.token_budget_daily,
+            "used_today": tokens_used_today(db.session, user.id)
+        })
+        
+    except Exception as e:
+        return jsonify({"error": f"Erro interno: {str(e)}"}), 500
+
+@main_bp.route('/admin/profiler', methods=['GET', 'DELETE'])
+@jwt_required()
+def admin_profiler():
+    """Download das pilhas amostradas (formato collapsed para flamegraph)"""
+    try:
+        user_id = int(get_jwt_identity())
+        user = User.query.get(user_id)
+        
+        if not user or not user.is_admin:
+            return jsonify({"error": "Acesso não autorizado"}), 403
+        
+        if request.method == 'DELETE':
+            sampling_profiler.reset()
+            return jsonify({"status": "success", "message": "Amostras do profiler descartadas"})
+        
+        if request.args.get('format') == 'json':
+            return jsonify({"status": "success", "profiler": sampling_profiler.stats()})
+        
+        return Response(
+            sampling_profiler.collapsed(),
+            mimetype='text/plain',
+            headers={'Content-Disposition': 'attachment; filename=contentai-profile.collapsed'}
+        )
+        
+    except Exception as e:
+        return jsonify({"error": f"Erro interno: {str(e)}"}), 500
 
 @main_bp.route('/emergency/make-admin', methods=['POST'])
 def emergency_make_admin():
@@ -521,10 +1078,33 @@ def emergency_make_admin():
     except Exception as e:
         return jsonify({"error": f"Erro interno: {str(e)}"}), 500
     
+def admin_user_filters(args):
+    """Filtros da listagem de usuários: plan, is_admin, email (prefixo), created_*/last_login_*"""
+    filters = []
+    plan = args.get('plan')
+    if plan == 'premium':
+        filters.append(User.is_premium.is_(True))
+    elif plan == 'free':
+        filters.append(db.or_(User.is_premium.is_(False), User.is_premium.is_(None)))
+    if args.get('is_admin'):
+        if args['is_admin'].lower() in ('1', 'true', 'yes'):
+            filters.append(User.is_admin.is_(True))
+        else:
+            filters.append(db.or_(User.is_admin.is_(False), User.is_admin.is_(None)))
+    if args.get('email'):
+        # Prefixo (sem % inicial) usa o índice de email
+        filters.append(User.email.startswith(args['email'].strip(), autoescape=True))
+    for column, name in ((User.created_at, 'created'), (User.last_login, 'last_login')):
+        if args.get(f'{name}_from'):
+            filters.append(column >= datetime.fromisoformat(args[f'{name}_from']))
+        if args.get(f'{name}_to'):
+            filters.append(column < datetime.fromisoformat(args[f'{name}_to']))
+    return filters
+
 @main_bp.route('/admin/users', methods=['GET'])
 @jwt_required()
 def get_all_users():
-    """Listar todos os usuários (apenas admin)"""
+    """Listar usuários com filtros e paginação por cursor (apenas admin)"""
     try:
         user_id = int(get_jwt_identity())
         current_user = User.query.get(user_id)
@@ -532,11 +1112,50 @@ def get_all_users():
         if not current_user or not current_user.is_admin:
             return jsonify({"error": "Acesso não autorizado"}), 403
         
-        users = User.query.all()
-        return jsonify({
-            "users": [user.to_dict() for user in users],
-            "total": len(users)
-        })
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+        cursor = request.args.get('cursor', type=int)
+        ascending = request.args.get('order', 'desc') == 'asc'
+        try:
+            filters = admin_user_filters(request.args)
+        except ValueError:
+            return jsonify({"error": "Datas devem estar no formato ISO (AAAA-MM-DD)"}), 400
+        
+        # Projeção enxuta: só as colunas da tabela + contadores do agregado
+        query = db.session.query(
+            User.id, User.email, User.name, User.is_premium, User.is_admin, User.created_at, User.last_login,
+            UserGenerationStats.ideas_count, UserGenerationStats.scripts_count, UserGenerationStats.last_generation_at
+        ).outerjoin(UserGenerationStats, UserGenerationStats.user_id == User.id).filter(*filters)
+        
+        # Paginação por chave (id): custo constante em qualquer página, sem OFFSET
+        if cursor is not None:
+            query = query.filter(User.id > cursor if ascending else User.id < cursor)
+        rows = query.order_by(User.id.asc() if ascending else User.id.desc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        response = {
+            "users": [{
+                'id': row.id,
+                'email': row.email,
+                'name': row.name,
+                'is_premium': bool(row.is_premium),
+                'is_admin': bool(row.is_admin),
+                'created_at': row.created_at.isoformat() if row.created_at else None,
+                'last_login': row.last_login.isoformat() if row.last_login else None,
+                'generations': {
+                    'ideas': row.ideas_count or 0,
+                    'scripts': row.scripts_count or 0,
+                    'last_generation_at': row.last_generation_at.isoformat() if row.last_generation_at else None
+                }
+            } for row in rows],
+            "next_cursor": rows[-1].id if has_more else None,
+            "limit": limit
+        }
+        # COUNT(*) percorre todos os usuários filtrados: só quando pedido
+        if request.args.get('count', '').lower() in ('1', 'true', 'yes'):
+            response['total'] = User.query.filter(*filters).count()
+        
+        return jsonify(response)
         
     except Exception as e:
         return jsonify({"error": f"Erro interno: {str(e)}"}), 500
@@ -587,8 +1206,10 @@ def admin_dashboard():
         # Estatísticas
         total_users = User.query.count()
         premium_users = User.query.filter_by(is_premium=True).count()
-        total_ideas = GenerationHistory.query.filter_by(type='ideas').count()
-        total_scripts = GenerationHistory.query.filter_by(type='script').count()
+        # Contadores agregados: o histórico antigo é arquivado e sai de generation_history
+        stats = AppStatistics.query.first()
+        total_ideas = stats.total_ideas_generated if stats else 0
+        total_scripts = stats.total_scripts_generated if stats else 0
         
         return jsonify({
             "status": "success",
@@ -631,6 +1252,24 @@ def get_user(user_id):
         
     except Exception as e:
         return jsonify({"error": f"Erro interno: {str(e)}"}), 500
+
+@main_bp.route('/admin/export/history', methods=['GET'])
+@jwt_required()
+def admin_export_history():
+    """Exporta o histórico de toda a plataforma (?user_id= para um usuário específico)"""
+    try:
+        admin = User.query.get(int(get_jwt_identity()))
+        
+        if not admin or not admin.is_admin:
+            return jsonify({"error": "Acesso não autorizado"}), 403
+        
+        return stream_history_export(
+            user_id=request.args.get('user_id', type=int),
+            filename=f"historico_plataforma_{date.today().isoformat()}"
+        )
+        
+    except Exception as e:
+        return jsonify({"error": f"Erro interno: {str(e)}"}), 500
         
     except Exception as e:
         return jsonify({"error": f"Erro interno: {str(e)}"}), 500
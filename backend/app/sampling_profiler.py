@@ -0,0 +1,195 @@
+"""Profiler por amostragem (wall-clock) para requisições em produção
+
+Uma única thread amostra, em intervalos fixos, a pilha das threads que estão
+atendendo requisições marcadas para profiling. As pilhas são agregadas no
+formato "collapsed" (uma linha por pilha + contagem), compatível com
+flamegraph.pl e speedscope.
+
+Não funciona com o worker gevent: sys._current_frames() só enxerga as
+threads do SO (as greenlets ficam invisíveis) e threading.get_ident() passa a
+devolver o id da greenlet. Nesse caso o profiler é desativado com um aviso.
+"""
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import request
+
+TRUNCATED_STACK = '[pilhas descartadas: limite de memória]'
+
+
+class SamplingProfiler:
+    def __init__(self, interval=0.005, max_stacks=5000, max_depth=64):
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self.max_depth = max_depth
+        self._targets = {}
+        self._stacks = Counter()
+        self._samples = 0
+        self._profiled_requests = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.enabled = True
+
+    def configure(self, interval=None, max_stacks=None, max_depth=None):
+        if interval is not None:
+            self.interval = interval
+        if max_stacks is not None:
+            self.max_stacks = max_stacks
+        if max_depth is not None:
+            self.max_depth = max_depth
+
+    # ======================
+    # CONTROLE DE ALVOS
+    # ======================
+
+    def add_target(self, thread_id, label):
+        with self._lock:
+            self._targets[thread_id] = label
+            self._profiled_requests += 1
+        self._ensure_thread()
+        self._wakeup.set()
+
+    def remove_target(self, thread_id):
+        with self._lock:
+            self._targets.pop(thread_id, None)
+
+    def _ensure_thread(self):
+        # Após um fork a thread não existe mais no processo filho
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+            self._thread.start()
+
+    # ======================
+    # AMOSTRAGEM
+    # ======================
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while True:
+            # Limpa antes de ler os alvos: um add_target entre a leitura e o wait não se perde
+            self._wakeup.clear()
+            with self._lock:
+                targets = dict(self._targets)
+            if not targets:
+                # Sem requisições marcadas: dorme até a próxima sem custo de CPU
+                self._wakeup.wait()
+                continue
+
+            frames = sys._current_frames()
+            for thread_id, label in targets.items():
+                frame = frames.get(thread_id)
+                if frame is not None and thread_id != own_id:
+                    self._record(self._collapse(frame, label))
+            del frames
+            time.sleep(self.interval)
+
+    def _collapse(self, frame, label):
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            module = os.path.splitext(os.path.basename(code.co_filename))[0]
+            names.append(f"{module}:{code.co_name}")
+            frame = frame.f_back
+        names.append(label)
+        return ';'.join(reversed(names))
+
+    def _record(self, stack):
+        with self._lock:
+            self._samples += 1
+            if stack in self._stacks or len(self._stacks) < self.max_stacks:
+                self._stacks[stack] += 1
+            else:
+                self._stacks[TRUNCATED_STACK] += 1
+
+    # ======================
+    # EXPORTAÇÃO
+    # ======================
+
+    def collapsed(self):
+        """Saída no formato collapsed: 'frame;frame;frame contagem' por linha"""
+        with self._lock:
+            items = self._stacks.most_common()
+        return '\n'.join(f"{stack} {count}" for stack, count in items) + ('\n' if items else '')
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'samples': self._samples,
+                'distinct_stacks': len(self._stacks),
+                'max_stacks': self.max_stacks,
+                'profiled_requests': self._profiled_requests,
+                'active_targets': len(self._targets),
+                'interval_ms': round(self.interval * 1000, 3)
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stacks.clear()
+            self._samples = 0
+            self._profiled_requests = 0
+
+
+# Instância global do profiler
+sampling_profiler = SamplingProfiler()
+
+
+def _requested_by_admin():
+    """Valida se o header de profiling veio de um administrador"""
+    from flask_jwt_extended import verify_jwt_in_request, get_current_user
+
+    try:
+        verify_jwt_in_request(optional=True)
+        user = get_current_user()
+    except Exception:
+        return False
+    return bool(user and user.is_admin)
+
+
+def _gevent_patched():
+    monkey = sys.modules.get('gevent.monkey')
+    return monkey is not None and monkey.is_module_patched('threading')
+
+
+def init_sampling_profiler(app):
+    """Registra os hooks de profiling por header (admin) ou por amostragem de tráfego"""
+    if _gevent_patched():
+        sampling_profiler.enabled = False
+        print("⚠️  Profiler por amostragem desativado: não enxerga as greenlets do worker gevent")
+        return
+
+    sampling_profiler.configure(
+        interval=app.config['PROFILER_INTERVAL_MS'] / 1000.0,
+        max_stacks=app.config['PROFILER_MAX_STACKS']
+    )
+    sample_rate = app.config['PROFILER_SAMPLE_RATE']
+    header = app.config['PROFILER_HEADER']
+
+    @app.before_request
+    def _maybe_start_sampling():
+        sampled = sample_rate > 0 and random.random() < sample_rate
+        if not sampled and not (request.headers.get(header) and _requested_by_admin()):
+            return
+        thread_id = threading.get_ident()
+        request.environ['contentai.profiled_thread'] = thread_id
+        sampling_profiler.add_target(thread_id, request.endpoint or request.path)
+
+    @app.after_request
+    def _mark_sampled(response):
+        if 'contentai.profiled_thread' in request.environ:
+            response.headers['X-Profiled'] = '1'
+        return response
+
+    @app.teardown_request
+    def _stop_sampling(exc):
+        thread_id = request.environ.pop('contentai.profiled_thread', None)
+        if thread_id is not None:
+            sampling_profiler.remove_target(thread_id)
+
+    if sample_rate > 0:
+        print(f"✅ Profiler por amostragem ativo para {sample_rate:.1%} do tráfego")
@@ -0,0 +1,158 @@
+"""Leitura tolerante das respostas da IA e métricas de parsing
+
+O modelo nem sempre devolve só o array pedido: às vezes vem texto antes e
+depois, cercas de código (```json) ou a resposta é cortada no limite de
+tokens. Em vez de um regex guloso sobre o texto todo, o extrator decodifica
+o array inteiro quando possível e, se não der, recupera objeto por objeto
+(json.JSONDecoder.raw_decode) tudo o que estiver completo.
+"""
+import json
+import threading
+
+_decoder = json.JSONDecoder()
+
+IDEA_FIELDS = ('title', 'description', 'hashtags')
+
+# Esquema para SDKs com saída estruturada (response_schema)
+IDEAS_SCHEMA = {
+    'type': 'array',
+    'items': {
+        'type': 'object',
+        'properties': {field: {'type': 'string'} for field in IDEA_FIELDS},
+        'required': list(IDEA_FIELDS)
+    }
+}
+
+
+def is_truncated(response):
+    """True se o primeiro candidato parou no limite de tokens de saída (finish_reason MAX_TOKENS)"""
+    candidates = getattr(response, 'candidates', None)
+    if not candidates:
+        return False
+    reason = getattr(candidates[0], 'finish_reason', None)
+    # Enum do SDK (nome) ou valor numérico do proto (MAX_TOKENS = 2)
+    return getattr(reason, 'name', reason) in ('MAX_TOKENS', 2)
+
+
+class GenerationResult:
+    """Resultado de uma geração: valor + origem (IA ou fallback)"""
+    __slots__ = ('value', 'fallback', 'outcome')
+
+    def __init__(self, value, fallback=False, outcome='ok'):
+        self.value = value
+        self.fallback = fallback
+        self.outcome = outcome
+
+    @property
+    def cacheable(self):
+        # Fallback, listas incompletas e roteiros cortados não vão para o cache: a próxima chamada tenta a IA de novo
+        return not self.fallback and self.outcome not in ('partial', 'truncated')
+
+
+def _strip_fences(text):
+    text = text.strip()
+    if text.startswith('```'):
+        text = text.split('\n', 1)[1] if '\n' in text else ''
+        if text.rstrip().endswith('```'):
+            text = text.rstrip()[:-3]
+    return text
+
+
+def extract_json_items(text):
+    """Retorna (objetos encontrados, True se o array veio completo e válido)"""
+    text = _strip_fences(text or '')
+    start = text.find('[')
+    if start != -1:
+        try:
+            value, _ = _decoder.raw_decode(text, start)
+            if isinstance(value, list):
+                return [item for item in value if isinstance(item, dict)], True
+        except ValueError:
+            pass
+
+    # Recuperação incremental: cada objeto completo é aproveitado
+    items = []
+    position = max(start, 0)
+    while True:
+        position = text.find('{', position)
+        if position == -1:
+            break
+        try:
+            value, end = _decoder.raw_decode(text, position)
+        except ValueError:
+            position += 1
+            continue
+        if isinstance(value, dict):
+            nested = value.get('ideas')
+            if isinstance(nested, list):
+                items.extend(item for item in nested if isinstance(item, dict))
+            else:
+                items.append(value)
+        position = end
+    return items, False
+
+
+def normalize_idea(item):
+    """Ideia com os três campos como texto, ou None se não tiver título"""
+    title = str(item.get('title') or '').strip()
+    if not title:
+        return None
+    hashtags = item.get('hashtags') or ''
+    if isinstance(hashtags, (list, tuple)):
+        hashtags = ' '.join(str(tag) for tag in hashtags)
+    return {
+        'title': title,
+        'description': str(item.get('description') or '').strip(),
+        'hashtags': str(hashtags).strip()
+    }
+
+
+def parse_ideas(text):
+    """Ideias válidas e sem títulos repetidos + se a resposta veio íntegra"""
+    items, complete = extract_json_items(text)
+    ideas = []
+    seen = set()
+    for item in items:
+        idea = normalize_idea(item)
+        if idea and idea['title'].lower() not in seen:
+            seen.add(idea['title'].lower())
+            ideas.append(idea)
+    return ideas, complete and len(ideas) == len(items)
+
+
+class ParseMetrics:
+    """Contadores dos resultados de geração (expostos em /admin/ai-metrics)"""
+
+    OUTCOMES = ('ok', 'salvaged', 'reasked', 'partial', 'truncated', 'fallback', 'unavailable')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.outcomes = {kind: {outcome: 0 for outcome in self.OUTCOMES} for kind in ('ideas', 'script')}
+            self.reasks = 0
+            self.salvaged_items = 0
+            self.errors = 0
+
+    def record(self, kind, outcome, salvaged_items=0, reasks=0, error=False):
+        with self._lock:
+            self.outcomes[kind][outcome] += 1
+            self.salvaged_items += salvaged_items
+            self.reasks += reasks
+            self.errors += int(error)
+
+    def snapshot(self):
+        with self._lock:
+            totals = {kind: sum(counts.values()) for kind, counts in self.outcomes.items()}
+            return {
+                'outcomes': {kind: dict(counts) for kind, counts in self.outcomes.items()},
+                'fallback_rate': {
+                    kind: round((counts['fallback'] + counts['unavailable']) / totals[kind], 4) if totals[kind] else 0.0
+                    for kind, counts in self.outcomes.items()
+                },
+                'reasks': self.reasks,
+                'salvaged_items': self.salvaged_items,
+                'errors': self.errors
+            }
@@ -1,195 +1,251 @@
+import json
 import os
-import google.generativeai as genai
+import threading
+import time
 from typing import List, Dict
 import logging
 
+from app.services.ai_parsing import IDEAS_SCHEMA, GenerationResult, ParseMetrics, is_truncated, parse_ideas
+from app.services.hedging import HedgingPolicy
+from app.services.model_router import ModelRouter
+from app.services.prompts import count_tokens, prompt_registry
+from app.services.token_usage import token_meter
+from app.services import fallback_engine
+
+# Modelo padrão de todas as tarefas quando AI_MODELS não é configurado
+MODEL_NAME = 'models/gemini-1.5-flash-latest'
+AI_TASKS = ('ideas', 'script')
+
 class AIService:
     def __init__(self):
         self.api_key = os.environ.get('GEMINI_API_KEY')
-        if not self.api_key:
+        # gemini (padrão) ou stub (modelo local para benchmarks/testes)
+        self.provider = os.environ.get('AI_PROVIDER', 'gemini')
+        # grpc (padrão do SDK) ou rest: sob gevent o REST usa sockets cooperativos
+        self.transport = os.environ.get('GEMINI_TRANSPORT') or None
+        self._models = {}
+        self._model_lock = threading.Lock()
+        self._structured_config = None
+        self.prompts = prompt_registry
+        self.metrics = ParseMetrics()
+        # ✅ Hedging: segunda chamada idêntica quando a primeira passa do p90 do template
+        self.hedging = HedgingPolicy(
+            enabled=os.environ.get('AI_HEDGING', '').lower() in ('1', 'true', 'yes'),
+            quantile=float(os.environ.get('AI_HEDGE_QUANTILE', 0.9)),
+            max_rate=float(os.environ.get('AI_HEDGE_MAX_RATE', 0.15)),
+            min_delay_ms=float(os.environ.get('AI_HEDGE_MIN_DELAY_MS', 50))
+        )
+        # ✅ Modelos candidatos por tarefa: AI_MODELS='{"ideas": ["models/a", "models/b"], "script": [...]}'
+        models = json.loads(os.environ['AI_MODELS']) if os.environ.get('AI_MODELS') else {}
+        self.router = ModelRouter(
+            {task: models.get(task) or [MODEL_NAME] for task in AI_TASKS},
+            quality_floor=float(os.environ.get('AI_ROUTER_QUALITY_FLOOR', 0.8)),
+            explore_rate=float(os.environ.get('AI_ROUTER_EXPLORE_RATE', 0.05)),
+            max_attempts=int(os.environ.get('AI_ROUTER_MAX_ATTEMPTS', 2))
+        )
+        # Perfis de latência/falha por modelo local: '{"stub-lento": {"latency_ms": 800, "fail_rate": 0.2}}'
+        self.stub_profiles = json.loads(os.environ.get('AI_STUB_PROFILES') or '{}')
+        if self.provider == 'stub':
+            self.fallback_mode = False
+        elif not self.api_key:
             logging.warning("GEMINI_API_KEY não encontrada. Usando modo fallback.")
             self.fallback_mode = True
         else:
-            genai.configure(api_key=self.api_key)
-            
-            # ✅ Usa um modelo que realmente existe da lista
+            # ✅ O SDK do Gemini só é importado na primeira geração (boot mais rápido)
+            self.fallback_mode = False
+
+    @property
+    def model(self):
+        """Modelo preferido de ideias (compatibilidade com scripts de teste)"""
+        return self.get_model(self.router.candidates['ideas'][0])
+
+    def get_model(self, name):
+        """Cliente do modelo criado sob demanda na primeira chamada"""
+        model = self._models.get(name)
+        if model is None:
+            with self._model_lock:
+                model = self._models.get(name)
+                if model is None:
+                    model = self._models[name] = self._create_model(name)
+        return model
+
+    def reset(self):
+        """Descarta os clientes atuais (ex.: após fork); serão recriados no próximo uso"""
+        self._models = {}
+        self._model_lock = threading.Lock()
+        self.fallback_mode = self.provider != 'stub' and not self.api_key
+
+    def _create_model(self, name):
+        if self.provider == 'stub':
+            from app.services.stub_model import StubModel
+            return StubModel(model_name=name, **self.stub_profiles.get(name, {}))
+        try:
+            import google.generativeai as genai
+            genai.configure(api_key=self.api_key, transport=self.transport)
+        except Exception as e:
+            logging.warning(f"❌ Erro ao configurar o SDK do Gemini: {e}")
+            self.fallback_mode = True
+            raise
+        
+        model = genai.GenerativeModel(name)
+        logging.info(f"✅ Modelo {name} configurado com sucesso!")
+        return model
+
+    def _structured_output_config(self):
+        """Opções de JSON + esquema, se o SDK instalado suportar saída estruturada"""
+        if self._structured_config is None:
+            config = {}
+            if self.provider != 'stub':
+                import inspect
+                import google.generativeai as genai
+                params = inspect.signature(genai.GenerationConfig).parameters
+                if 'response_mime_type' in params:
+                    config['response_mime_type'] = 'application/json'
+                if 'response_schema' in params:
+                    config['response_schema'] = IDEAS_SCHEMA
+            self._structured_config = config
+        return self._structured_config
+
+    def _generate_text(self, template_name: str, structured: bool = False, **fields):
+        """Renderiza o template e chama os modelos do plano do roteador (failover em caso de erro)
+
+        Retorna (texto, modelo que respondeu, se a resposta parou no limite de tokens);
+        contabiliza tokens/latência no template e no roteador.
+        """
+        template = self.prompts.get(template_name)
+        prompt, estimated_tokens = template.prepare(**fields)
+        config = template.generation_config()
+        if structured:
+            config.update(self._structured_output_config())
+        
+        last_error = None
+        for attempt, model_name in enumerate(self.router.plan(template_name)):
+            start = time.perf_counter()
             try:
-                # Gemini 1.5 Flash é rápido e eficiente para nosso uso
-                self.model = genai.GenerativeModel('models/gemini-1.5-flash-latest')
-                logging.info("✅ Gemini 1.5 Flash configurado com sucesso!")
-                self.fallback_mode = False
+                model = self.get_model(model_name)
+                response = self.hedging.call(
+                    f"{template_name}:{model_name}",
+                    lambda: model.generate_content(prompt, generation_config=config),
+                    on_discarded=lambda discarded, model_name=model_name: self._meter_discarded(
+                        template_name, model_name, estimated_tokens, discarded
+                    )
+                )
+                text = response.text
             except Exception as e:
-                logging.warning(f"❌ Erro ao configurar modelo: {e}")
-                self.fallback_mode = True
+                template.stats.record_error()
+                self.router.record(template_name, model_name, error=True, failover=attempt > 0)
+                logging.warning(f"Modelo {model_name} falhou ({template_name}): {str(e)}")
+                last_error = e
+                continue
+            latency_ms = (time.perf_counter() - start) * 1000
+            self.router.record(template_name, model_name, latency_ms, failover=attempt > 0)
+            truncated = is_truncated(response)
+            input_tokens, output_tokens = template.record(
+                estimated_tokens, text, latency_ms, getattr(response, 'usage_metadata', None), truncated
+            )
+            token_meter.record(template_name, model_name, input_tokens, output_tokens)
+            return text, model_name, truncated
+        raise last_error
+
+    @staticmethod
+    def _meter_discarded(template_name, model_name, estimated_tokens, response):
+        """Tokens da resposta perdedora do hedge (cobrada, mas não usada)"""
+        try:
+            text = response.text
+        except Exception:  # resposta bloqueada/sem candidatos: só a entrada foi cobrada
+            text = ''
+        input_tokens, output_tokens = count_tokens(estimated_tokens, text, getattr(response, 'usage_metadata', None))
+        token_meter.record(template_name, model_name, input_tokens, output_tokens)
+
+    def _ideas_text(self, niche: str, audience: str, count: int, avoid_titles: List[str] = ()):
+        avoid = ""
+        if avoid_titles:
+            avoid = "Não repita estas ideias já geradas: " + "; ".join(avoid_titles) + "\n"
+        return self._generate_text('ideas', structured=True, niche=niche, audience=audience, count=count, avoid=avoid)
 
     def generate_ideas(self, niche: str, audience: str, count: int = 5) -> List[Dict]:
         """Gera ideias de conteúdo usando Gemini AI"""
+        return self.generate_ideas_result(niche, audience, count).value
+
+    def generate_ideas_result(self, niche: str, audience: str, count: int = 5) -> GenerationResult:
+        """Gera ideias e informa a origem (IA, recuperadas, re-perguntadas ou fallback)"""
         
         if self.fallback_mode:
-            return self._get_fallback_ideas(niche, audience, count)
+            self.metrics.record('ideas', 'unavailable')
+            return GenerationResult(self._get_fallback_ideas(niche, audience, count), fallback=True, outcome='unavailable')
         
         try:
-            prompt = f"""
-            Gere {count} ideias criativas de conteúdo para redes sociais (TikTok, Instagram Reels, YouTube Shorts).
-            
-            NICHÊ: {niche}
-            PÚBLICO-ALVO: {audience}
+            # Ideias cortadas no limite já aparecem como array incompleto no parsing
+            text, model_name, _ = self._ideas_text(niche, audience, count)
+            ideas, complete = parse_ideas(text)
+            self.router.record_parse('ideas', model_name, ideas and complete)
+            outcome = 'ok' if complete else 'salvaged'
+            salvaged = 0 if complete else len(ideas)
+            reasks = 0
             
-            Para cada ideia, retorne APENAS um JSON object com:
-            - title: título criativo (máx. 60 caracteres)
-            - description: descrição detalhada (máx. 150 caracteres)  
-            - hashtags: 4-5 hashtags relevantes
-
-            Formato de resposta:
-            [
-                {{
-                    "title": "Título da ideia 1",
-                    "description": "Descrição detalhada...",
-                    "hashtags": "#hashtag1 #hashtag2 #hashtag3"
-                }},
-                ...
-            ]
-
-            Seja criativo, viral e adequado para o público {audience} interessado em {niche}.
-            """
+            # ✅ Resposta cortada ou incompleta: pede só as ideias que faltam
+            if len(ideas) < count:
+                reasks = 1
+                try:
+                    ideas += self._reask_missing_ideas(niche, audience, count, ideas)
+                except Exception as e:
+                    logging.warning(f"Falha ao completar ideias: {str(e)}")
+                outcome = 'reasked' if len(ideas) >= count else 'partial'
             
-            response = self.model.generate_content(prompt)
-            ideas = self._parse_ai_response(response.text)
+            if not ideas:
+                raise ValueError("Nenhuma ideia válida na resposta")
             
-            return ideas[:count]
+            self.metrics.record('ideas', outcome, salvaged_items=salvaged, reasks=reasks)
+            return GenerationResult(ideas[:count], outcome=outcome)
             
         except Exception as e:
             logging.error(f"Erro ao gerar ideias: {str(e)}")
-            return self._get_fallback_ideas(niche, audience, count)
+            self.metrics.record('ideas', 'fallback', error=True)
+            return GenerationResult(self._get_fallback_ideas(niche, audience, count), fallback=True, outcome='fallback')
+
+    def _reask_missing_ideas(self, niche: str, audience: str, count: int, ideas: List[Dict]) -> List[Dict]:
+        missing = count - len(ideas)
+        seen = {idea['title'].lower() for idea in ideas}
+        text, model_name, _ = self._ideas_text(niche, audience, missing, [idea['title'] for idea in ideas])
+        extra, complete = parse_ideas(text)
+        self.router.record_parse('ideas', model_name, extra and complete)
+        return [idea for idea in extra if idea['title'].lower() not in seen][:missing]
 
     def generate_script(self, idea: str) -> str:
         """Gera roteiro completo usando Gemini AI"""
+        return self.generate_script_result(idea).value
+
+    def generate_script_result(self, idea: str) -> GenerationResult:
+        """Gera roteiro e informa se veio da IA ou do fallback"""
         
         if self.fallback_mode:
-            return self._get_fallback_script(idea)
+            self.metrics.record('script', 'unavailable')
+            return GenerationResult(self._get_fallback_script(idea), fallback=True, outcome='unavailable')
         
         try:
-            prompt = f"""
-            Crie um roteiro COMPLETO e DETALHADO para um vídeo de 20-25 segundos para redes sociais.
-
-            IDEIA: {idea}
-
-            Estruture o roteiro com:
-
-            📝 TÍTULO DO ROTEIRO
-            ⏰ DURAÇÃO TOTAL: 20-25s
-
-            🎬 CENÁRIO: [descrição do ambiente]
-            🎯 PÚBLICO: [público-alvo]
-
-            ⏱️ LINHA DO TEMPO:
-            [0-5s] - GANCHO INICIAL: [ação rápida e impactante]
-            [5-15s] - DESENVOLVIMENTO: [progressão da história]  
-            [15-22s] - CLÍMAX: [momento mais engraçado/impactante]
-            [22-25s] - FINAL: [resolução + call to action]
-
-            🎵 TRILHA SONORA: [sugestão de música]
-            📱 EFEITOS: [efeitos visuais e sonoros]
-            🏷️ HASHTAGS: 5-6 hashtags relevantes
-
-            💡 DICAS DE PRODUÇÃO: [3-4 dicas práticas]
-
-            Seja detalhado, criativo e viral. Use emojis para organizar as seções.
-            """
+            text, model_name, truncated = self._generate_text('script', idea=idea)
+            script = (text or '').strip()
+            self.router.record_parse('script', model_name, script and not truncated)
+            if not script:
+                raise ValueError("Resposta vazia")
             
-            response = self.model.generate_content(prompt)
-            return response.text
+            # Roteiro cortado no max_output_tokens: entregue, mas fora do cache
+            outcome = 'truncated' if truncated else 'ok'
+            self.metrics.record('script', outcome)
+            return GenerationResult(script, outcome=outcome)
             
         except Exception as e:
             logging.error(f"Erro ao gerar roteiro: {str(e)}")
-            return self._get_fallback_script(idea)
-
-    def _parse_ai_response(self, response_text: str) -> List[Dict]:
-        """Parseia a resposta da AI para extrair o JSON"""
-        import json
-        import re
-        
-        try:
-            # Tenta encontrar JSON na resposta
-            json_match = re.search(r'\[.*\]', response_text, re.DOTALL)
-            if json_match:
-                ideas = json.loads(json_match.group())
-                return ideas
-            else:
-                raise ValueError("JSON não encontrado na resposta")
-        except:
-            # Fallback se o parsing falhar
-            return self._get_fallback_ideas("humor", "jovens", 3)
+            self.metrics.record('script', 'fallback', error=True)
+            return GenerationResult(self._get_fallback_script(idea), fallback=True, outcome='fallback')
 
     def _get_fallback_ideas(self, niche: str, audience: str, count: int) -> List[Dict]:
-        """Ideias de fallback quando a API não está disponível"""
-        ideas = [
-            {
-                "title": f"Reações engraçadas a {niche}",
-                "description": f"Vídeo mostrando reações exageradas para {audience}",
-                "hashtags": f"#{niche} #{audience} #humor #viral"
-            },
-            {
-                "title": f"Desafio de {niche}",
-                "description": f"Desafio divertido envolvendo {niche} para {audience}",
-                "hashtags": f"#{niche} #{audience} #desafio #divertido"
-            },
-            {
-                "title": f"Top 3 momentos de {niche}",
-                "description": f"Compilação dos melhores momentos para {audience}",
-                "hashtags": f"#{niche} #{audience} #top3 #melhoresmomentos"
-            }
-        ]
-        return ideas[:count]
+        """Ideias de fallback quando a API não está disponível (geração local combinatória)"""
+        return fallback_engine.generate_ideas(niche, audience, count)
 
     def _get_fallback_script(self, idea: str) -> str:
-        """Roteiro de fallback quando a API não está disponível"""
-        return f"""
-📝 ROTEIRO DETALHADO PARA: {idea}
-
-⏰ DURAÇÃO TOTAL: 20-25 segundos
-
-🎬 CENÁRIO: Ambiente bem iluminado e casual
-🎯 PÚBLICO: Jovens e adultos que apreciam conteúdo engaging
-
-⏱️ LINHA DO TEMPO:
-
-[0-5 SEGUNDOS] - GANCHO INICIAL
-• Entrada impactante com expressão facial exagerada
-• Texto na tela: "{idea}"
-• Efeito sonoro: "whoosh" para chamar atenção
-
-[5-15 SEGUNDOS] - DESENVOLVIMENTO
-• Progressão da história com cortes rápidos
-• 2-3 takes mostrando diferentes ângulos
-• Mudanças expressivas de rosto e linguagem corporal
-
-[15-22 SEGUNDOS] - CLÍMAX
-• Momento mais engraçado da cena
-• Reação exagerada à situação
-• Texto na tela: "O resultado 👀"
-
-[22-25 SEGUNDOS] - FINAL E CHAMADA PARA AÇÃO
-• Resolução rápida e satisfatória
-• Olhar direto para câmera com sorriso
-• Texto: "Compartilha se riu! ❤️ Salva pra ver depois! 💾"
-
-🎵 TRILHA SONORA: Trend atual do TikTok (30% volume)
-📱 EFEITOS: Transições suaves, texto animado
-
-🏷️ HASHTAGS SUGERIDAS:
-#{idea.replace(' ', '').lower()} 
-#viral 
-#engraçado 
-#tiktok 
-#conteudooriginal
-
-💡 DICAS DE PRODUÇÃO:
-• Use iluminação natural sempre que possível
-• Mantenha edição rápida e dinâmica
-• Adicione legendas claras e objetivas
-• Teste o áudio antes de gravar
-"""
+        """Roteiro de fallback quando a API não está disponível (geração local combinatória)"""
+        return fallback_engine.generate_script(idea)
 
 # Instância global do serviço de IA
 ai_service = AIService()
\ No newline at end of file
@@ -0,0 +1,217 @@
+"""Cache em memória com TTL por entrada, stale-while-revalidate e jitter
+
+- Cada entrada expira ttl segundos (± jitter) depois de gravada, então entradas
+  gravadas juntas não expiram todas no mesmo instante.
+- Depois de expirar, a entrada ainda é servida por stale_ttl segundos enquanto
+  uma única atualização roda em background.
+- Misses simultâneos da mesma chave esperam o mesmo cálculo (single-flight),
+  por no máximo wait_timeout segundos; depois disso calculam por conta própria.
+- As atualizações em background rodam em um pool limitado (refresh_workers);
+  com o pool ocupado a entrada stale continua sendo servida.
+- Um contador de geração descarta o resultado de cálculos que começaram antes
+  de uma invalidação, para que não regravem o valor invalidado.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class _Entry:
+    __slots__ = ('value', 'expires_at', 'stale_until')
+
+    def __init__(self, value, expires_at, stale_until):
+        self.value = value
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+
+
+class _Flight:
+    __slots__ = ('event', 'value', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    def __init__(self, name, maxsize=100, ttl=3600, stale_ttl=600, jitter=0.1, refresh_workers=2, wait_timeout=30):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.jitter = jitter
+        self.refresh_workers = refresh_workers
+        self.wait_timeout = wait_timeout
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._refreshing = set()
+        self._generation = 0
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.wait_timeouts = 0
+        self.discarded = 0
+
+    # ======================
+    # LEITURA / ESCRITA
+    # ======================
+
+    def get(self, key, default=None):
+        """Valor ainda válido (sem stale) ou default"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() < entry.expires_at:
+                return entry.value
+        return default
+
+    def set(self, key, value, ttl=None, generation=None):
+        """Grava o valor; com generation, descarta se houve invalidação depois dela"""
+        ttl = self.ttl if ttl is None else ttl
+        now = time.monotonic()
+        expires_at = now + ttl * (1 + random.uniform(-self.jitter, self.jitter))
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                self.discarded += 1
+                return
+            self._entries[key] = _Entry(value, expires_at, expires_at + self.stale_ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute, cacheable=None, unwrap=None):
+        """Retorna o valor da chave, calculando com compute() em caso de miss.
+
+        cacheable(resultado) -> bool permite descartar resultados que não devem
+        ficar no cache (ex.: conteúdo de fallback). unwrap(resultado) define o
+        que é gravado quando compute() devolve um objeto com metadados: hits
+        retornam o valor gravado, misses retornam o resultado de compute().
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now < entry.expires_at:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry.value
+
+            generation = self._generation
+            if entry is not None and now < entry.stale_until:
+                self.stale_hits += 1
+                # Pool cheio: segue servindo o stale até uma atualização terminar
+                if key not in self._refreshing and len(self._refreshing) < self.refresh_workers:
+                    self._refreshing.add(key)
+                    self._refresh_executor().submit(self._refresh, key, compute, cacheable, unwrap, generation)
+                return entry.value
+
+            self.misses += 1
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if not leader:
+            if not flight.event.wait(self.wait_timeout):
+                # Cálculo do líder travado (ex.: Gemini pendurado): não espera até o timeout do gunicorn
+                with self._lock:
+                    self.wait_timeouts += 1
+                result = compute()
+                self._store(key, result, cacheable, unwrap, generation)
+                return result
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+            self._store(key, flight.value, cacheable, unwrap, generation)
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    def _store(self, key, result, cacheable, unwrap, generation=None):
+        if cacheable is None or cacheable(result):
+            self.set(key, result if unwrap is None else unwrap(result), generation=generation)
+
+    def _refresh_executor(self):
+        # Chamado com o lock; threads do pool não sobrevivem ao fork do gunicorn
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(self.refresh_workers, thread_name_prefix=f"cache-{self.name}")
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    def _refresh(self, key, compute, cacheable, unwrap, generation):
+        try:
+            self._store(key, compute(), cacheable, unwrap, generation)
+            with self._lock:
+                self.refreshes += 1
+        except Exception as e:
+            logging.warning(f"Falha ao atualizar cache {self.name} ({key}): {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    # ======================
+    # INVALIDAÇÃO
+    # ======================
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generation += 1
+            return self._entries.pop(key, None) is not None
+
+    def invalidate_prefix(self, prefix):
+        with self._lock:
+            self._generation += 1
+            keys = [key for key in self._entries if key.startswith(prefix)]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            removed = len(self._entries)
+            self._entries.clear()
+        return removed
+
+    def purge_expired(self):
+        """Remove entradas que já passaram da janela de stale"""
+        now = time.monotonic()
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if now >= entry.stale_until]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries)
+
+    def info(self):
+        with self._lock:
+            size = len(self._entries)
+        return {
+            'size': size,
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'refreshes': self.refreshes,
+            'wait_timeouts': self.wait_timeouts,
+            'discarded': self.discarded,
+            'ttl': self.ttl
+        }
@@ -0,0 +1,154 @@
+"""Aquecimento do cache na inicialização (deploys e restarts)
+
+Fontes, em ordem de preferência:
+1. Snapshot em arquivo (CACHE_SNAPSHOT_PATH) salvo no encerramento do processo
+2. GenerationHistory recente, ranqueado pela frequência de cada chave
+
+Roda em uma thread em background com orçamento de tempo, sem atrasar o boot.
+"""
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+SNAPSHOT_VERSION = 1
+
+
+class CacheTarget:
+    """Um cache a aquecer e como extrair (chave, valor) de um registro do histórico"""
+
+    def __init__(self, name, cache, history_type, extract):
+        self.name = name
+        self.cache = cache
+        self.history_type = history_type
+        self.extract = extract
+
+
+def _fill(cache, ranked):
+    """Grava as chaves mais frequentes sem sobrescrever entradas já calculadas"""
+    loaded = 0
+    # Do menos para o mais popular: os mais populares ficam no fim do LRU
+    for key, value in reversed(ranked[:cache.maxsize]):
+        if cache.get(key) is None:
+            cache.set(key, value)
+            loaded += 1
+    return loaded
+
+
+def warm_from_snapshot(path, targets, max_age):
+    try:
+        with open(path, encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if snapshot.get('version') != SNAPSHOT_VERSION or time.time() - snapshot.get('saved_at', 0) > max_age:
+        return None
+
+    loaded = {}
+    for target in targets:
+        entries = snapshot.get('caches', {}).get(target.name, [])
+        # O snapshot guarda do mais recente (MRU) para o mais antigo
+        loaded[target.name] = _fill(target.cache, [tuple(entry) for entry in entries])
+    return loaded
+
+
+def warm_from_history(targets, deadline, lookback_days, max_rows):
+    from app.models import db, GenerationHistory
+
+    since = datetime.utcnow() - timedelta(days=lookback_days)
+    by_type = {target.history_type: target for target in targets}
+    frequency = {target.name: Counter() for target in targets}
+    latest = {target.name: {} for target in targets}
+
+    rows = db.session.query(GenerationHistory.type, GenerationHistory.data).filter(
+        GenerationHistory.created_at >= since,
+        GenerationHistory.type.in_(list(by_type))
+    ).order_by(GenerationHistory.created_at.desc()).limit(max_rows)
+
+    for history_type, data in rows.yield_per(500):
+        if time.monotonic() > deadline:
+            logging.warning("⏱️  Aquecimento do cache interrompido: orçamento de tempo esgotado")
+            break
+        target = by_type[history_type]
+        try:
+            item = target.extract(json.loads(data))
+        except (ValueError, KeyError, TypeError):
+            continue
+        if item is None:
+            continue
+        key, value = item
+        frequency[target.name][key] += 1
+        # Linhas vêm da mais recente para a mais antiga: guarda o resultado mais novo
+        latest[target.name].setdefault(key, value)
+
+    loaded = {}
+    for target in targets:
+        ranked = [(key, latest[target.name][key]) for key, _ in frequency[target.name].most_common()]
+        loaded[target.name] = _fill(target.cache, ranked)
+    return loaded
+
+
+def save_snapshot(path, targets):
+    """Grava o conteúdo atual dos caches (escrita atômica)"""
+    caches = {}
+    for target in targets:
+        entries = []
+        for key in reversed(target.cache.keys()):
+            value = target.cache.get(key)
+            if value is not None:
+                entries.append([key, value])
+        caches[target.name] = entries
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump({'version': SNAPSHOT_VERSION, 'saved_at': time.time(), 'caches': caches}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def start_cache_warmup(app, targets):
+    """Dispara o aquecimento em background e registra o snapshot no encerramento"""
+    config = app.config
+    snapshot_path = config.get('CACHE_SNAPSHOT_PATH')
+
+    if snapshot_path and not getattr(app, 'cache_snapshot_registered', False):
+        def _save_on_exit():
+            # Processos que não atenderam requisições (ex.: master do gunicorn) não sobrescrevem
+            if sum(t.cache.hits + t.cache.misses for t in targets) == 0:
+                return
+            try:
+                save_snapshot(snapshot_path, targets)
+            except OSError as e:
+                logging.warning(f"Não foi possível salvar o snapshot do cache: {e}")
+
+        atexit.register(_save_on_exit)
+        app.cache_snapshot_registered = True
+
+    def _run():
+        start = time.monotonic()
+        deadline = start + config['CACHE_WARMUP_BUDGET_SECONDS']
+        try:
+            source = 'snapshot'
+            loaded = None
+            if snapshot_path:
+                loaded = warm_from_snapshot(snapshot_path, targets, config['CACHE_SNAPSHOT_MAX_AGE'])
+            if loaded is None:
+                source = 'histórico'
+                with app.app_context():
+                    loaded = warm_from_history(
+                        targets, deadline, config['CACHE_WARMUP_LOOKBACK_DAYS'], config['CACHE_WARMUP_MAX_ROWS']
+                    )
+            app.cache_warmup_done = True
+            summary = ', '.join(f"{name}: {count}" for name, count in loaded.items())
+            print(f"🔥 Cache aquecido via {source} em {time.monotonic() - start:.2f}s ({summary})")
+        except Exception as e:
+            logging.warning(f"Falha ao aquecer o cache: {e}")
+
+    thread = threading.Thread(target=_run, name='cache-warmup', daemon=True)
+    thread.start()
+    return thread
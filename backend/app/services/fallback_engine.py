@@ -0,0 +1,265 @@
+"""Geração local de ideias e roteiros (modo degradado, sem rede)
+
+Usada quando a IA não está configurada ou falha. Combina uma biblioteca de
+formatos, ganchos e conjuntos de hashtags escolhidos pelas palavras-chave do
+nicho/público. Tudo é montado no import (índices de palavras-chave e
+templates); cada chamada só sorteia combinações com um gerador semeado pela
+entrada, então o mesmo pedido sempre devolve o mesmo conteúdo.
+"""
+import itertools
+import random
+import zlib
+from functools import lru_cache
+
+from app.services.semantic_cache import normalize_text
+
+# ======================
+# BIBLIOTECA
+# ======================
+
+# (título, descrição, hashtag do formato)
+IDEA_FORMATS = [
+    ("Reações engraçadas a {niche}", "Vídeo mostrando reações exageradas para {audience}", "#humor"),
+    ("Desafio de {niche}", "Desafio divertido envolvendo {niche} para {audience}", "#desafio"),
+    ("Top 3 momentos de {niche}", "Compilação dos melhores momentos para {audience}", "#top3"),
+    ("Mitos e verdades sobre {niche}", "Desmentindo em segundos o que {audience} mais ouve sobre {niche}", "#mitoouverdade"),
+    ("Erros que todo iniciante comete em {niche}", "Os deslizes mais comuns e como evitar, direto ao ponto para {audience}", "#dicas"),
+    ("Antes e depois: {niche}", "Transformação rápida com corte seco no meio, perfeita para {audience}", "#antesedepois"),
+    ("{niche} em 15 segundos", "Tutorial relâmpago: o essencial de {niche} sem enrolação para {audience}", "#tutorial"),
+    ("POV: você finalmente entendeu {niche}", "Cena em primeira pessoa que {audience} vai reconhecer na hora", "#pov"),
+    ("Um dia na vida com {niche}", "Mini vlog mostrando a rotina real por trás de {niche}", "#rotina"),
+    ("Respondendo comentários sobre {niche}", "Escolha as dúvidas mais frequentes de {audience} e responda em sequência", "#perguntaserespostas"),
+    ("Expectativa x realidade em {niche}", "Tela dividida comparando o que {audience} imagina e o que acontece", "#expectativaxrealidade"),
+    ("Truque que ninguém te contou sobre {niche}", "Um segredo prático revelado no final para prender {audience} até o fim", "#truque"),
+    ("{niche} com o que você tem em casa", "Versão acessível e sem gastar nada, feita para {audience}", "#facil"),
+    ("Classificando tendências de {niche}", "Ranking rápido do pior ao melhor com a opinião sincera para {audience}", "#ranking"),
+    ("O que ninguém fala sobre {niche}", "Bastidores e verdades inconvenientes contadas de forma leve para {audience}", "#bastidores"),
+    ("3 níveis de {niche}: iniciante, médio e pro", "Mesma tarefa em três níveis de dificuldade para {audience}", "#niveis"),
+]
+
+# Variações que multiplicam os formatos quando count passa da biblioteca
+IDEA_ANGLES = [
+    "", " (edição {audience})", " em versão rápida", " sem gastar nada", " parte 2",
+    " com reviravolta no final", " ao som da trend do momento", " em dupla",
+]
+
+HOOKS = [
+    "Entrada impactante com expressão facial exagerada",
+    "Pergunta direta para a câmera nos primeiros 2 segundos",
+    "Começa pelo resultado final e volta no tempo",
+    "Frase polêmica na tela para gerar curiosidade",
+    "Close em um detalhe inesperado com zoom rápido",
+    "Som alto de notificação seguido de olhar surpreso",
+]
+
+DEVELOPMENTS = [
+    "Progressão da história com cortes rápidos",
+    "Passo a passo em 3 takes com ângulos diferentes",
+    "Comparação lado a lado com legenda explicativa",
+    "Sequência de reações exageradas a cada etapa",
+    "Narração em off enquanto a ação acontece",
+]
+
+CLIMAXES = [
+    "Momento mais engraçado da cena com reação exagerada",
+    "Revelação do resultado com efeito de transição",
+    "Reviravolta inesperada que muda o sentido do vídeo",
+    "O erro acontece e vira a piada do vídeo",
+]
+
+ENDINGS = [
+    "Compartilha se riu! ❤️ Salva pra ver depois! 💾",
+    "Comenta qual foi a sua parte favorita 👇",
+    "Segue para a parte 2 amanhã 🔔",
+    "Marca aquele amigo que precisa ver isso 👀",
+]
+
+SETTINGS = [
+    "Ambiente bem iluminado e casual",
+    "Cozinha ou sala com luz natural",
+    "Fundo neutro com um objeto de destaque",
+    "Área externa no fim de tarde",
+]
+
+MUSIC = [
+    "Trend atual do TikTok (30% volume)",
+    "Batida lo-fi animada em volume baixo",
+    "Áudio viral com pausa dramática no clímax",
+    "Trilha instrumental acelerada",
+]
+
+EFFECTS = [
+    "Transições suaves, texto animado",
+    "Zoom rápido nos momentos-chave e legendas dinâmicas",
+    "Corte seco no ritmo da música e emojis na tela",
+    "Câmera lenta no clímax e efeito sonoro de impacto",
+]
+
+TIPS = [
+    "Use iluminação natural sempre que possível",
+    "Mantenha edição rápida e dinâmica",
+    "Adicione legendas claras e objetivas",
+    "Teste o áudio antes de gravar",
+    "Grave na vertical e deixe margem para o texto",
+    "Os 2 primeiros segundos decidem a retenção: corte qualquer pausa",
+    "Grave mais de um take do gancho e escolha o melhor",
+]
+
+# Temas indexados por palavras-chave (normalizadas, sem acento)
+THEMES = {
+    'culinaria': (("culinaria", "receita", "receitas", "comida", "cozinha", "gastronomia", "doce", "bolo", "confeitaria"),
+                  ["#receita", "#culinaria", "#cozinha", "#comidacaseira", "#gastronomia"]),
+    'fitness': (("fitness", "academia", "treino", "musculacao", "exercicio", "saude", "corrida", "dieta"),
+                ["#fitness", "#treino", "#academia", "#vidasaudavel", "#foco"]),
+    'tecnologia': (("tecnologia", "tech", "programacao", "apps", "app", "celular", "ia", "inteligencia", "gadgets"),
+                   ["#tecnologia", "#tech", "#inovacao", "#dicastech", "#apps"]),
+    'humor': (("humor", "comedia", "engracado", "piada", "meme", "memes"),
+              ["#humor", "#comedia", "#memes", "#engracado", "#risadas"]),
+    'educacao': (("educacao", "estudo", "estudos", "vestibular", "enem", "escola", "idiomas", "ingles"),
+                 ["#educacao", "#estudos", "#aprender", "#dicasdeestudo", "#conhecimento"]),
+    'beleza': (("beleza", "maquiagem", "moda", "skincare", "cabelo", "estilo", "look"),
+               ["#beleza", "#maquiagem", "#moda", "#skincare", "#estilo"]),
+    'pets': (("pets", "pet", "cachorro", "cachorros", "gato", "gatos", "animais"),
+             ["#pets", "#cachorro", "#gato", "#amoanimal", "#petlovers"]),
+    'financas': (("financas", "dinheiro", "investimento", "investimentos", "economia", "renda", "negocios", "empreendedorismo"),
+                 ["#financas", "#dinheiro", "#investimentos", "#educacaofinanceira", "#empreender"]),
+    'viagem': (("viagem", "viagens", "turismo", "viajar", "praia", "mochilao"),
+               ["#viagem", "#turismo", "#viajar", "#destinos", "#trip"]),
+    'games': (("games", "jogos", "game", "gamer", "videogame", "esports"),
+              ["#games", "#gamer", "#jogos", "#gameplay", "#esports"]),
+    'musica': (("musica", "cantor", "banda", "violao", "rap", "funk", "sertanejo"),
+               ["#musica", "#cover", "#music", "#cantando", "#som"]),
+}
+
+AUDIENCES = {
+    'jovens': (("jovens", "jovem", "adolescentes", "teens", "geracao"), "#jovens"),
+    'adultos': (("adultos", "adulto", "profissionais"), "#vidaadulta"),
+    'idosos': (("idosos", "idoso", "terceira", "melhor"), "#melhoridade"),
+    'pais': (("pais", "maes", "mae", "pai", "familia", "familias"), "#familia"),
+    'estudantes': (("estudantes", "estudante", "universitarios", "alunos"), "#estudantes"),
+    'empreendedores': (("empreendedores", "empresarios", "autonomos", "negocios"), "#empreendedores"),
+}
+
+GENERIC_HASHTAGS = ["#viral", "#fyp", "#conteudooriginal", "#dicas", "#tendencia"]
+
+
+def _build_index(table):
+    index = {}
+    for name, (keywords, _) in table.items():
+        for keyword in keywords:
+            index.setdefault(keyword, name)
+    return index
+
+
+THEME_INDEX = _build_index(THEMES)
+AUDIENCE_INDEX = _build_index(AUDIENCES)
+# Combinações formato × ângulo: primeiro os formatos puros (mais naturais), depois as variações
+IDEA_COMBINATIONS = list(itertools.product(range(len(IDEA_FORMATS)), range(len(IDEA_ANGLES))))
+PLAIN_COMBINATIONS = [combo for combo in IDEA_COMBINATIONS if combo[1] == 0]
+ANGLED_COMBINATIONS = [combo for combo in IDEA_COMBINATIONS if combo[1] != 0]
+
+
+def _match(index, text):
+    for word in normalize_text(text).split():
+        if word in index:
+            return index[word]
+    return None
+
+
+@lru_cache(maxsize=4096)
+def _ideas_profile(niche, audience):
+    """Hashtags do tema e do nicho/público (nichos se repetem muito: resultado em cache)"""
+    theme = _match(THEME_INDEX, niche)
+    audience_key = _match(AUDIENCE_INDEX, audience)
+    theme_tags = THEMES[theme][1] if theme else GENERIC_HASHTAGS
+    audience_tag = AUDIENCES[audience_key][1] if audience_key else _slug_tag(audience)
+    return theme_tags, [tag for tag in (_slug_tag(niche), audience_tag) if tag]
+
+
+def _slug_tag(text):
+    slug = normalize_text(text).replace(' ', '')
+    return f"#{slug}" if slug else None
+
+
+def _rng(*parts):
+    """Gerador determinístico pela entrada (mesmo pedido, mesmo conteúdo)"""
+    return random.Random(zlib.crc32('|'.join(str(part) for part in parts).encode('utf-8')))
+
+
+# ======================
+# GERAÇÃO
+# ======================
+
+def generate_ideas(niche, audience, count, seed=0):
+    """count ideias distintas para o nicho/público (count < 0 vale como 0)"""
+    # rng.sample levanta ValueError com tamanho negativo
+    count = max(0, int(count))
+    rng = _rng('ideas', niche, audience, count, seed)
+    theme_tags, base_tags = _ideas_profile(niche, audience)
+
+    if count <= len(PLAIN_COMBINATIONS):
+        combos = rng.sample(PLAIN_COMBINATIONS, count)
+    else:
+        combos = rng.sample(PLAIN_COMBINATIONS, len(PLAIN_COMBINATIONS)) + \
+            rng.sample(ANGLED_COMBINATIONS, len(ANGLED_COMBINATIONS))
+
+    ideas = []
+    for i in range(count):
+        format_index, angle_index = combos[i % len(combos)]
+        title, description, format_tag = IDEA_FORMATS[format_index]
+        title = title.format(niche=niche) + IDEA_ANGLES[angle_index].format(audience=audience)
+        if i >= len(combos):
+            title += f" #{i // len(combos) + 1}"
+        tags = list(dict.fromkeys(base_tags + [format_tag] + rng.sample(theme_tags, 2) + ["#viral"]))
+        ideas.append({
+            "title": title[0].upper() + title[1:],
+            "description": description.format(niche=niche, audience=audience),
+            "hashtags": " ".join(tags[:5])
+        })
+    return ideas
+
+
+def generate_script(idea, seed=0):
+    """Roteiro de 20-25s no mesmo formato das respostas da IA"""
+    rng = _rng('script', idea, seed)
+    theme = _match(THEME_INDEX, idea)
+    theme_tags = THEMES[theme][1] if theme else GENERIC_HASHTAGS
+    tags = list(dict.fromkeys([tag for tag in [_slug_tag(idea)] if tag] + rng.sample(theme_tags, 3) + ["#viral", "#tiktok"]))
+    tips = rng.sample(TIPS, 4)
+
+    return f"""
+📝 ROTEIRO DETALHADO PARA: {idea}
+
+⏰ DURAÇÃO TOTAL: 20-25 segundos
+
+🎬 CENÁRIO: {rng.choice(SETTINGS)}
+🎯 PÚBLICO: Pessoas interessadas em {idea}
+
+⏱️ LINHA DO TEMPO:
+
+[0-5 SEGUNDOS] - GANCHO INICIAL
+• {rng.choice(HOOKS)}
+• Texto na tela: "{idea}"
+• Efeito sonoro: "whoosh" para chamar atenção
+
+[5-15 SEGUNDOS] - DESENVOLVIMENTO
+• {rng.choice(DEVELOPMENTS)}
+• Mudanças expressivas de rosto e linguagem corporal
+
+[15-22 SEGUNDOS] - CLÍMAX
+• {rng.choice(CLIMAXES)}
+• Texto na tela: "O resultado 👀"
+
+[22-25 SEGUNDOS] - FINAL E CHAMADA PARA AÇÃO
+• Olhar direto para câmera com sorriso
+• Texto: "{rng.choice(ENDINGS)}"
+
+🎵 TRILHA SONORA: {rng.choice(MUSIC)}
+📱 EFEITOS: {rng.choice(EFFECTS)}
+
+🏷️ HASHTAGS SUGERIDAS:
+{chr(10).join(tags[:6])}
+
+💡 DICAS DE PRODUÇÃO:
+{chr(10).join('• ' + tip for tip in tips)}
+"""
@@ -0,0 +1,157 @@
+"""Requisições hedged ao provedor de IA (corte da cauda de latência)
+
+Se a primeira tentativa não responde dentro do limiar do template (o
+percentil observado, p90 por padrão), uma segunda chamada idêntica é
+disparada e vale a que terminar primeiro; a outra é ignorada (a chamada HTTP
+em andamento não tem como ser cancelada), mas o resultado dela ainda vai
+para on_discarded quando chega: os tokens foram cobrados do mesmo jeito.
+As tentativas rodam no contexto (contextvars) de quem chamou. O limiar vem da latência de cada
+tentativa individual, incluindo as perdedoras, para não encolher com o
+próprio hedging.
+
+O custo extra é limitado por um orçamento: cada requisição credita max_rate
+hedge e cada hedge consome um. Com limiar no p90 ~10% das chamadas pedem
+hedge; o teto padrão (15%) fica acima disso para só atuar quando a latência
+muda mais rápido que o limiar (ou com quantis baixos). Sem amostras
+suficientes não há hedging.
+"""
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+
+class HedgingPolicy:
+    def __init__(self, enabled=False, quantile=0.9, max_rate=0.15, burst=10,
+                 min_samples=20, min_delay_ms=50, samples=500):
+        self.enabled = enabled
+        self.quantile = quantile
+        self.max_rate = max_rate
+        self.burst = burst
+        self.min_samples = min_samples
+        self.min_delay_ms = min_delay_ms
+        self._samples = samples
+        self._lock = threading.Lock()
+        self._latencies = {}
+        self._thresholds = {}
+        self._budget = 0.0
+        self.counters = {
+            'requests': 0, 'hedged': 0, 'hedge_wins': 0, 'budget_denied': 0, 'primary_errors': 0, 'discarded': 0
+        }
+
+    # ---------- limiar adaptativo ----------
+
+    def _observe(self, name, latency_ms):
+        with self._lock:
+            latencies = self._latencies.get(name)
+            if latencies is None:
+                latencies = self._latencies[name] = deque(maxlen=self._samples)
+            latencies.append(latency_ms)
+            # Recalcula o percentil a cada 10 amostras (ordenar a janela toda por chamada é desperdício)
+            if len(latencies) >= self.min_samples and (name not in self._thresholds or len(latencies) % 10 == 0):
+                ordered = sorted(latencies)
+                value = ordered[min(len(ordered) - 1, int(len(ordered) * self.quantile))]
+                self._thresholds[name] = max(self.min_delay_ms, value)
+
+    def threshold_ms(self, name):
+        """Limiar atual do template, ou None enquanto não há amostras suficientes"""
+        return self._thresholds.get(name)
+
+    # ---------- orçamento ----------
+
+    def _take_hedge(self):
+        with self._lock:
+            if self._budget >= 1:
+                self._budget -= 1
+                self.counters['hedged'] += 1
+                return True
+            self.counters['budget_denied'] += 1
+            return False
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    # ---------- chamada ----------
+
+    def _start(self, name, fn):
+        """Executa fn em uma thread própria (greenlet sob gevent) e devolve o Future"""
+        future = Future()
+
+        def run():
+            start = time.perf_counter()
+            try:
+                result = fn()
+            except BaseException as e:
+                future.set_exception(e)
+                return
+            self._observe(name, (time.perf_counter() - start) * 1000)
+            future.set_result(result)
+
+        future.set_running_or_notify_cancel()
+        # Atribuição de tokens da requisição (contextvars) vale também dentro da thread
+        context = contextvars.copy_context()
+        threading.Thread(target=context.run, args=(run,), name=f'hedge-{name}', daemon=True).start()
+        return future
+
+    def _discard(self, loser, on_discarded):
+        """Entrega o resultado da tentativa perdedora a on_discarded quando ela terminar"""
+        def done(future):
+            if future.exception() is not None:
+                return
+            self._count('discarded')
+            if on_discarded is not None:
+                on_discarded(future.result())
+
+        loser.add_done_callback(done)
+
+    def call(self, name, fn, on_discarded=None):
+        """Resultado de fn(); com hedge, on_discarded(resultado) recebe a resposta descartada"""
+        if not self.enabled:
+            return fn()
+
+        with self._lock:
+            self.counters['requests'] += 1
+            self._budget = min(self.burst, self._budget + self.max_rate)
+
+        delay = self.threshold_ms(name)
+        if delay is None:
+            start = time.perf_counter()
+            result = fn()
+            self._observe(name, (time.perf_counter() - start) * 1000)
+            return result
+
+        primary = self._start(name, fn)
+        done, _ = wait([primary], timeout=delay / 1000.0)
+        if done or not self._take_hedge():
+            return primary.result()
+
+        hedge = self._start(name, fn)
+        done, _ = wait([primary, hedge], return_when=FIRST_COMPLETED)
+        # Se as duas terminaram juntas, a primária tem preferência
+        winner = primary if primary in done else hedge
+        if winner.exception() is not None:
+            # A primeira a terminar falhou: a resposta fica com a outra
+            if winner is primary:
+                self._count('primary_errors')
+            winner = hedge if winner is primary else primary
+        if winner is hedge and hedge.exception() is None:
+            self._count('hedge_wins')
+        if winner.exception() is None:
+            self._discard(primary if winner is hedge else hedge, on_discarded)
+        return winner.result()
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+            thresholds = {name: round(value, 1) for name, value in self._thresholds.items()}
+        requests = counters['requests']
+        return {
+            **counters,
+            'enabled': self.enabled,
+            'quantile': self.quantile,
+            'max_rate': self.max_rate,
+            'hedge_rate': round(counters['hedged'] / requests, 4) if requests else 0.0,
+            'thresholds_ms': thresholds
+        }
@@ -0,0 +1,76 @@
+"""Exportação em streaming do histórico de gerações (NDJSON ou CSV)
+
+As linhas são lidas com yield_per (cursor no servidor no Postgres) e escritas
+em lotes por um gerador, então a memória fica constante independente do
+tamanho da exportação. A compressão gzip, quando pedida, é feita em streaming
+sobre os mesmos lotes.
+"""
+import csv
+import io
+import json
+import zlib
+
+from sqlalchemy import select
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+CSV_COLUMNS = ['id', 'type', 'created_at', 'user_id', 'data']
+
+
+def export_query(model, user_id=None, history_type=None, since=None, until=None):
+    """Só as colunas necessárias, em ordem de chave primária (sem sort extra)"""
+    query = select(model.id, model.type, model.created_at, model.user_id, model.data).order_by(model.id)
+    if user_id is not None:
+        query = query.where(model.user_id == user_id)
+    if history_type:
+        query = query.where(model.type == history_type)
+    if since:
+        query = query.where(model.created_at >= since)
+    if until:
+        query = query.where(model.created_at < until)
+    return query
+
+
+def _ndjson_line(row):
+    history_id, history_type, created_at, user_id, data = row
+    # data já é JSON serializado no banco: entra no documento sem decodificar
+    return (
+        f'{{"id":{history_id},"type":{json.dumps(history_type)},'
+        f'"created_at":"{created_at.isoformat()}","user_id":{json.dumps(user_id)},'
+        f'"data":{data or "null"}}}\n'
+    )
+
+
+def iter_export(session, query, fmt='ndjson', batch_size=1000):
+    """Gera blocos de texto com batch_size registros cada"""
+    rows = session.execute(query.execution_options(yield_per=batch_size))
+
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(CSV_COLUMNS)
+        for partition in rows.partitions():
+            for history_id, history_type, created_at, user_id, data in partition:
+                writer.writerow([history_id, history_type, created_at.isoformat(), user_id, data])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+        return
+
+    for partition in rows.partitions():
+        yield ''.join(_ndjson_line(row) for row in partition)
+
+
+def gzip_stream(chunks, level=6):
+    """Comprime um iterável de strings em gzip, bloco a bloco"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,172 @@
+"""Busca textual no histórico de gerações do usuário
+
+- Postgres: tabela generation_history_search com coluna tsvector (config
+  'portuguese') e índice GIN; ranking com ts_rank_cd.
+- SQLite (desenvolvimento): tabela virtual FTS5 com remoção de acentos;
+  ranking com bm25.
+
+O índice é mantido incrementalmente: cada GenerationHistory inserido gera o
+documento de busca na mesma transação (evento after_insert).
+"""
+import json
+import logging
+import re
+
+from sqlalchemy import event, text
+
+SEARCH_CONFIG = 'portuguese'
+
+_listener_installed = False
+
+
+def build_document(history_type, data):
+    """Texto pesquisável: títulos, descrições, hashtags, ideia e roteiro"""
+    if isinstance(data, str):
+        data = json.loads(data)
+    parts = []
+    if history_type == 'ideas':
+        parts += [data.get('niche', ''), data.get('audience', '')]
+        for idea in data.get('ideas', []):
+            if isinstance(idea, dict):
+                parts += [idea.get('title', ''), idea.get('description', ''), idea.get('hashtags', '')]
+    elif history_type == 'script':
+        parts += [data.get('idea', ''), data.get('script', '')]
+    # Hashtags também pesquisáveis sem o '#'
+    return re.sub(r'#(\w)', r'\1', ' '.join(str(part) for part in parts if part))
+
+
+# ======================
+# DDL
+# ======================
+
+def ensure_search_index(connection):
+    """Cria a estrutura de busca do dialeto atual (idempotente)"""
+    dialect = connection.dialect.name
+    if dialect == 'postgresql':
+        connection.execute(text(
+            "CREATE TABLE IF NOT EXISTS generation_history_search ("
+            " history_id INTEGER PRIMARY KEY REFERENCES generation_history(id) ON DELETE CASCADE,"
+            " user_id INTEGER,"
+            " document TSVECTOR NOT NULL)"
+        ))
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_generation_history_search_document "
+            "ON generation_history_search USING GIN (document)"
+        ))
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_generation_history_search_user_id "
+            "ON generation_history_search (user_id)"
+        ))
+    elif dialect == 'sqlite':
+        connection.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS generation_history_fts USING fts5("
+            " document, history_id UNINDEXED, user_id UNINDEXED,"
+            " tokenize = 'unicode61 remove_diacritics 2')"
+        ))
+    else:
+        raise RuntimeError(f"Busca textual não suportada no dialeto {dialect}")
+
+
+# ======================
+# INDEXAÇÃO
+# ======================
+
+def index_entry(connection, history_id, user_id, history_type, data):
+    document = build_document(history_type, data)
+    # A identidade do JWT chega como string; FTS5 não tem afinidade de tipo
+    user_id = int(user_id) if user_id is not None else None
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text(
+            "INSERT INTO generation_history_search (history_id, user_id, document) "
+            f"VALUES (:history_id, :user_id, to_tsvector('{SEARCH_CONFIG}', :document)) "
+            "ON CONFLICT (history_id) DO UPDATE SET document = EXCLUDED.document"
+        ), {'history_id': history_id, 'user_id': user_id, 'document': document})
+    else:
+        connection.execute(
+            text("DELETE FROM generation_history_fts WHERE history_id = :history_id"),
+            {'history_id': history_id}
+        )
+        connection.execute(text(
+            "INSERT INTO generation_history_fts (document, history_id, user_id) "
+            "VALUES (:document, :history_id, :user_id)"
+        ), {'history_id': history_id, 'user_id': user_id, 'document': document})
+
+
+def remove_entries(connection, history_ids):
+    """Remove documentos de históricos apagados (o Postgres já faz via CASCADE)"""
+    if connection.dialect.name == 'sqlite' and history_ids:
+        connection.execute(
+            text("DELETE FROM generation_history_fts WHERE history_id IN (SELECT value FROM json_each(:ids))"),
+            {'ids': json.dumps(list(history_ids))}
+        )
+
+
+def _index_on_insert(mapper, connection, target):
+    index_entry(connection, target.id, target.user_id, target.type, target.data)
+
+
+def install_index_listener(model):
+    global _listener_installed
+    if not _listener_installed:
+        event.listen(model, 'after_insert', _index_on_insert)
+        _listener_installed = True
+
+
+def reindex_all(session, model, batch_size=500):
+    """Reconstrói o índice a partir de todo o histórico (backfill)"""
+    connection = session.connection()
+    count = 0
+    rows = session.query(model.id, model.user_id, model.type, model.data).yield_per(batch_size)
+    for history_id, user_id, history_type, data in rows:
+        try:
+            index_entry(connection, history_id, user_id, history_type, data)
+            count += 1
+        except ValueError as e:
+            logging.warning(f"Histórico {history_id} ignorado na indexação: {e}")
+    session.commit()
+    return count
+
+
+# ======================
+# BUSCA
+# ======================
+
+def _fts5_query(query):
+    """Termos do usuário como frases entre aspas (E implícito), sem operadores FTS5"""
+    terms = re.findall(r'\w+', query, re.UNICODE)
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+def search_history(session, user_id, query, page=1, per_page=10):
+    """Retorna (lista de (history_id, rank), total) ordenada por relevância"""
+    connection = session.connection()
+    offset = (page - 1) * per_page
+
+    if connection.dialect.name == 'postgresql':
+        params = {'user_id': user_id, 'query': query, 'limit': per_page, 'offset': offset}
+        ts_query = f"websearch_to_tsquery('{SEARCH_CONFIG}', :query)"
+        total = connection.execute(text(
+            f"SELECT count(*) FROM generation_history_search WHERE user_id = :user_id AND document @@ {ts_query}"
+        ), params).scalar()
+        rows = connection.execute(text(
+            f"SELECT s.history_id, ts_rank_cd(s.document, {ts_query}) AS rank "
+            "FROM generation_history_search s JOIN generation_history h ON h.id = s.history_id "
+            f"WHERE s.user_id = :user_id AND s.document @@ {ts_query} "
+            "ORDER BY rank DESC, h.created_at DESC, h.id DESC LIMIT :limit OFFSET :offset"
+        ), params).all()
+        return [(row[0], float(row[1])) for row in rows], total
+
+    match = _fts5_query(query)
+    if not match:
+        return [], 0
+    params = {'user_id': user_id, 'match': match, 'limit': per_page, 'offset': offset}
+    total = connection.execute(text(
+        "SELECT count(*) FROM generation_history_fts WHERE generation_history_fts MATCH :match AND user_id = :user_id"
+    ), params).scalar()
+    rows = connection.execute(text(
+        "SELECT history_id, bm25(generation_history_fts) AS rank FROM generation_history_fts "
+        "WHERE generation_history_fts MATCH :match AND user_id = :user_id "
+        "ORDER BY rank, history_id DESC LIMIT :limit OFFSET :offset"
+    ), params).all()
+    # bm25 é negativo (menor = melhor); invertido para "maior = mais relevante"
+    return [(int(row[0]), -float(row[1])) for row in rows], total
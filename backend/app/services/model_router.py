@@ -0,0 +1,133 @@
+"""Roteamento entre modelos candidatos por tarefa
+
+Cada tarefa (template: ideas, script) tem uma lista de modelos candidatos
+(AI_MODELS). O roteador mantém, por tarefa e modelo, uma janela das últimas
+chamadas (latência, erro, resposta aproveitável) e ordena os candidatos:
+
+- qualidade = taxa de parsing bem-sucedido x (1 - taxa de erro)
+- abaixo do piso de qualidade o modelo vai para o fim da fila (só failover)
+- entre os elegíveis vence a menor latência p50
+- sem amostras vale a ordem configurada; modelos novos recebem uma fatia
+  igual do tráfego até terem amostras suficientes
+- uma fração pequena (AI_ROUTER_EXPLORE_RATE) vai para os demais modelos,
+  para que um modelo rebaixado possa voltar
+
+A chamada tenta o plano em ordem: erro no primeiro modelo faz failover para o
+próximo na mesma requisição.
+"""
+import random
+import threading
+from collections import deque
+
+
+class ModelStats:
+    """Janela móvel das últimas chamadas de um modelo em uma tarefa"""
+
+    def __init__(self, window=100):
+        self.latencies = deque(maxlen=window)
+        self.errors = deque(maxlen=window)
+        self.parsed = deque(maxlen=window)
+        self.routed = 0
+        self.failovers = 0
+
+    @property
+    def samples(self):
+        return len(self.errors)
+
+    def latency(self, p):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+    def error_rate(self):
+        return sum(self.errors) / len(self.errors) if self.errors else 0.0
+
+    def parse_rate(self):
+        return sum(self.parsed) / len(self.parsed) if self.parsed else 1.0
+
+    def quality(self):
+        return self.parse_rate() * (1 - self.error_rate())
+
+    def snapshot(self, quality_floor):
+        p50, p90 = self.latency(0.5), self.latency(0.9)
+        return {
+            'samples': self.samples,
+            'routed': self.routed,
+            'failovers': self.failovers,
+            'latency_ms': {'p50': round(p50, 1) if p50 is not None else None,
+                           'p90': round(p90, 1) if p90 is not None else None},
+            'error_rate': round(self.error_rate(), 4),
+            'parse_success_rate': round(self.parse_rate(), 4),
+            'quality': round(self.quality(), 4),
+            'eligible': self.quality() >= quality_floor
+        }
+
+
+class ModelRouter:
+    def __init__(self, candidates, quality_floor=0.8, min_samples=10, explore_rate=0.05,
+                 max_attempts=2, window=100):
+        self.candidates = {task: list(models) for task, models in candidates.items()}
+        self.quality_floor = quality_floor
+        self.min_samples = min_samples
+        self.explore_rate = explore_rate
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._stats = {
+            task: {model: ModelStats(window) for model in models}
+            for task, models in self.candidates.items()
+        }
+
+    def plan(self, task):
+        """Modelos a tentar, em ordem, para uma requisição da tarefa"""
+        models = self.candidates[task]
+        if len(models) == 1:
+            return list(models)
+        with self._lock:
+            stats = self._stats[task]
+            warm = [m for m in models if stats[m].samples >= self.min_samples]
+            cold = [m for m in models if stats[m].samples < self.min_samples]
+            eligible = [m for m in warm if stats[m].quality() >= self.quality_floor]
+            below_floor = sorted((m for m in warm if m not in eligible), key=lambda m: -stats[m].quality())
+            eligible.sort(key=lambda m: stats[m].latency(0.5))
+
+        # cold preserva a ordem configurada: sem amostras, o primeiro da lista é o preferido
+        ordered = eligible + cold + below_floor
+        explore = None
+        if eligible and cold and random.random() < 1 / len(models):
+            # Aquecimento: modelos ainda sem amostras suficientes recebem uma fatia igual
+            explore = random.choice(cold)
+        elif random.random() < self.explore_rate:
+            # Mantém as janelas dos demais atualizadas (um modelo rebaixado pode voltar)
+            explore = random.choice(ordered[1:])
+        if explore is not None:
+            ordered.remove(explore)
+            ordered.insert(0, explore)
+        return ordered[:self.max_attempts]
+
+    def record(self, task, model, latency_ms=None, error=False, failover=False):
+        """Resultado da chamada ao modelo (error=True também quando ela levantou exceção)"""
+        with self._lock:
+            stats = self._stats[task][model]
+            stats.errors.append(int(error))
+            if latency_ms is not None and not error:
+                stats.latencies.append(latency_ms)
+            if failover:
+                stats.failovers += 1
+            else:
+                stats.routed += 1
+
+    def record_parse(self, task, model, parsed):
+        """Se a resposta do modelo foi aproveitável (JSON válido e completo, texto não vazio)"""
+        with self._lock:
+            self._stats[task][model].parsed.append(int(bool(parsed)))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'quality_floor': self.quality_floor,
+                'tasks': {
+                    task: {model: stats[model].snapshot(self.quality_floor) for model in self.candidates[task]}
+                    for task, stats in self._stats.items()
+                }
+            }
@@ -0,0 +1,196 @@
+"""Registro de templates de prompt
+
+Os templates são escritos legíveis (indentados) no código e compactados uma
+única vez no registro: indentação, espaços repetidos e linhas em branco não
+viram tokens de entrada. Cada template tem versão (parte das chaves de cache),
+limite de tokens de saída e temperatura próprios, e acumula tokens de entrada
+e saída, respostas cortadas no limite e latência das chamadas. Os tokens de
+entrada são estimados na renderização, antes do envio.
+"""
+import json
+import math
+import os
+import re
+import threading
+from collections import deque
+
+
+def compact_prompt(text):
+    """Remove indentação, espaços repetidos e linhas vazias"""
+    lines = (re.sub(r'[ \t]+', ' ', line).strip() for line in text.strip().splitlines())
+    return '\n'.join(line for line in lines if line)
+
+
+def estimate_tokens(text):
+    """Estimativa local (~4 caracteres por token), sem chamada à API"""
+    return max(1, math.ceil(len(text) / 4)) if text else 0
+
+
+def count_tokens(estimated_input_tokens, output, usage=None):
+    """(entrada, saída) pela usage_metadata do provedor ou, sem ela, pela estimativa local"""
+    input_tokens = getattr(usage, 'prompt_token_count', None) or estimated_input_tokens
+    output_tokens = getattr(usage, 'candidates_token_count', None) or estimate_tokens(output)
+    return input_tokens, output_tokens
+
+
+class TemplateStats:
+    def __init__(self, samples=500):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=samples)
+        self.calls = 0
+        self.errors = 0
+        self.truncated = 0
+        self.estimated_input_tokens = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def record(self, input_tokens, output_tokens, latency_ms, estimated_input_tokens=0, truncated=False):
+        with self._lock:
+            self.calls += 1
+            self.truncated += int(truncated)
+            self.estimated_input_tokens += estimated_input_tokens
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+            self._latencies.append(latency_ms)
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            calls = self.calls
+
+            def percentile(p):
+                return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 1) if latencies else None
+
+            return {
+                'calls': calls,
+                'errors': self.errors,
+                'truncated': self.truncated,
+                'truncation_rate': round(self.truncated / calls, 4) if calls else 0.0,
+                'estimated_input_tokens': self.estimated_input_tokens,
+                'input_tokens': self.input_tokens,
+                'output_tokens': self.output_tokens,
+                'avg_input_tokens': round(self.input_tokens / calls, 1) if calls else 0,
+                'avg_output_tokens': round(self.output_tokens / calls, 1) if calls else 0,
+                'latency_ms': {'p50': percentile(0.5), 'p90': percentile(0.9), 'p99': percentile(0.99)}
+            }
+
+
+class PromptTemplate:
+    def __init__(self, name, version, text, max_output_tokens=None, temperature=None):
+        self.name = name
+        self.version = version
+        self.text = compact_prompt(text)
+        self.max_output_tokens = max_output_tokens
+        self.temperature = temperature
+        self.raw_tokens = estimate_tokens(text)
+        self.stats = TemplateStats()
+
+    @property
+    def tag(self):
+        """Identificador versionado usado nas chaves de cache"""
+        return f"{self.name}@v{self.version}"
+
+    def render(self, **fields):
+        return self.text.format(**fields)
+
+    def prepare(self, **fields):
+        """(prompt, tokens de entrada estimados) antes do envio ao modelo"""
+        prompt = self.render(**fields)
+        return prompt, estimate_tokens(prompt)
+
+    def generation_config(self):
+        config = {}
+        if self.max_output_tokens:
+            config['max_output_tokens'] = self.max_output_tokens
+        if self.temperature is not None:
+            config['temperature'] = self.temperature
+        return config
+
+    def record(self, estimated_input_tokens, output, latency_ms, usage=None, truncated=False):
+        """Contabiliza a chamada; usa a contagem do provedor quando a resposta traz usage_metadata"""
+        input_tokens, output_tokens = count_tokens(estimated_input_tokens, output, usage)
+        self.stats.record(input_tokens, output_tokens, latency_ms, estimated_input_tokens, truncated)
+        return input_tokens, output_tokens
+
+    def info(self):
+        return {
+            'version': self.version,
+            'tag': self.tag,
+            'max_output_tokens': self.max_output_tokens,
+            'temperature': self.temperature,
+            'template_tokens': estimate_tokens(self.text),
+            'template_tokens_before_compaction': self.raw_tokens,
+            **self.stats.snapshot()
+        }
+
+
+class PromptRegistry:
+    def __init__(self):
+        self._templates = {}
+
+    def register(self, template):
+        self._templates[template.name] = template
+        return template
+
+    def get(self, name):
+        return self._templates[name]
+
+    def configure(self, overrides):
+        """Aplica {"nome": {"max_output_tokens": ..., "temperature": ...}} (ex.: PROMPT_CONFIG)"""
+        for name, options in overrides.items():
+            template = self._templates[name]
+            for option in ('max_output_tokens', 'temperature'):
+                if option in options:
+                    setattr(template, option, options[option])
+
+    def stats(self):
+        return {name: template.info() for name, template in self._templates.items()}
+
+
+# ======================
+# TEMPLATES
+# ======================
+
+IDEAS_TEMPLATE = PromptTemplate('ideas', 2, """
+    Gere {count} ideias criativas de conteúdo para redes sociais (TikTok, Instagram Reels, YouTube Shorts).
+    NICHO: {niche}
+    PÚBLICO-ALVO: {audience}
+    Cada ideia é um objeto JSON com:
+    - title: título criativo (máx. 60 caracteres)
+    - description: descrição detalhada (máx. 150 caracteres)
+    - hashtags: 4-5 hashtags relevantes
+    Responda SOMENTE com o array JSON, sem texto antes ou depois:
+    [{{"title": "...", "description": "...", "hashtags": "#a #b #c #d"}}]
+    {avoid}Seja criativo, viral e adequado para o público {audience} interessado em {niche}.
+""", max_output_tokens=1024, temperature=0.9)
+
+SCRIPT_TEMPLATE = PromptTemplate('script', 2, """
+    Crie um roteiro COMPLETO e DETALHADO para um vídeo de 20-25 segundos para redes sociais.
+    IDEIA: {idea}
+    Estruture o roteiro com:
+    📝 TÍTULO DO ROTEIRO
+    ⏰ DURAÇÃO TOTAL: 20-25s
+    🎬 CENÁRIO: [descrição do ambiente]
+    🎯 PÚBLICO: [público-alvo]
+    ⏱️ LINHA DO TEMPO:
+    [0-5s] - GANCHO INICIAL: [ação rápida e impactante]
+    [5-15s] - DESENVOLVIMENTO: [progressão da história]
+    [15-22s] - CLÍMAX: [momento mais engraçado/impactante]
+    [22-25s] - FINAL: [resolução + call to action]
+    🎵 TRILHA SONORA: [sugestão de música]
+    📱 EFEITOS: [efeitos visuais e sonoros]
+    🏷️ HASHTAGS: 5-6 hashtags relevantes
+    💡 DICAS DE PRODUÇÃO: [3-4 dicas práticas]
+    Seja detalhado, criativo e viral. Use emojis para organizar as seções.
+""", max_output_tokens=900, temperature=0.8)
+
+prompt_registry = PromptRegistry()
+prompt_registry.register(IDEAS_TEMPLATE)
+prompt_registry.register(SCRIPT_TEMPLATE)
+
+if os.environ.get('PROMPT_CONFIG'):
+    prompt_registry.configure(json.loads(os.environ['PROMPT_CONFIG']))
@@ -0,0 +1,222 @@
+"""Retenção do histórico de gerações e arquivamento em background
+
+Registros mais antigos que a retenção do plano (anônimo, free, premium) saem
+de generation_history, mantendo a tabela "quente" pequena para as consultas
+de limite de uso e estatísticas. O destino é:
+- a tabela generation_history_archive (data comprimido; no Postgres,
+  particionada por mês, com partições criadas sob demanda), ou
+- arquivos NDJSON gzip por mês em HISTORY_ARCHIVE_DIR, se configurado.
+
+Cada lote é movido em uma transação. No Postgres as linhas são travadas com
+SKIP LOCKED, então vários workers podem rodar o arquivador ao mesmo tempo.
+"""
+import fcntl
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select, text
+
+TIERS = ('anonymous', 'free', 'premium')
+
+
+def retention_policy(config):
+    """Dias de retenção por plano (0 = sem limite)"""
+    return {tier: config.get(f'HISTORY_RETENTION_DAYS_{tier.upper()}', 0) for tier in TIERS}
+
+
+def _tier_filter(tier, history, users):
+    if tier == 'anonymous':
+        return history.user_id.is_(None)
+    premium_ids = select(users.id).where(users.is_premium.is_(True))
+    if tier == 'premium':
+        return history.user_id.in_(premium_ids)
+    return (history.user_id.isnot(None)) & history.user_id.notin_(premium_ids)
+
+
+def _month_bounds(moment):
+    start = datetime(moment.year, moment.month, 1)
+    end = datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start, end
+
+
+def ensure_archive_partitions(connection, rows, known):
+    """Cria (uma vez por processo) as partições mensais que o lote vai usar"""
+    if connection.dialect.name != 'postgresql':
+        return
+    for row in rows:
+        start, end = _month_bounds(row.created_at)
+        name = f"generation_history_archive_{start:%Y_%m}"
+        if name in known:
+            continue
+        connection.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF generation_history_archive "
+            f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+        ))
+        known.add(name)
+
+
+def _write_files(directory, rows):
+    """Acrescenta o lote aos arquivos do mês (membros gzip concatenados)"""
+    by_month = {}
+    for row in rows:
+        by_month.setdefault(f"{row.created_at:%Y-%m}", []).append(row)
+    for month, month_rows in by_month.items():
+        lines = ''.join(
+            json.dumps({
+                'id': row.id,
+                'type': row.type,
+                'created_at': row.created_at.isoformat(),
+                'user_id': row.user_id,
+                'user_session': row.user_session,
+                'data': json.loads(row.data)
+            }, ensure_ascii=False) + '\n'
+            for row in month_rows
+        )
+        with open(os.path.join(directory, f"history-{month}.ndjson.gz"), 'ab') as f:
+            # Workers concorrentes não podem intercalar membros gzip no mesmo arquivo
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.write(gzip.compress(lines.encode('utf-8')))
+                f.flush()
+                os.fsync(f.fileno())
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class HistoryArchiver:
+    def __init__(self, policy, batch_size=1000, archive_dir=None):
+        self.policy = policy
+        self.batch_size = batch_size
+        self.archive_dir = archive_dir
+        self._partitions = set()
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.archived = {tier: 0 for tier in TIERS}
+        self.last_run = None
+        self.last_error = None
+
+    def archive_batch(self, session, tier, cutoff):
+        """Move até batch_size registros do plano anteriores a cutoff; retorna quantos"""
+        from app.models import GenerationHistory, GenerationHistoryArchive, User
+        from app.services.history_search import remove_entries
+
+        history = GenerationHistory.__table__.c
+        query = select(
+            history.id, history.type, history.data, history.created_at, history.user_id, history.user_session
+        ).where(
+            history.created_at < cutoff, _tier_filter(tier, history, User.__table__.c)
+        ).order_by(history.id).limit(self.batch_size).with_for_update(skip_locked=True)
+
+        rows = session.execute(query).all()
+        if not rows:
+            session.rollback()
+            return 0
+
+        connection = session.connection()
+        if self.archive_dir:
+            # Arquivo antes do DELETE: uma falha no commit pode duplicar linhas no arquivo, nunca perdê-las
+            _write_files(self.archive_dir, rows)
+        else:
+            ensure_archive_partitions(connection, rows, self._partitions)
+            session.execute(insert(GenerationHistoryArchive.__table__), [{
+                'id': row.id,
+                'type': row.type,
+                'data': zlib.compress(row.data.encode('utf-8')),
+                'created_at': row.created_at,
+                'user_id': row.user_id,
+                'user_session': row.user_session,
+                'archived_at': datetime.utcnow()
+            } for row in rows])
+
+        ids = [row.id for row in rows]
+        remove_entries(connection, ids)
+        session.execute(delete(GenerationHistory.__table__).where(history.id.in_(ids)))
+        session.commit()
+        return len(rows)
+
+    def run_once(self, session, deadline=None):
+        """Aplica a política de todos os planos; retorna {plano: registros movidos}"""
+        with self._lock:
+            moved = {tier: 0 for tier in TIERS}
+            now = datetime.utcnow()
+            try:
+                for tier, days in self.policy.items():
+                    if not days:
+                        continue
+                    cutoff = now - timedelta(days=days)
+                    while deadline is None or time.monotonic() < deadline:
+                        count = self.archive_batch(session, tier, cutoff)
+                        moved[tier] += count
+                        if count < self.batch_size:
+                            break
+                self.last_error = None
+            except Exception as e:
+                session.rollback()
+                self.last_error = str(e)
+                raise
+            finally:
+                self.runs += 1
+                self.last_run = now
+                for tier, count in moved.items():
+                    self.archived[tier] += count
+            return moved
+
+    def stats(self):
+        return {
+            'policy_days': self.policy,
+            'destination': self.archive_dir or 'generation_history_archive',
+            'runs': self.runs,
+            'archived': dict(self.archived),
+            'last_run': self.last_run.isoformat() if self.last_run else None,
+            'last_error': self.last_error
+        }
+
+
+def init_history_archiver(app, start=True):
+    """Cria o arquivador com a política do app e, se habilitado, inicia a thread (start=False só cria)"""
+    archiver = app.extensions.get('history_archiver')
+    if archiver is None:
+        archiver = HistoryArchiver(
+            retention_policy(app.config),
+            batch_size=app.config['HISTORY_ARCHIVE_BATCH_SIZE'],
+            archive_dir=app.config.get('HISTORY_ARCHIVE_DIR')
+        )
+        if archiver.archive_dir:
+            os.makedirs(archiver.archive_dir, exist_ok=True)
+        app.extensions['history_archiver'] = archiver
+
+    # Após o fork do gunicorn (preload) o post_fork zera a flag: threads não sobrevivem ao fork
+    if start and app.config.get('HISTORY_ARCHIVE_ENABLED') and not getattr(app, 'history_archiver_started', False):
+        interval = app.config['HISTORY_ARCHIVE_INTERVAL']
+        start_archiver(app, archiver, interval)
+        app.history_archiver_started = True
+        print(f"✅ Arquivamento do histórico ativo (a cada {interval}s, retenção: {archiver.policy})")
+    return archiver
+
+
+def start_archiver(app, archiver, interval):
+    """Roda o arquivador periodicamente em uma thread daemon"""
+    from app.models import db
+
+    def _loop():
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                try:
+                    moved = archiver.run_once(db.session, deadline=time.monotonic() + interval / 2)
+                    if any(moved.values()):
+                        print(f"📦 Histórico arquivado: {moved}")
+                except Exception as e:
+                    logging.warning(f"Falha no arquivamento do histórico: {e}")
+                finally:
+                    db.session.remove()
+
+    thread = threading.Thread(target=_loop, name='history-archiver', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,235 @@
+"""Cache semântico opcional: reaproveita gerações para prompts quase iguais
+
+"receitas rápidas" e "receitas fáceis e rápidas" caem em chaves exatas
+diferentes, mas pedem o mesmo conteúdo. Cada campo do prompt (nicho, público,
+ideia) vira um vetor de n-gramas de caracteres via hashing (sem modelo, só
+CPU) e a busca é um produto escalar contra uma matriz NumPy. A similaridade de
+um candidato é a menor entre seus campos, então nicho E público precisam
+bater.
+
+Parâmetros que precisam bater exatamente (ex.: a quantidade de ideias) vão
+no qualifier da entrada, não no namespace nem no texto. Preposições e artigos
+não entram no vetor ("dicas de viagem" = "dicas para viagem").
+
+Entradas expiram após ttl segundos, como no cache exato. A capacidade é
+global: os índices crescem sob demanda e, com o total cheio, cada nova entrada
+sobrescreve a mais antiga do próprio índice.
+"""
+import itertools
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from collections import deque
+
+try:
+    import numpy as np
+except ImportError:  # numpy é opcional: sem ele o cache semântico fica desligado
+    np = None
+
+
+# Palavras que não mudam o assunto do prompt
+STOPWORDS = frozenset('a o as os de da do das dos e em no na nos nas para pra por com um uma sobre'.split())
+
+
+def normalize_text(text):
+    text = unicodedata.normalize('NFKD', str(text).lower())
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return re.sub(r'\s+', ' ', re.sub(r'[^\w\s]', ' ', text)).strip()
+
+
+class HashingEmbedder:
+    """Vetores de n-gramas de caracteres (hashing trick), normalizados em L2"""
+
+    def __init__(self, dim=4096, ngram_range=(3, 5)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    def embed(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in normalize_text(text).split():
+            if word in STOPWORDS:
+                continue
+            padded = f" {word} "
+            for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+                for i in range(max(1, len(padded) - n + 1)):
+                    h = zlib.crc32(padded[i:i + n].encode('utf-8'))
+                    # Bit alto define o sinal: colisões tendem a se cancelar
+                    vector[h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        # TF sublinear: palavras repetidas não dominam o vetor
+        np.copysign(np.log1p(np.abs(vector)), vector, out=vector)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+def _qualifier_hash(qualifier):
+    return zlib.crc32(repr(qualifier).encode('utf-8'))
+
+
+class SemanticIndex:
+    """Índice de vizinho mais próximo (força bruta vetorizada) que cresce sob demanda"""
+
+    INITIAL_ROWS = 64
+
+    def __init__(self, fields, dim):
+        rows = self.INITIAL_ROWS
+        self.matrices = [np.zeros((rows, dim), dtype=np.float32) for _ in range(fields)]
+        self.texts = [None] * rows
+        self.values = [None] * rows
+        self.qualifiers = np.zeros(rows, dtype=np.uint32)
+        self.expires_at = np.full(rows, -np.inf)
+        self.size = 0
+        self.next_slot = 0
+
+    def _grow(self, rows):
+        extra = rows - len(self.texts)
+        self.matrices = [np.vstack([matrix, np.zeros((extra, matrix.shape[1]), dtype=np.float32)])
+                         for matrix in self.matrices]
+        self.texts += [None] * extra
+        self.values += [None] * extra
+        self.qualifiers = np.concatenate([self.qualifiers, np.zeros(extra, dtype=np.uint32)])
+        self.expires_at = np.concatenate([self.expires_at, np.full(extra, -np.inf)])
+
+    def add(self, vectors, texts, value, expires_at, qualifier, limit):
+        """Acrescenta a entrada; com size >= limit sobrescreve a mais antiga (buffer circular)"""
+        if self.size < limit:
+            if self.size == len(self.texts):
+                self._grow(min(limit, 2 * self.size))
+            slot = self.size
+            self.size += 1
+        else:
+            slot = self.next_slot % self.size
+            self.next_slot = slot + 1
+        for matrix, vector in zip(self.matrices, vectors):
+            matrix[slot] = vector
+        self.texts[slot] = texts
+        self.values[slot] = value
+        self.qualifiers[slot] = _qualifier_hash(qualifier)
+        self.expires_at[slot] = expires_at
+
+    def search(self, vectors, now, qualifier=None):
+        if self.size == 0:
+            return None, 0.0
+        scores = None
+        for matrix, vector in zip(self.matrices, vectors):
+            field_scores = matrix[:self.size] @ vector
+            scores = field_scores if scores is None else np.minimum(scores, field_scores)
+        # Entradas expiradas ou de outro qualifier nunca vencem
+        eligible = (self.expires_at[:self.size] > now) & (self.qualifiers[:self.size] == _qualifier_hash(qualifier))
+        scores = np.where(eligible, scores, -np.inf)
+        best = int(np.argmax(scores))
+        return best, float(scores[best])
+
+    def live(self, now):
+        return int(np.count_nonzero(self.expires_at[:self.size] > now))
+
+
+class SemanticCache:
+    def __init__(self, threshold=0.9, capacity=2000, ttl=3600, audit_size=200, dim=4096):
+        self.threshold = threshold
+        self.capacity = capacity
+        self.ttl = ttl
+        self.embedder = HashingEmbedder(dim)
+        self._indexes = {}
+        self._lock = threading.Lock()
+        self._audits = deque(maxlen=audit_size)
+        self._audit_ids = itertools.count(1)
+        self.lookups = 0
+        self.hits = 0
+        self.false_hits = 0
+        self.audited = 0
+
+    def _index(self, namespace, fields):
+        index = self._indexes.get(namespace)
+        if index is None:
+            index = self._indexes[namespace] = SemanticIndex(fields, self.embedder.dim)
+        return index
+
+    def _size(self):
+        return sum(index.size for index in self._indexes.values())
+
+    def lookup(self, namespace, texts, qualifier=None):
+        """Valor de um prompt similar o bastante (com o mesmo qualifier), ou None"""
+        vectors = [self.embedder.embed(text) for text in texts]
+        with self._lock:
+            self.lookups += 1
+            index = self._indexes.get(namespace)
+            if index is None:
+                return None
+            slot, similarity = index.search(vectors, time.monotonic(), qualifier)
+            if slot is None or similarity < self.threshold:
+                return None
+            self.hits += 1
+            self._audits.append({
+                'id': next(self._audit_ids),
+                'namespace': namespace,
+                'query': list(texts),
+                'matched': list(index.texts[slot]),
+                'similarity': round(similarity, 4),
+                'at': time.time(),
+                'verdict': None
+            })
+            return index.values[slot]
+
+    def add(self, namespace, texts, value, qualifier=None):
+        vectors = [self.embedder.embed(text) for text in texts]
+        with self._lock:
+            index = self._indexes.get(namespace)
+            if self._size() >= self.capacity and (index is None or index.size == 0):
+                # Capacidade global cheia e namespace novo (ex.: nova versão do template): sai o mais antigo
+                oldest = next((name for name in self._indexes if name != namespace), None)
+                if oldest is not None:
+                    del self._indexes[oldest]
+            index = self._index(namespace, len(texts))
+            # Com o total cheio o índice não cresce: sobrescreve a própria entrada mais antiga
+            limit = index.size if self._size() >= self.capacity else self.capacity
+            index.add(vectors, list(texts), value, time.monotonic() + self.ttl, qualifier, max(limit, 1))
+
+    def invalidate_namespace(self, prefix):
+        """Remove os namespaces iguais a prefix ou começando por "prefix:"; retorna as entradas removidas"""
+        with self._lock:
+            namespaces = [
+                namespace for namespace in self._indexes
+                if namespace == prefix or namespace.startswith(f"{prefix}:")
+            ]
+            return sum(self._indexes.pop(namespace).size for namespace in namespaces)
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+    def review(self, audit_id, false_hit):
+        """Registra a revisão manual de um hit (auditoria de falsos positivos)"""
+        with self._lock:
+            for audit in self._audits:
+                if audit['id'] == audit_id:
+                    if audit['verdict'] is None:
+                        self.audited += 1
+                    elif audit['verdict'] == 'false_hit':
+                        self.false_hits -= 1
+                    audit['verdict'] = 'false_hit' if false_hit else 'ok'
+                    if false_hit:
+                        self.false_hits += 1
+                    return audit
+        return None
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                'threshold': self.threshold,
+                'capacity': self.capacity,
+                'entries': sum(index.live(now) for index in self._indexes.values()),
+                'ttl': self.ttl,
+                'lookups': self.lookups,
+                'hits': self.hits,
+                'hit_rate': round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+                'audited': self.audited,
+                'false_hits': self.false_hits,
+                'false_hit_rate': round(self.false_hits / self.audited, 4) if self.audited else 0.0
+            }
+
+    def audits(self, limit=50):
+        with self._lock:
+            return list(self._audits)[-limit:][::-1]
@@ -0,0 +1,155 @@
+"""Pré-geração especulativa de roteiros para as ideias recém-retornadas
+
+Depois de /api/generate-ideas, o usuário costuma pedir o roteiro de uma das
+ideias. As N primeiras ideias (N por plano) entram em uma fila limitada e
+poucas threads geram os roteiros em background direto no cache de roteiros;
+o clique seguinte vira um hit (ou entra no mesmo cálculo, via single-flight).
+
+Controles de custo:
+- fila limitada: especulação excedente é descartada, nunca acumulada
+- teto global de QPS por token bucket (o mesmo store do rate limiting, então
+  com SQLite/Redis o teto vale para todos os workers)
+- chaves já em cache não são geradas de novo
+- orçamento diário de tokens por plano (token_budget), conferido no medidor
+  de tokens antes de cada geração; o uso vai para token_usage com
+  endpoint='speculative' e o plano de quem disparou. O total é por worker:
+  com N workers o teto efetivo é N vezes o orçamento
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+
+class SpeculativePregenerator:
+    def __init__(self, generate, is_cached, store, top_n, qps=1.0, burst=5,
+                 workers=1, queue_size=100, track_size=5000, token_budget=None, tokens_used=None):
+        self.generate = generate
+        self.is_cached = is_cached
+        self.store = store
+        self.top_n = top_n
+        # {plano: tokens por dia} (0 ou ausente = sem limite); tokens_used(plano) -> gastos hoje
+        self.token_budget = token_budget or {}
+        self.tokens_used = tokens_used
+        self.qps = qps
+        self.burst = burst
+        self.workers = workers
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._pending = set()
+        # Chaves pré-geradas ainda não pedidas pelo usuário (para medir hit rate)
+        self._generated = OrderedDict()
+        self._track_size = track_size
+        self._lock = threading.Lock()
+        self._pid = None
+        self.counters = {
+            'queued': 0, 'dropped_full': 0, 'skipped_cached': 0, 'throttled': 0,
+            'over_budget': 0, 'generated': 0, 'failed': 0, 'hits': 0
+        }
+        self.generation_ms = 0.0
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def _ensure_workers(self):
+        # Threads não sobrevivem ao fork do gunicorn: cada processo sobe as suas no primeiro uso
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            for i in range(self.workers):
+                threading.Thread(target=self._worker, name=f'speculative-{i}', daemon=True).start()
+
+    def submit(self, tier, keys):
+        """Enfileira as primeiras top_n[tier] chaves; retorna quantas entraram"""
+        keys = list(keys)[:self.top_n.get(tier, 0)]
+        if not keys:
+            return 0
+        self._ensure_workers()
+        queued = 0
+        for key in keys:
+            with self._lock:
+                if key in self._pending:
+                    continue
+                self._pending.add(key)
+            try:
+                self._queue.put_nowait((tier, key))
+                queued += 1
+            except queue.Full:
+                with self._lock:
+                    self._pending.discard(key)
+                self._count('dropped_full')
+        self._count('queued', queued)
+        return queued
+
+    def _worker(self):
+        while True:
+            tier, key = self._queue.get()
+            try:
+                self._speculate(tier, key)
+            except Exception as e:
+                self._count('failed')
+                logging.warning(f"Falha na pré-geração do roteiro: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+
+    def over_budget(self, tier):
+        budget = self.token_budget.get(tier, 0)
+        return bool(budget) and self.tokens_used is not None and self.tokens_used(tier) >= budget
+
+    def _speculate(self, tier, key):
+        if self.is_cached(key):
+            self._count('skipped_cached')
+            return
+        if self.over_budget(tier):
+            self._count('over_budget')
+            return
+        allowed, _, _ = self.store.consume('speculative:scripts', self.burst, self.qps)
+        if not allowed:
+            # Especulação atrasada perde valor: descarta em vez de esperar
+            self._count('throttled')
+            return
+        start = time.perf_counter()
+        result = self.generate(key, tier)
+        elapsed = (time.perf_counter() - start) * 1000
+        if getattr(result, 'fallback', False):
+            self._count('failed')
+            return
+        with self._lock:
+            self.counters['generated'] += 1
+            self.generation_ms += elapsed
+            self._generated[key] = time.time()
+            while len(self._generated) > self._track_size:
+                self._generated.popitem(last=False)
+
+    def record_request(self, key):
+        """Chamado quando o usuário pede um roteiro: conta hit se ele foi pré-gerado"""
+        with self._lock:
+            if self._generated.pop(key, None) is not None:
+                self.counters['hits'] += 1
+                return True
+        return False
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+            generated = counters['generated']
+            return {
+                **counters,
+                'queue_size': self._queue.qsize(),
+                'hit_rate': round(counters['hits'] / generated, 4) if generated else 0.0,
+                'wasted_generations': generated - counters['hits'] - len(self._generated),
+                'awaiting_click': len(self._generated),
+                'avg_generation_ms': round(self.generation_ms / generated, 1) if generated else 0.0,
+                # Latência que os cliques deixaram de esperar (estimada pela média das gerações)
+                'estimated_saved_ms': round(self.generation_ms / generated * counters['hits']) if generated else 0,
+                'top_n': self.top_n,
+                'qps': self.qps,
+                'token_budget': self.token_budget,
+                'tokens_used': {tier: self.tokens_used(tier) for tier in self.token_budget} if self.tokens_used else None
+            }
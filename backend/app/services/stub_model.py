@@ -0,0 +1,71 @@
+"""Modelo local que imita o GenerativeModel do Gemini (benchmarks e testes)
+
+Ativado com AI_PROVIDER=stub. Não faz chamadas de rede: espera a latência
+configurada (time.sleep, cooperativo sob gevent) e devolve uma resposta
+sintética com o mesmo formato que o SDK (atributo ``text``). Cada nome de
+modelo em AI_MODELS pode ter seu perfil (latência, falhas, respostas
+malformadas) em AI_STUB_PROFILES, para exercitar o roteador de modelos.
+"""
+import json
+import os
+import random
+import re
+import time
+
+
+class StubCandidate:
+    def __init__(self, finish_reason):
+        self.finish_reason = finish_reason
+
+
+class StubResponse:
+    def __init__(self, text, finish_reason='STOP'):
+        self.text = text
+        self.candidates = [StubCandidate(finish_reason)]
+
+
+class StubModel:
+    def __init__(self, model_name='stub', latency_ms=None, jitter_ms=None, tail_rate=None, tail_ms=None,
+                 fail_rate=None, malformed_rate=None):
+        self.model_name = model_name
+        self.latency_ms = float(os.environ.get('AI_STUB_LATENCY_MS', 0) if latency_ms is None else latency_ms)
+        self.jitter_ms = float(os.environ.get('AI_STUB_JITTER_MS', 0) if jitter_ms is None else jitter_ms)
+        # Cauda longa: uma fração das chamadas leva tail_ms a mais (simula o p99 do Gemini)
+        self.tail_rate = float(os.environ.get('AI_STUB_TAIL_RATE', 0) if tail_rate is None else tail_rate)
+        self.tail_ms = float(os.environ.get('AI_STUB_TAIL_MS', 0) if tail_ms is None else tail_ms)
+        # Erros de chamada e respostas fora do formato (testes de roteamento/failover)
+        self.fail_rate = float(os.environ.get('AI_STUB_FAIL_RATE', 0) if fail_rate is None else fail_rate)
+        self.malformed_rate = float(os.environ.get('AI_STUB_MALFORMED_RATE', 0) if malformed_rate is None else malformed_rate)
+
+    def _sleep(self):
+        delay = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if self.tail_rate and random.random() < self.tail_rate:
+            delay += self.tail_ms
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+    def generate_content(self, prompt, **kwargs):
+        self._sleep()
+        if self.fail_rate and random.random() < self.fail_rate:
+            raise RuntimeError(f"Falha simulada do modelo {self.model_name}")
+        if self.malformed_rate and random.random() < self.malformed_rate:
+            return StubResponse("Claro! Aqui estão as ideias: [{\"title\": \"Ideia cortada")
+        match = re.search(r'Gere (\d+) ideias', prompt)
+        if match:
+            ideas = [
+                {
+                    "title": f"Ideia simulada {i + 1}",
+                    "description": "Resposta gerada pelo modelo local de testes",
+                    "hashtags": "#stub #teste #contentai #viral"
+                }
+                for i in range(int(match.group(1)))
+            ]
+            return self._limit(json.dumps(ideas, ensure_ascii=False), kwargs)
+        return self._limit(f"📝 ROTEIRO SIMULADO\n\n{prompt.strip()[:200]}", kwargs)
+
+    def _limit(self, text, kwargs):
+        """Corta no max_output_tokens (~4 caracteres por token), como o Gemini"""
+        limit = (kwargs.get('generation_config') or {}).get('max_output_tokens')
+        if limit and len(text) > limit * 4:
+            return StubResponse(text[:limit * 4], finish_reason='MAX_TOKENS')
+        return StubResponse(text)
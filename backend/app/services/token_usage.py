@@ -0,0 +1,184 @@
+"""Medição de tokens por requisição, usuário, plano, endpoint e template
+
+O AIService informa os tokens de cada chamada (usage_metadata do provedor
+ou estimativa local), inclusive as respostas de hedge descartadas, e o medidor soma em memória por (dia, usuário, plano,
+endpoint, template, modelo). A atribuição vem do contexto da requisição
+(``attribute``). Uma thread por worker grava os agregados em token_usage a
+cada TOKEN_USAGE_FLUSH_INTERVAL com um upsert que soma os contadores:
+nenhuma linha por chamada no caminho quente. Em caso de queda do processo,
+perde-se no máximo um intervalo.
+
+Com o google-generativeai fixado no requirements (0.3.2) as respostas não
+trazem usage_metadata: toda a contagem (token_usage, orçamentos diários por
+usuário e da especulação) usa a estimativa local de ~4 caracteres por token
+(prompts.estimate_tokens), não a cobrança real do provedor.
+"""
+import atexit
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import text
+
+# user_id 0 = anônimo (a chave primária não aceita NULL)
+ANONYMOUS_USER_ID = 0
+
+_context = contextvars.ContextVar('token_usage_context', default=None)
+
+# ON CONFLICT ... DO UPDATE: mesmo SQL no Postgres e no SQLite (3.24+)
+UPSERT_SQL = text(
+    "INSERT INTO token_usage (day, user_id, tier, endpoint, template, model,"
+    " calls, input_tokens, output_tokens, updated_at) "
+    "VALUES (:day, :user_id, :tier, :endpoint, :template, :model,"
+    " :calls, :input_tokens, :output_tokens, :updated_at) "
+    "ON CONFLICT (day, user_id, tier, endpoint, template, model) DO UPDATE SET "
+    " calls = token_usage.calls + excluded.calls,"
+    " input_tokens = token_usage.input_tokens + excluded.input_tokens,"
+    " output_tokens = token_usage.output_tokens + excluded.output_tokens,"
+    " updated_at = excluded.updated_at"
+)
+
+
+class TokenMeter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        # Total do dia por (plano, endpoint) neste worker, não zerado pelo flush (orçamentos internos)
+        self._totals = {}
+        self.flushed_at = None
+        self.last_error = None
+
+    @contextmanager
+    def attribute(self, user_id=None, tier='anonymous', endpoint=None):
+        """Atribui os tokens das chamadas feitas dentro do bloco"""
+        token = _context.set((int(user_id) if user_id else ANONYMOUS_USER_ID, tier, endpoint or 'unknown'))
+        try:
+            yield
+        finally:
+            _context.reset(token)
+
+    def record(self, template, model, input_tokens, output_tokens):
+        # Fora de uma requisição (threads de background) sem atribuição explícita
+        user_id, tier, endpoint = _context.get() or (ANONYMOUS_USER_ID, 'background', 'background')
+        key = (datetime.utcnow().date(), user_id, tier, endpoint, template, model)
+        with self._lock:
+            counters = self._pending.get(key)
+            if counters is None:
+                counters = self._pending[key] = [0, 0, 0]
+            counters[0] += 1
+            counters[1] += input_tokens
+            counters[2] += output_tokens
+            total_key = (key[0], tier, endpoint)
+            if total_key not in self._totals:
+                # Virada do dia: descarta os totais dos dias anteriores
+                self._totals = {k: v for k, v in self._totals.items() if k[0] == key[0]}
+            self._totals[total_key] = self._totals.get(total_key, 0) + input_tokens + output_tokens
+
+    def tokens_today(self, tier, endpoint):
+        """Tokens do plano/endpoint hoje registrados por este worker"""
+        with self._lock:
+            return self._totals.get((datetime.utcnow().date(), tier, endpoint), 0)
+
+    def pending_tokens(self, user_id, day):
+        """Tokens do usuário ainda não gravados por este worker"""
+        with self._lock:
+            return sum(
+                counters[1] + counters[2]
+                for key, counters in self._pending.items()
+                if key[0] == day and key[1] == user_id
+            )
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self, connection):
+        """Grava os agregados pendentes; em caso de erro eles voltam para a fila"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        now = datetime.utcnow()
+        rows = [
+            {
+                'day': day, 'user_id': user_id, 'tier': tier, 'endpoint': endpoint,
+                'template': template, 'model': model, 'calls': calls,
+                'input_tokens': input_tokens, 'output_tokens': output_tokens, 'updated_at': now
+            }
+            for (day, user_id, tier, endpoint, template, model), (calls, input_tokens, output_tokens) in pending.items()
+        ]
+        try:
+            connection.execute(UPSERT_SQL, rows)
+        except Exception:
+            self._restore(pending)
+            raise
+        self.flushed_at = now
+        return len(rows)
+
+    def _restore(self, pending):
+        with self._lock:
+            for key, (calls, input_tokens, output_tokens) in pending.items():
+                counters = self._pending.setdefault(key, [0, 0, 0])
+                counters[0] += calls
+                counters[1] += input_tokens
+                counters[2] += output_tokens
+
+
+token_meter = TokenMeter()
+
+
+def tokens_used_today(session, user_id):
+    """Tokens de entrada + saída do usuário hoje (gravados + pendentes neste worker)"""
+    day = datetime.utcnow().date()
+    stored = session.execute(
+        text("SELECT COALESCE(SUM(input_tokens + output_tokens), 0) FROM token_usage "
+             "WHERE user_id = :user_id AND day = :day"),
+        {'user_id': int(user_id), 'day': day}
+    ).scalar()
+    return int(stored) + token_meter.pending_tokens(int(user_id), day)
+
+
+def daily_token_budget(config, user):
+    """Orçamento diário do usuário: valor próprio ou o do plano (0 = sem limite)"""
+    if user.token_budget_daily is not None:
+        return user.token_budget_daily
+    tier = 'premium' if user.is_premium else 'free'
+    return config[f'TOKEN_BUDGET_DAILY_{tier.upper()}']
+
+
+def init_token_meter(app):
+    """Inicia a thread que grava os agregados periodicamente"""
+    # Após o fork do gunicorn (preload) o post_fork zera a flag: threads não sobrevivem ao fork
+    if getattr(app, 'token_meter_started', False):
+        return token_meter
+    interval = app.config['TOKEN_USAGE_FLUSH_INTERVAL']
+    threading.Thread(target=_flush_loop, args=(app, interval), daemon=True).start()
+    if not getattr(app, 'token_meter_exit_hook', False):
+        atexit.register(flush_token_usage, app)
+        app.token_meter_exit_hook = True
+    app.token_meter_started = True
+    print(f"✅ Medição de tokens ativa (gravação a cada {interval}s)")
+    return token_meter
+
+
+def flush_token_usage(app):
+    from app.models import db
+    with app.app_context():
+        try:
+            with db.engine.begin() as connection:
+                flushed = token_meter.flush(connection)
+            token_meter.last_error = None
+            return flushed
+        except Exception as e:
+            token_meter.last_error = str(e)
+            logging.warning(f"Falha ao gravar uso de tokens: {e}")
+            return 0
+
+
+def _flush_loop(app, interval):
+    while True:
+        time.sleep(interval)
+        flush_token_usage(app)
@@ -0,0 +1,59 @@
+"""Agregado de gerações por usuário (user_generation_stats)
+
+Atualizado na mesma transação de cada GenerationHistory inserido (evento
+after_insert), para que listagens administrativas mostrem os contadores com
+um JOIN por chave primária em vez de COUNT por usuário. Os contadores são
+acumulados: o arquivamento do histórico não os reduz.
+"""
+from sqlalchemy import event, text
+
+_listener_installed = False
+
+# ON CONFLICT ... DO UPDATE: mesmo SQL no Postgres e no SQLite (3.24+)
+UPSERT_SQL = text(
+    "INSERT INTO user_generation_stats (user_id, ideas_count, scripts_count, last_generation_at) "
+    "VALUES (:user_id, :ideas, :scripts, :created_at) "
+    "ON CONFLICT (user_id) DO UPDATE SET "
+    " ideas_count = user_generation_stats.ideas_count + excluded.ideas_count,"
+    " scripts_count = user_generation_stats.scripts_count + excluded.scripts_count,"
+    " last_generation_at = CASE WHEN user_generation_stats.last_generation_at IS NULL"
+    "  OR excluded.last_generation_at > user_generation_stats.last_generation_at"
+    "  THEN excluded.last_generation_at ELSE user_generation_stats.last_generation_at END"
+)
+
+REBUILD_SQL = (
+    "INSERT INTO user_generation_stats (user_id, ideas_count, scripts_count, last_generation_at) "
+    "SELECT user_id,"
+    " SUM(CASE WHEN type = 'ideas' THEN 1 ELSE 0 END),"
+    " SUM(CASE WHEN type = 'script' THEN 1 ELSE 0 END),"
+    " MAX(created_at) "
+    "FROM ({source}) AS history WHERE user_id IS NOT NULL GROUP BY user_id"
+)
+
+
+def _count_on_insert(mapper, connection, target):
+    if target.user_id is None:
+        return
+    connection.execute(UPSERT_SQL, {
+        'user_id': int(target.user_id),
+        'ideas': 1 if target.type == 'ideas' else 0,
+        'scripts': 1 if target.type == 'script' else 0,
+        'created_at': target.created_at
+    })
+
+
+def install_stats_listener(model):
+    global _listener_installed
+    if not _listener_installed:
+        event.listen(model, 'after_insert', _count_on_insert)
+        _listener_installed = True
+
+
+def rebuild_user_stats(connection):
+    """Recalcula o agregado a partir do histórico ativo e do arquivado"""
+    source = (
+        "SELECT user_id, type, created_at FROM generation_history "
+        "UNION ALL SELECT user_id, type, created_at FROM generation_history_archive"
+    )
+    connection.execute(text("DELETE FROM user_generation_stats"))
+    return connection.execute(text(REBUILD_SQL.format(source=source))).rowcount
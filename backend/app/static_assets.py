@@ -0,0 +1,157 @@
+"""Pipeline de arquivos estáticos do frontend
+
+Na inicialização todos os arquivos de frontend/ são lidos para memória,
+recebem um fingerprint (hash do conteúdo) e são pré-comprimidos em gzip
+(e brotli, se disponível). As páginas HTML são reescritas para apontar para
+os nomes com fingerprint, que podem ser cacheados para sempre
+(Cache-Control: immutable). Cada requisição é só uma busca no manifesto.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+MIN_COMPRESS_SIZE = 256
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE = 'no-cache'
+
+# Referências locais em atributos src/href (ignora URLs absolutas e âncoras)
+_ASSET_REFERENCE = re.compile(r'''(?P<attr>\b(?:src|href)=["'])(?P<path>[^"':#?]+)(?P<end>["'])''')
+
+
+class StaticAsset:
+    def __init__(self, name, content, content_type):
+        self.name = name
+        self.content_type = content_type
+        self.digest = hashlib.sha256(content).hexdigest()
+        self.variants = {'identity': content}
+        self.etags = {'identity': f'"{self.digest[:20]}"'}
+
+        if content_type.startswith(COMPRESSIBLE_TYPES) and len(content) >= MIN_COMPRESS_SIZE:
+            compressed = gzip.compress(content, compresslevel=9, mtime=0)
+            if len(compressed) < len(content):
+                self.variants['gzip'] = compressed
+                self.etags['gzip'] = f'"{self.digest[:20]}-gz"'
+            if brotli is not None:
+                compressed = brotli.compress(content, quality=11)
+                if len(compressed) < len(content):
+                    self.variants['br'] = compressed
+                    self.etags['br'] = f'"{self.digest[:20]}-br"'
+
+    @property
+    def fingerprinted_name(self):
+        base, ext = os.path.splitext(self.name)
+        return f"{base}.{self.digest[:10]}{ext}"
+
+    def choose_encoding(self, accept_encoding):
+        accepted = {part.split(';')[0].strip() for part in accept_encoding.lower().split(',')}
+        for encoding in ('br', 'gzip'):
+            if encoding in self.variants and encoding in accepted:
+                return encoding
+        return 'identity'
+
+
+class AssetManifest:
+    def __init__(self, folder, index='index.html'):
+        self.folder = folder
+        self.index = index
+        self.assets = {}
+        self.fingerprinted = {}
+        self.build()
+
+    def build(self):
+        raw = {}
+        for root, _, files in os.walk(self.folder):
+            for filename in files:
+                full_path = os.path.join(root, filename)
+                name = os.path.relpath(full_path, self.folder).replace(os.sep, '/')
+                with open(full_path, 'rb') as f:
+                    raw[name] = f.read()
+
+        # Primeiro os arquivos referenciados (CSS/JS), depois o HTML reescrito
+        assets = {}
+        for name, content in raw.items():
+            if not name.endswith('.html'):
+                assets[name] = StaticAsset(name, content, self._content_type(name))
+        for name, content in raw.items():
+            if name.endswith('.html'):
+                content = self._rewrite_references(content.decode('utf-8'), name, assets).encode('utf-8')
+                assets[name] = StaticAsset(name, content, self._content_type(name))
+
+        self.assets = assets
+        self.fingerprinted = {
+            asset.fingerprinted_name: asset for asset in assets.values() if not asset.name.endswith('.html')
+        }
+
+    @staticmethod
+    def _content_type(name):
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type == 'application/javascript':
+            content_type += '; charset=utf-8'
+        return content_type
+
+    @staticmethod
+    def _rewrite_references(html, html_name, assets):
+        base_dir = os.path.dirname(html_name)
+
+        def replace(match):
+            path = match.group('path')
+            target = os.path.normpath(os.path.join(base_dir, path.lstrip('/'))).replace(os.sep, '/')
+            asset = assets.get(target)
+            if asset is None:
+                return match.group(0)
+            fingerprinted = path[:len(path) - len(os.path.basename(path))] + os.path.basename(asset.fingerprinted_name)
+            return f"{match.group('attr')}{fingerprinted}{match.group('end')}"
+
+        return _ASSET_REFERENCE.sub(replace, html)
+
+    def lookup(self, path):
+        """Retorna (asset, imutável) ou (None, False)"""
+        path = path.lstrip('/')
+        if path in self.fingerprinted:
+            return self.fingerprinted[path], True
+        if path in self.assets:
+            return self.assets[path], False
+        return None, False
+
+    def serve(self, path):
+        """Serve o asset do caminho ou, como fallback de SPA, o index.html"""
+        asset, immutable = self.lookup(path)
+        if asset is None:
+            asset, immutable = self.assets[self.index], False
+        return serve_asset(asset, immutable)
+
+
+def _etag_matches(if_none_match, etags):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    candidates = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+    return bool(candidates & set(etags.values()))
+
+
+def serve_asset(asset, immutable):
+    encoding = asset.choose_encoding(request.headers.get('Accept-Encoding', ''))
+    headers = {
+        'ETag': asset.etags[encoding],
+        'Cache-Control': IMMUTABLE_CACHE if immutable else REVALIDATE_CACHE,
+        'Vary': 'Accept-Encoding'
+    }
+
+    if _etag_matches(request.headers.get('If-None-Match'), asset.etags):
+        return Response(status=304, headers=headers)
+
+    if encoding != 'identity':
+        headers['Content-Encoding'] = encoding
+    response = Response(asset.variants[encoding], content_type=asset.content_type, headers=headers)
+    return response
@@ -0,0 +1,106 @@
+import os
+import sys
+import json
+import time
+import socket
+import tempfile
+import statistics
+import subprocess
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def post(url, payload, token=None, timeout=120):
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    req = urllib.request.Request(url, data=json.dumps(payload).encode(), headers=headers, method="POST")
+    with urllib.request.urlopen(req, timeout=timeout) as response:
+        return response.status, json.loads(response.read())
+
+def wait_until_up(base_url, deadline=60):
+    end = time.time() + deadline
+    while time.time() < end:
+        try:
+            urllib.request.urlopen(f"{base_url}/api/health", timeout=2).read()
+            return
+        except OSError:
+            time.sleep(0.3)
+    raise RuntimeError("Servidor não respondeu a tempo")
+
+def run_mode(label, worker_class, concurrency, requests_total, latency_ms, database_url):
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        WEB_CONCURRENCY="2",
+        GUNICORN_THREADS="4",
+        GUNICORN_WORKER_CLASS=worker_class,
+        DATABASE_URL=database_url,
+        FAST_STARTUP="1",
+        RATE_LIMIT_ENABLED="0",
+        AI_PROVIDER="stub",
+        AI_STUB_LATENCY_MS=str(latency_ms)
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "serve_frontend:app"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_until_up(base_url)
+        
+        # Usuário premium: sem limite diário durante o teste
+        email = f"bench-{worker_class}-{port}@exemplo.com"
+        post(f"{base_url}/api/auth/register", {"email": email, "password": "benchmark"})
+        _, data = post(f"{base_url}/api/auth/login", {"email": email, "password": "benchmark"})
+        token = data["access_token"]
+        post(f"{base_url}/api/auth/upgrade", {}, token)
+        
+        def one(i):
+            start = time.perf_counter()
+            # Ideia única por requisição: sem cache, toda chamada vai ao "upstream"
+            status, _ = post(f"{base_url}/api/generate-script", {"idea": f"{label} ideia {i}"}, token)
+            return status, time.perf_counter() - start
+        
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(one, range(requests_total)))
+        elapsed = time.perf_counter() - start
+        
+        latencies = sorted(r[1] * 1000 for r in results)
+        ok = sum(1 for r in results if r[0] == 200)
+        print(f"\n⚙️  {label}")
+        print(f"   Sucesso: {ok}/{requests_total} em {elapsed:.2f}s ({requests_total / elapsed:.1f} req/s)")
+        print(f"   Latência p50: {statistics.median(latencies):8.1f} ms | p99: {latencies[int(len(latencies) * 0.99) - 1]:8.1f} ms")
+        return elapsed
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+def run_benchmark(concurrency=200, requests_total=400, latency_ms=500):
+    print("🌐 Benchmark de concorrência com upstream lento (modelo stub)")
+    print(f"   {requests_total} requisições, {concurrency} simultâneas, latência do upstream {latency_ms}ms")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = os.environ.get("DATABASE_URL", f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        subprocess.run(
+            [sys.executable, "-m", "flask", "--app", "run", "init-db"],
+            cwd=BACKEND_DIR, env=dict(os.environ, DATABASE_URL=database_url),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True
+        )
+        sync = run_mode("gthread (2 workers x 4 threads)", "gthread", concurrency, requests_total, latency_ms, database_url)
+        async_ = run_mode("gevent (2 workers x 1000 greenlets)", "gevent", concurrency, requests_total, latency_ms, database_url)
+    
+    print("\n" + "=" * 60)
+    print(f"✅ Tempo total: {sync:.2f}s -> {async_:.2f}s ({sync / async_:.1f}x mais rápido)")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,86 @@
+import os
+import sys
+import time
+import tempfile
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.services import fallback_engine
+
+# RPS de pico de produção que o modo degradado precisa sustentar
+TARGET_RPS = int(os.environ.get('BENCH_TARGET_RPS', 500))
+
+NICHES = [("culinária", "jovens"), ("fitness", "mães"), ("tecnologia", "estudantes"),
+          ("finanças pessoais", "empreendedores"), ("jardinagem", "idosos")]
+
+def per_call_us(fn, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        fn(i)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+def run_engine_benchmark(repeat=20000):
+    print("📊 Benchmark do gerador local (fallback)")
+    print("=" * 60)
+
+    results = {
+        "ideias (count=5)": per_call_us(
+            lambda i: fallback_engine.generate_ideas(*NICHES[i % len(NICHES)], 5, seed=i), repeat),
+        "ideias (count=20)": per_call_us(
+            lambda i: fallback_engine.generate_ideas(*NICHES[i % len(NICHES)], 20, seed=i), repeat // 4),
+        "roteiro": per_call_us(
+            lambda i: fallback_engine.generate_script(f"Receita de bolo número {i}"), repeat),
+    }
+    for name, us in results.items():
+        print(f"   {name:<20} {us:8.1f} µs/chamada  ({1e6 / us:,.0f}/s por núcleo)")
+
+    # Determinismo: mesma entrada, mesmo conteúdo
+    same = fallback_engine.generate_ideas("culinária", "jovens", 5) == fallback_engine.generate_ideas("culinária", "jovens", 5)
+    distinct = len({idea['title'] for idea in fallback_engine.generate_ideas("culinária", "jovens", 50)})
+    print(f"   determinístico: {'sim' if same else 'NÃO'} | títulos distintos em 50 ideias: {distinct}")
+    return results
+
+def run_route_benchmark(requests_count=2000):
+    """Ponta a ponta pela rota, com a IA indisponível (inclui JWT e gravação no histórico)"""
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench_fallback.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ['RATE_LIMIT_ENABLED'] = '0'
+    os.environ.pop('GEMINI_API_KEY', None)
+    os.environ['AI_PROVIDER'] = 'gemini'
+
+    from app import create_app
+    from app.models import db, User
+    app = create_app()
+    client = app.test_client()
+    with app.app_context():
+        user = User(email='bench@exemplo.com', is_premium=True)
+        user.set_password('bench')
+        db.session.add(user)
+        db.session.commit()
+    token = client.post('/api/auth/login', json={'email': 'bench@exemplo.com', 'password': 'bench'}).json['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    start = time.perf_counter()
+    for i in range(requests_count):
+        niche, audience = NICHES[i % len(NICHES)]
+        response = client.post('/api/generate-ideas', json={'niche': f"{niche} {i}", 'audience': audience, 'count': 5},
+                               headers=headers)
+        assert response.status_code == 200 and not response.json['ai_generated']
+    elapsed = time.perf_counter() - start
+
+    rps = requests_count / elapsed
+    print(f"\n🌐 Rota /api/generate-ideas em modo degradado: {rps:,.0f} req/s por worker "
+          f"({elapsed / requests_count * 1000:.2f} ms/req)")
+    return rps
+
+if __name__ == '__main__':
+    engine = run_engine_benchmark()
+    route_rps = run_route_benchmark()
+
+    engine_capacity = 1e6 / engine["ideias (count=5)"]
+    print("\n" + "=" * 60)
+    print(f"🎯 Meta: {TARGET_RPS} req/s")
+    print(f"   Gerador: {engine_capacity:,.0f}/s por núcleo "
+          f"({'✅' if engine_capacity >= TARGET_RPS * 10 else '⚠️'} custo desprezível frente à meta)")
+    workers_needed = max(1, -(-TARGET_RPS // int(route_rps)))
+    print(f"   Rota: {route_rps:,.0f} req/s por worker → {workers_needed} worker(s) para a meta "
+          "(limitado pelo banco, não pelo gerador)")
@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, os.path.dirname(__file__))
+
+# Modelo local com cauda longa: 5% das chamadas levam +1.5s
+os.environ['AI_PROVIDER'] = 'stub'
+os.environ.setdefault('AI_STUB_LATENCY_MS', '100')
+os.environ.setdefault('AI_STUB_JITTER_MS', '50')
+os.environ.setdefault('AI_STUB_TAIL_RATE', '0.05')
+os.environ.setdefault('AI_STUB_TAIL_MS', '1500')
+
+REQUESTS = int(os.environ.get('BENCH_REQUESTS', 600))
+CONCURRENCY = int(os.environ.get('BENCH_CONCURRENCY', 16))
+WARMUP = int(os.environ.get('BENCH_WARMUP', 50))
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+def run_mode(label, hedging):
+    os.environ['AI_HEDGING'] = '1' if hedging else '0'
+    from app.services.ai_service import AIService
+    service = AIService()
+
+    def one(i):
+        start = time.perf_counter()
+        result = service.generate_script_result(f"Ideia de benchmark {i}")
+        assert not result.fallback
+        return (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+        # Aquecimento fora da medição: sem amostras suficientes ainda não há limiar
+        list(pool.map(one, range(-WARMUP, 0)))
+        latencies = sorted(pool.map(one, range(REQUESTS)))
+
+    stats = service.hedging.stats()
+    print(f"\n⚙️  {label}")
+    print(f"   p50: {percentile(latencies, 0.5):7.1f} ms | p90: {percentile(latencies, 0.9):7.1f} ms | "
+          f"p99: {percentile(latencies, 0.99):7.1f} ms | máx: {latencies[-1]:7.1f} ms")
+    if hedging:
+        print(f"   hedges: {stats['hedged']} ({stats['hedge_rate']:.1%} das chamadas, teto {stats['max_rate']:.0%}) | "
+              f"venceram: {stats['hedge_wins']} | negados pelo orçamento: {stats['budget_denied']} | "
+              f"limiar: {stats['thresholds_ms']}")
+    return latencies
+
+if __name__ == '__main__':
+    print("📊 Benchmark de hedging (modelo local com cauda longa)")
+    print(f"   {REQUESTS} roteiros, {CONCURRENCY} em paralelo | latência "
+          f"{os.environ['AI_STUB_LATENCY_MS']}+{os.environ['AI_STUB_JITTER_MS']}ms, "
+          f"{float(os.environ['AI_STUB_TAIL_RATE']):.0%} com +{os.environ['AI_STUB_TAIL_MS']}ms")
+    print("=" * 60)
+
+    before = run_mode("Sem hedging", hedging=False)
+    after = run_mode("Com hedging (p90)", hedging=True)
+
+    print("\n" + "=" * 60)
+    p99_before, p99_after = percentile(before, 0.99), percentile(after, 0.99)
+    print(f"🎯 p99: {p99_before:.0f} ms → {p99_after:.0f} ms ({(1 - p99_after / p99_before):.0%} menor)")
@@ -0,0 +1,93 @@
+import os
+import sys
+import gzip
+import time
+from datetime import datetime
+sys.path.insert(0, os.path.dirname(__file__))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from app.json_provider import FastJSONProvider, orjson
+from app.compression import brotli
+
+def build_payloads():
+    """Payloads no formato de /api/user/history e /admin/users"""
+    ideas = [
+        {
+            "title": f"Ideia criativa número {i} sobre receitas rápidas",
+            "description": "Descrição detalhada da ideia com ganchos, cenário e chamada para ação 🎬",
+            "hashtags": "#receitas #rapidas #cozinha #viral #dicas"
+        }
+        for i in range(5)
+    ]
+    history = {
+        "history": [
+            {
+                "id": i,
+                "type": "ideas",
+                "data": {"niche": "culinária", "audience": "jovens", "ideas": ideas},
+                "created_at": datetime(2025, 9, 17, 12, 0, 0).isoformat(),
+                "user_id": 42
+            }
+            for i in range(50)
+        ],
+        "total": 500,
+        "pages": 10,
+        "current_page": 1
+    }
+    users = {
+        "users": [
+            {
+                "id": i,
+                "email": f"usuario{i}@exemplo.com",
+                "name": f"Usuário {i}",
+                "is_premium": i % 7 == 0,
+                "is_admin": False,
+                "created_at": datetime(2025, 1, 1).isoformat(),
+                "last_login": None
+            }
+            for i in range(2000)
+        ],
+        "total": 2000
+    }
+    return {"history (50 itens)": history, "admin users (2000)": users}
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+def run_benchmark(repeat=200):
+    print("📊 Benchmark de serialização JSON e compressão")
+    print(f"   orjson: {'sim' if orjson else 'não'} | brotli: {'sim' if brotli else 'não'}")
+    print("=" * 60)
+    
+    # Antes: provider padrão do Flask 2.3 fora do debug (compacto, chaves ordenadas, ASCII escapado)
+    default_app = Flask(__name__)
+    default_app.json = DefaultJSONProvider(default_app)
+
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    app.json.compact = True
+    
+    with default_app.app_context(), app.app_context():
+        for name, payload in build_payloads().items():
+            before_ms, before = timed(lambda: default_app.json.response(payload).get_data(), repeat)
+            # Depois: provider da aplicação, compacto
+            after_ms, after = timed(lambda: app.json.response(payload).get_data(), repeat)
+            gzip_ms, gzipped = timed(lambda: gzip.compress(after, compresslevel=6), repeat)
+            
+            print(f"\n📦 {name}")
+            print(f"   Antes:  {before_ms:7.3f} ms  {len(before):>9,} bytes")
+            print(f"   Depois: {after_ms:7.3f} ms  {len(after):>9,} bytes")
+            print(f"   + gzip: {gzip_ms:7.3f} ms  {len(gzipped):>9,} bytes")
+            if brotli:
+                br_ms, compressed = timed(lambda: brotli.compress(after, quality=4), repeat)
+                print(f"   + br:   {br_ms:7.3f} ms  {len(compressed):>9,} bytes")
+    
+    print("\n" + "=" * 60)
+    print("✅ Benchmark concluído")
+
+if __name__ == "__main__":
+    run_benchmark()
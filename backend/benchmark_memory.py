@@ -0,0 +1,98 @@
+import os
+import sys
+import time
+import socket
+import tempfile
+import subprocess
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def read_kb(pid, field, filename="smaps_rollup"):
+    """Lê RSS/PSS (kB) de /proc/<pid>/smaps_rollup"""
+    with open(f"/proc/{pid}/{filename}") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+def worker_pids(master_pid):
+    with open(f"/proc/{master_pid}/task/{master_pid}/children") as f:
+        return [int(pid) for pid in f.read().split()]
+
+def measure(preload, workers, database_url):
+    port = free_port()
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        WEB_CONCURRENCY=str(workers),
+        GUNICORN_PRELOAD="1" if preload else "0",
+        DATABASE_URL=database_url,
+        FAST_STARTUP="1",
+        GEMINI_API_KEY=os.environ.get("GEMINI_API_KEY", "benchmark-key")
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "serve_frontend:app"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = time.time() + 60
+        while time.time() < deadline:
+            try:
+                pids = worker_pids(proc.pid)
+                if len(pids) == workers:
+                    for _ in range(workers * 4):
+                        urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health", timeout=5).read()
+                    break
+            except OSError:
+                pass
+            time.sleep(0.5)
+        time.sleep(1)
+        
+        pids = worker_pids(proc.pid)
+        rss = [read_kb(pid, "Rss") for pid in pids]
+        pss = [read_kb(pid, "Pss") for pid in pids]
+        return {
+            "master_rss": read_kb(proc.pid, "Rss"),
+            "master_pss": read_kb(proc.pid, "Pss"),
+            "worker_rss": sum(rss) / len(rss),
+            "worker_pss": sum(pss) / len(pss),
+            "total_pss": sum(pss) + read_kb(proc.pid, "Pss")
+        }
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+def run_benchmark(workers=4):
+    print(f"🧠 Memória por worker do gunicorn ({workers} workers)")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        subprocess.run(
+            [sys.executable, "-m", "flask", "--app", "run", "init-db"],
+            cwd=BACKEND_DIR, env=dict(os.environ, DATABASE_URL=database_url),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True
+        )
+        results = {
+            "Sem preload": measure(False, workers, database_url),
+            "Com preload": measure(True, workers, database_url)
+        }
+    
+    for label, r in results.items():
+        print(f"\n📦 {label}")
+        print(f"   RSS médio por worker: {r['worker_rss'] / 1024:7.1f} MB")
+        print(f"   PSS médio por worker: {r['worker_pss'] / 1024:7.1f} MB (memória realmente exclusiva + fração compartilhada)")
+        print(f"   PSS total (master + workers): {r['total_pss'] / 1024:7.1f} MB")
+    
+    before, after = results["Sem preload"], results["Com preload"]
+    print("\n" + "=" * 60)
+    print(f"✅ PSS total: {before['total_pss'] / 1024:.1f} MB -> {after['total_pss'] / 1024:.1f} MB")
+
+if __name__ == "__main__":
+    run_benchmark()
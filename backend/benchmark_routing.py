@@ -0,0 +1,53 @@
+import os
+import sys
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, os.path.dirname(__file__))
+
+# Dois modelos locais: o primeiro da lista é mais lento; o segundo é rápido, mas
+# na segunda fase passa a falhar e a devolver JSON quebrado
+os.environ['AI_PROVIDER'] = 'stub'
+os.environ['AI_MODELS'] = json.dumps({"ideas": ["stub-lento", "stub-rapido"], "script": ["stub-lento", "stub-rapido"]})
+
+PHASES = [
+    ("Rápido saudável", {"stub-lento": {"latency_ms": 120}, "stub-rapido": {"latency_ms": 30}}),
+    ("Rápido degradado", {"stub-lento": {"latency_ms": 120},
+                          "stub-rapido": {"latency_ms": 30, "fail_rate": 0.3, "malformed_rate": 0.3}}),
+]
+REQUESTS = int(os.environ.get('BENCH_REQUESTS', 300))
+CONCURRENCY = int(os.environ.get('BENCH_CONCURRENCY', 8))
+
+def run_phase(service, label, profiles):
+    # Troca os perfis dos clientes já criados sem zerar as estatísticas do roteador
+    service.stub_profiles = profiles
+    service.reset()
+
+    def one(i):
+        start = time.perf_counter()
+        result = service.generate_ideas_result(f"nicho {label} {i}", "jovens", 5)
+        return result.fallback, (time.perf_counter() - start) * 1000
+
+    routed_before = {m: s['routed'] for m, s in service.router.stats()['tasks']['ideas'].items()}
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+        results = list(pool.map(one, range(REQUESTS)))
+    latencies = sorted(r[1] for r in results)
+    fallbacks = sum(1 for r in results if r[0])
+
+    print(f"\n⚙️  {label}")
+    print(f"   p50: {latencies[len(latencies) // 2]:6.1f} ms | p90: {latencies[int(len(latencies) * 0.9)]:6.1f} ms | "
+          f"fallback: {fallbacks}/{REQUESTS}")
+    for model, stats in service.router.stats()['tasks']['ideas'].items():
+        print(f"   {model:<12} rotas: {stats['routed'] - routed_before[model]:4d} | failovers: {stats['failovers']:3d} | "
+              f"p50: {stats['latency_ms']['p50']} ms | erro: {stats['error_rate']:.0%} | "
+              f"parsing: {stats['parse_success_rate']:.0%} | elegível: {'sim' if stats['eligible'] else 'não'}")
+
+if __name__ == '__main__':
+    from app.services.ai_service import AIService
+    service = AIService()
+    print("📊 Roteamento entre modelos (modelos locais)")
+    print(f"   {REQUESTS} gerações de ideias por fase, {CONCURRENCY} em paralelo | "
+          f"piso de qualidade: {service.router.quality_floor:.0%}")
+    print("=" * 60)
+    for label, profiles in PHASES:
+        run_phase(service, label, profiles)
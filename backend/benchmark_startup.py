@@ -0,0 +1,67 @@
+import os
+import sys
+import json
+import subprocess
+import statistics
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Mede o boot em um processo novo, como um worker do gunicorn
+BOOT_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+app = create_app()
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "seconds": elapsed,
+    "modules": len(sys.modules),
+    "gemini_sdk_loaded": "google.generativeai" in sys.modules
+}))
+"""
+
+SDK_SNIPPET = """
+import json, time
+start = time.perf_counter()
+import google.generativeai
+print(json.dumps({"seconds": time.perf_counter() - start}))
+"""
+
+def run_snippet(snippet, env):
+    result = subprocess.run(
+        [sys.executable, "-c", snippet],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def measure(label, extra_env, runs):
+    env = dict(os.environ, **extra_env)
+    samples = [run_snippet(BOOT_SNIPPET, env) for _ in range(runs)]
+    seconds = [s["seconds"] * 1000 for s in samples]
+    print(f"\n🚀 {label}")
+    print(f"   Mediana: {statistics.median(seconds):8.1f} ms (min {min(seconds):.1f} / máx {max(seconds):.1f})")
+    print(f"   Módulos carregados: {samples[-1]['modules']}")
+    print(f"   SDK Gemini importado no boot: {'sim' if samples[-1]['gemini_sdk_loaded'] else 'não'}")
+    return statistics.median(seconds)
+
+def run_benchmark(runs=5):
+    print("⏱️  Benchmark de inicialização do create_app()")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = os.environ.get("DATABASE_URL", f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        base_env = {"DATABASE_URL": database_url, "GEMINI_API_KEY": "benchmark-key"}
+        
+        sdk = [run_snippet(SDK_SNIPPET, dict(os.environ))["seconds"] * 1000 for _ in range(runs)]
+        print(f"\n📦 Import isolado do google.generativeai: {statistics.median(sdk):.1f} ms (evitado no boot)")
+        
+        full = measure("Boot completo (create_all + seed)", dict(base_env, FAST_STARTUP="0"), runs)
+        fast = measure("FAST_STARTUP=1 (schema via `flask init-db`)", dict(base_env, FAST_STARTUP="1"), runs)
+    
+    print("\n" + "=" * 60)
+    print(f"✅ Redução no boot: {full - fast:.1f} ms ({(1 - fast / full) * 100:.0f}%)")
+    print("💡 Com DATABASE_URL remoto (Postgres) a diferença inclui os round trips do create_all")
+
+if __name__ == "__main__":
+    run_benchmark()
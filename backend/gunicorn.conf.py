@@ -0,0 +1,148 @@
+"""Configuração do gunicorn
+
+O app é carregado uma vez no processo master (preload_app) e os workers
+compartilham essa memória via copy-on-write. Recursos que não sobrevivem ao
+fork (pool de conexões, threads, cliente gRPC do Gemini) são recriados em
+post_fork.
+"""
+import gc
+import multiprocessing
+import os
+
+# gthread (padrão) ou gevent (alta concorrência para chamadas lentas ao Gemini/Postgres)
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+
+if worker_class == 'gevent':
+    # O patch precisa acontecer antes do preload importar o app (sockets, threading, ssl)
+    from gevent import monkey
+    monkey.patch_all()
+
+    # psycopg2 é uma extensão C: sem este patch cada query bloquearia o worker inteiro
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
+
+    # gRPC não coopera com gevent; o transporte REST do SDK usa sockets já patcheados
+    os.environ.setdefault('GEMINI_TRANSPORT', 'rest')
+
+# MB estimados por worker (app + threads + pico de requisições)
+WORKER_MEMORY_MB = int(os.environ.get('GUNICORN_WORKER_MEMORY_MB', 256))
+# Teto do padrão: cada worker abre seu próprio pool de conexões ao Postgres
+MAX_DEFAULT_WORKERS = int(os.environ.get('GUNICORN_MAX_WORKERS', 4))
+
+
+def _cpu_count():
+    """CPUs disponíveis respeitando affinity e quota do cgroup (containers)"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = multiprocessing.cpu_count()
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            cpus = min(cpus, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def _memory_limit_mb():
+    """Limite de memória do cgroup (v2 ou v1) ou memória total da máquina"""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+            if value != 'max' and int(value) < 1 << 60:
+                return int(value) // (1024 * 1024)
+        except (OSError, ValueError):
+            pass
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemTotal:'):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return None
+
+
+def _default_workers():
+    workers = min(2 * _cpu_count() + 1, MAX_DEFAULT_WORKERS)
+    memory_mb = _memory_limit_mb()
+    if memory_mb:
+        workers = min(workers, max(1, memory_mb // WORKER_MEMORY_MB))
+    return workers
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY') or _default_workers())
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+# Só usado pelo gevent: requisições simultâneas por worker (cada uma é uma greenlet)
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1').lower() in ('1', 'true', 'yes')
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+
+if preload_app:
+    # O master importa o app mas não atende requisições: verificações de saúde só nos workers
+    os.environ['HEALTH_MONITOR_DEFERRED'] = '1'
+
+# Conexões ao Postgres = workers × (DB_POOL_SIZE + DB_MAX_OVERFLOW). No gthread cada thread
+# usa no máximo uma conexão: o pool acompanha as threads (+2 para as threads de background).
+# Com DB_MAX_CONNECTIONS (limite do banco gerenciado) o total é dividido entre os workers.
+if worker_class != 'gevent':
+    os.environ.setdefault('DB_POOL_SIZE', str(threads))
+    os.environ.setdefault('DB_MAX_OVERFLOW', '2')
+if os.environ.get('DB_MAX_CONNECTIONS'):
+    per_worker = max(1, int(os.environ['DB_MAX_CONNECTIONS']) // workers)
+    pool_size = min(int(os.environ.get('DB_POOL_SIZE', 5)), per_worker)
+    os.environ['DB_POOL_SIZE'] = str(pool_size)
+    os.environ['DB_MAX_OVERFLOW'] = str(min(int(os.environ.get('DB_MAX_OVERFLOW', 10)), per_worker - pool_size))
+
+
+def when_ready(server):
+    if preload_app:
+        # Só o import do SDK é compartilhado; o cliente gRPC é criado em cada worker
+        if os.environ.get('GEMINI_API_KEY'):
+            import google.generativeai  # noqa: F401
+        # Congela os objetos do master: o GC dos workers não toca nessas páginas (menos cópias)
+        gc.freeze()
+    concurrency = f"{worker_connections} greenlets" if worker_class == 'gevent' else f"{threads} threads"
+    server.log.info(f"Workers: {workers} x {concurrency} (preload={'sim' if preload_app else 'não'})")
+    server.log.info(f"Pool do banco por worker: {os.environ.get('DB_POOL_SIZE', 5)} + "
+                    f"{os.environ.get('DB_MAX_OVERFLOW', 10)} de overflow")
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+
+    from app.health import init_health_monitor
+    from app.models import db
+    from app.routes import init_cache_cleaner, init_cache_warmup
+    from app.services.retention import init_history_archiver
+    from app.services.token_usage import init_token_meter
+    from app.services.ai_service import ai_service
+
+    app = server.app.wsgi()
+
+    # Conexões herdadas do master não podem ser usadas por dois processos
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+    # Threads do master não existem no worker
+    app.cache_cleaner_started = False
+    init_cache_cleaner(app)
+    app.history_archiver_started = False
+    init_history_archiver(app)
+    app.health_monitor_started = False
+    init_health_monitor(app)
+    app.token_meter_started = False
+    init_token_meter(app)
+
+    # O que o master já aqueceu é herdado; se não terminou a tempo, o worker refaz
+    init_cache_warmup(app)
+
+    # Cliente gRPC do Gemini não é fork-safe: recriado no primeiro uso
+    ai_service.reset()
@@ -0,0 +1,38 @@
+"""Add full-text search index for generation history
+
+Revision ID: b3f1c2d4e5a6
+Revises: 6249e8d7aa53
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3f1c2d4e5a6'
+down_revision = '6249e8d7aa53'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    from app.services.history_search import ensure_search_index, index_entry
+
+    connection = op.get_bind()
+    ensure_search_index(connection)
+
+    # ✅ Backfill: indexa o histórico existente
+    rows = connection.execute(sa.text('SELECT id, user_id, type, data FROM generation_history'))
+    for history_id, user_id, history_type, data in rows.fetchall():
+        try:
+            index_entry(connection, history_id, user_id, history_type, data)
+        except ValueError:
+            continue
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP TABLE IF EXISTS generation_history_search')
+    else:
+        op.execute('DROP TABLE IF EXISTS generation_history_fts')
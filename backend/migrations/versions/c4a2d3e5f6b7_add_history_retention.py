@@ -0,0 +1,49 @@
+"""Add history indexes and archive table
+
+Revision ID: c4a2d3e5f6b7
+Revises: b3f1c2d4e5a6
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4a2d3e5f6b7'
+down_revision = 'b3f1c2d4e5a6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # ✅ Índices para consultas por intervalo de data
+    with op.batch_alter_table('generation_history', schema=None) as batch_op:
+        batch_op.create_index('ix_generation_history_user_created', ['user_id', 'created_at'])
+        batch_op.create_index('ix_generation_history_session_created', ['user_session', 'created_at'])
+        batch_op.create_index('ix_generation_history_created_at', ['created_at'])
+
+    # ✅ Tabela de arquivo (no Postgres, particionada por mês; partições criadas pelo arquivador)
+    op.create_table(
+        'generation_history_archive',
+        sa.Column('id', sa.Integer(), nullable=False, autoincrement=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('type', sa.String(length=20), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('user_session', sa.String(length=100), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id', 'created_at'),
+        postgresql_partition_by='RANGE (created_at)'
+    )
+    op.create_index('ix_generation_history_archive_user_id', 'generation_history_archive', ['user_id'])
+
+
+def downgrade():
+    op.drop_index('ix_generation_history_archive_user_id', table_name='generation_history_archive')
+    op.drop_table('generation_history_archive')
+
+    with op.batch_alter_table('generation_history', schema=None) as batch_op:
+        batch_op.drop_index('ix_generation_history_created_at')
+        batch_op.drop_index('ix_generation_history_session_created')
+        batch_op.drop_index('ix_generation_history_user_created')
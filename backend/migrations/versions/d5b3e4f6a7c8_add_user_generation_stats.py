@@ -0,0 +1,53 @@
+"""Add user generation stats aggregate and user listing indexes
+
+Revision ID: d5b3e4f6a7c8
+Revises: c4a2d3e5f6b7
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5b3e4f6a7c8'
+down_revision = 'c4a2d3e5f6b7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    from app.services.user_stats import rebuild_user_stats
+
+    op.create_table(
+        'user_generation_stats',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('ideas_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('scripts_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_generation_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+
+    # ✅ Índices dos filtros da listagem administrativa
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index('ix_users_created_at', ['created_at'])
+        batch_op.create_index('ix_users_last_login', ['last_login'])
+
+    if op.get_bind().dialect.name == 'postgresql':
+        # LIKE 'prefixo%' só usa índice btree com pattern_ops fora da collation C
+        op.execute('CREATE INDEX ix_users_email_pattern ON users (email varchar_pattern_ops)')
+
+    # ✅ Backfill dos contadores a partir do histórico existente
+    rebuild_user_stats(op.get_bind())
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_users_email_pattern')
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index('ix_users_last_login')
+        batch_op.drop_index('ix_users_created_at')
+
+    op.drop_table('user_generation_stats')
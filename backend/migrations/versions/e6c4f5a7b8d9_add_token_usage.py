@@ -0,0 +1,48 @@
+"""Add aggregated token usage and per-user token budgets
+
+Revision ID: e6c4f5a7b8d9
+Revises: d5b3e4f6a7c8
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6c4f5a7b8d9'
+down_revision = 'd5b3e4f6a7c8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'token_usage',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('user_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('tier', sa.String(length=20), nullable=False),
+        sa.Column('endpoint', sa.String(length=64), nullable=False),
+        sa.Column('template', sa.String(length=32), nullable=False),
+        sa.Column('model', sa.String(length=100), nullable=False),
+        sa.Column('calls', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('input_tokens', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('output_tokens', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('day', 'user_id', 'tier', 'endpoint', 'template', 'model')
+    )
+    with op.batch_alter_table('token_usage', schema=None) as batch_op:
+        batch_op.create_index('ix_token_usage_user_day', ['user_id', 'day'])
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('token_budget_daily', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('token_budget_daily')
+
+    with op.batch_alter_table('token_usage', schema=None) as batch_op:
+        batch_op.drop_index('ix_token_usage_user_day')
+
+    op.drop_table('token_usage')
@@ -0,0 +1,33 @@
+"""Add users.updated_at for conditional GET validators
+
+Revision ID: f7d6e5a8b9c0
+Revises: e6c4f5a7b8d9
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7d6e5a8b9c0'
+down_revision = 'e6c4f5a7b8d9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    # ✅ Backfill: a última alteração conhecida é o último login ou o cadastro
+    op.execute('UPDATE users SET updated_at = COALESCE(last_login, created_at)')
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index('ix_users_updated_at', ['updated_at'])
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index('ix_users_updated_at')
+        batch_op.drop_column('updated_at')
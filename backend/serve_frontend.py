@@ -1,11 +1,11 @@
 import os
-from flask import Flask, send_from_directory
 import sys
 
 # Adicionar o caminho do backend ao Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from app import create_app
+from app.static_assets import AssetManifest
 
 # Configurações
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -14,16 +14,18 @@ FRONTEND_FOLDER = os.path.join(BASE_DIR, 'frontend')
 # ✅ Criar app usando a factory
 app = create_app()
 
+# ✅ Manifesto em memória: fingerprint + gzip/brotli calculados uma vez na inicialização
+assets = AssetManifest(FRONTEND_FOLDER)
+print(f"✅ {len(assets.assets)} arquivos do frontend carregados no manifesto")
+
 # ✅ Frontend routes (apenas estas rotas aqui)
 @app.route('/')
 def serve_frontend():
-    return send_from_directory(FRONTEND_FOLDER, 'index.html')
+    return assets.serve('index.html')
 
 @app.route('/<path:path>')
 def serve_static_files(path):
-    if os.path.exists(os.path.join(FRONTEND_FOLDER, path)):
-        return send_from_directory(FRONTEND_FOLDER, path)
-    return send_from_directory(FRONTEND_FOLDER, 'index.html')
+    return assets.serve(path)
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
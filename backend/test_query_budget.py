@@ -0,0 +1,71 @@
+# test_query_budget.py
+# Orçamento de queries SQL por endpoint (pega N+1 e queries duplicadas)
+import json
+import os
+import sys
+import tempfile
+sys.path.insert(0, os.path.dirname(__file__))
+
+# Banco SQLite temporário e IA local: o teste cria usuários e histórico próprios
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'query_budget.db')}")
+os.environ.setdefault('AI_PROVIDER', 'stub')
+os.environ.setdefault('FAST_STARTUP', '1')
+os.environ.setdefault('RATE_LIMIT_ENABLED', '0')
+
+from flask_jwt_extended import create_access_token
+
+from app import create_app
+from app.models import db, init_database, User, GenerationHistory
+from app.query_profiler import assert_query_budget
+
+app = create_app()
+
+# (método, url, máx. de queries, kwargs) — o histórico/listagem não pode crescer com o número de linhas
+BUDGETS = [
+    ('POST', '/api/generate-ideas', 10, {'json': {'niche': 'culinária', 'audience': 'jovens', 'count': 3}}),
+    ('GET', '/api/auth/me', 3, {}),
+    ('GET', '/api/user/history', 6, {}),
+    ('GET', '/admin/users', 4, {}),
+]
+
+def seed():
+    init_database()
+    admin = User(email='admin@teste.com', name='Admin', is_admin=True, is_premium=True)
+    admin.set_password('senha123')
+    db.session.add(admin)
+    for i in range(20):
+        user = User(email=f'usuario{i}@teste.com', name=f'Usuário {i}')
+        user.set_password('senha123')
+        db.session.add(user)
+    db.session.flush()
+    for i in range(30):
+        db.session.add(GenerationHistory(
+            user_id=admin.id, type='ideas',
+            data=json.dumps({'niche': f'nicho {i}', 'audience': 'jovens', 'ideas': []})
+        ))
+    db.session.commit()
+    return create_access_token(identity=str(admin.id))
+
+def run_budgets():
+    print("🧪 Testando orçamento de queries por endpoint...")
+    with app.app_context():
+        token = seed()
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+
+    failures = 0
+    for method, url, max_queries, kwargs in BUDGETS:
+        try:
+            response = assert_query_budget(client, method, url, max_queries, headers=headers, **kwargs)
+            # Resposta de erro (401/429) sai antes das queries do endpoint: não vale como aprovação
+            assert response.status_code == 200, f"status {response.status_code}: {response.get_data(as_text=True)[:200]}"
+            print(f"✅ {method} {url}: {response.status_code} (máx. {max_queries} queries)")
+        except AssertionError as e:
+            failures += 1
+            print(f"❌ {method} {url}: {e}")
+
+    print(f"📋 {len(BUDGETS) - failures}/{len(BUDGETS)} endpoints dentro do orçamento")
+    return failures == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if run_budgets() else 1)
@@ -135,30 +135,24 @@ function handleRealTimeUpdate(data) {
 }
 
 // Gestão de Usuários Avançada
+// Filtros aplicados no servidor (a lista completa não é mais carregada no navegador)
+let filterTimeout = null;
+
 function filterUsers() {
-    const searchTerm = document.getElementById('user-search').value.toLowerCase();
+    clearTimeout(filterTimeout);
+    filterTimeout = setTimeout(() => loadUsers(true), 300);
+}
+
+function buildUserFilters() {
+    const filters = {};
+    const searchTerm = document.getElementById('user-search').value.trim();
     const filterType = document.getElementById('user-filter').value;
-    
-    let filtered = allUsers;
-    
-    // Aplicar filtro de tipo
-    if (filterType === 'premium') {
-        filtered = filtered.filter(u => u.is_premium);
-    } else if (filterType === 'free') {
-        filtered = filtered.filter(u => !u.is_premium);
-    } else if (filterType === 'admin') {
-        filtered = filtered.filter(u => u.is_admin);
-    }
-    
-    // Aplicar busca
-    if (searchTerm) {
-        filtered = filtered.filter(u => 
-            u.email.toLowerCase().includes(searchTerm) ||
-            (u.name && u.name.toLowerCase().includes(searchTerm))
-        );
-    }
-    
-    renderUsersTable(filtered);
+
+    if (searchTerm) filters.email = searchTerm;
+    if (filterType === 'premium' || filterType === 'free') filters.plan = filterType;
+    if (filterType === 'admin') filters.is_admin = 'true';
+
+    return filters;
 }
 
 async function editUser(userId) {
@@ -268,19 +262,46 @@ async function applyUserAction(userId, data) {
 }
 
 // Novos endpoints no backend (routes.py)
-async function loadUsers() {
+// Paginação por cursor: reset=true recomeça a lista, senão anexa a próxima página
+let usersNextCursor = null;
+
+async function loadUsers(reset = true) {
     try {
-        const response = await makeAuthenticatedRequest('/admin/users');
+        if (reset) {
+            currentFilters = buildUserFilters();
+            usersNextCursor = null;
+        }
+
+        const params = new URLSearchParams({ ...currentFilters, limit: 50 });
+        if (usersNextCursor) params.set('cursor', usersNextCursor);
+
+        const response = await makeAuthenticatedRequest(`/admin/users?${params}`);
         if (response.ok) {
             const data = await response.json();
-            allUsers = data.users;
+            allUsers = reset ? data.users : allUsers.concat(data.users);
+            usersNextCursor = data.next_cursor;
             renderUsersTable(allUsers);
+            updateLoadMoreButton();
         }
     } catch (error) {
         console.error('Erro ao carregar usuários:', error);
     }
 }
 
+function updateLoadMoreButton() {
+    const container = document.querySelector('.users-table-container');
+    let button = document.getElementById('load-more-users');
+    if (!button) {
+        button = document.createElement('button');
+        button.id = 'load-more-users';
+        button.className = 'btn btn-outline';
+        button.textContent = 'Carregar mais';
+        button.onclick = () => loadUsers(false);
+        container.after(button);
+    }
+    button.style.display = usersNextCursor ? 'block' : 'none';
+}
+
 function renderUsersTable(users) {
     const tbody = document.getElementById('users-table-body');
     tbody.innerHTML = '';
@@ -304,6 +325,7 @@ function renderUsersTable(users) {
                 </span>
             </td>
             <td>${new Date(user.created_at).toLocaleDateString('pt-BR')}</td>
+            <td>${user.generations.ideas + user.generations.scripts}</td>
             <td>
                 <button onclick="editUser(${user.id})" class="btn-sm btn-outline">Editar</button>
                 <button onclick="toggleUserPremium(${user.id}, ${!user.is_premium})" 
@@ -319,6 +341,8 @@ function renderUsersTable(users) {
 
 // Inicialização
 document.addEventListener('DOMContentLoaded', function() {
+    document.getElementById('user-search').addEventListener('input', filterUsers);
+    document.getElementById('user-filter').addEventListener('change', filterUsers);
     loadFullDashboard();
 });
 
@@ -208,6 +208,38 @@ async function makeAuthenticatedRequest(url, options = {}) {
     return response;
 }
 
+// ✅ Idempotency-Key por clique: repetir após falha de rede não gera (nem cobra) de novo
+function newIdempotencyKey() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+}
+
+async function postGeneration(url, payload, retries = 1) {
+    const options = {
+        method: 'POST',
+        headers: { 'Idempotency-Key': newIdempotencyKey() },
+        body: JSON.stringify(payload)
+    };
+    
+    for (let attempt = 0; ; attempt++) {
+        try {
+            const response = await makeAuthenticatedRequest(url, options);
+            // 409: a tentativa anterior ainda está em processamento no servidor
+            if (response.status !== 409 || attempt >= retries) {
+                return response;
+            }
+        } catch (error) {
+            // Só falhas de rede (TypeError) são repetidas, com a mesma chave
+            if (!(error instanceof TypeError) || attempt >= retries) {
+                throw error;
+            }
+        }
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+}
+
 function updateUIForLoggedInUser(user) {
     // ✅ Verificar se elemento existe antes de usar
     const userInfoElement = document.getElementById('user-info');
@@ -463,10 +495,7 @@ async function generateIdeas() {
     btn.disabled = true;
     
     try {
-        const response = await makeAuthenticatedRequest('/api/generate-ideas', {
-            method: 'POST',
-            body: JSON.stringify({ niche, audience, count: parseInt(count) })
-        });
+        const response = await postGeneration('/api/generate-ideas', { niche, audience, count: parseInt(count) });
         
         const data = await response.json();
         
@@ -517,10 +546,7 @@ async function generateScript() {
     btn.disabled = true;
     
     try {
-        const response = await makeAuthenticatedRequest('/api/generate-script', {
-            method: 'POST',
-            body: JSON.stringify({ idea })
-        });
+        const response = await postGeneration('/api/generate-script', { idea });
         
         const data = await response.json();
         